@@ -0,0 +1,44 @@
+# -*- coding: utf-8 -*-
+"""
+bench 测试的公共夹具: 按测试配置加载 ql-docker-plus.py
+
+脚本在导入时读取配置, 并会把 CLAW_PROXY 写入 http(s)_proxy 等环境变量;
+load_plus 在测试结束后还原整个 os.environ, 避免配置泄漏到其他测试。
+"""
+
+import importlib.util
+import os
+import sys
+
+import pytest
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCH_DIR)
+
+sys.path.insert(0, BENCH_DIR)
+
+# 运行环境中的代理配置会影响本地假服务的请求, 加载前统一清除
+PROXY_VARS = (
+    "CLAW_PROXY", "CLAW_PROXIES", "ALL_PROXY", "all_proxy",
+    "HTTP_PROXY", "HTTPS_PROXY", "http_proxy", "https_proxy", "NO_PROXY", "no_proxy",
+)
+
+
+@pytest.fixture
+def load_plus(tmp_path):
+    """返回 load(name, env): 以 env 覆盖环境变量后加载一份独立的 ql-docker-plus.py 模块"""
+    saved = dict(os.environ)
+
+    def load(name, env):
+        for var in PROXY_VARS:
+            os.environ.pop(var, None)
+        os.environ.update({"CLAW_SCRIPT_DIR": str(tmp_path), "CLAW_TRACE_FILE": ""})
+        os.environ.update(env)
+        spec = importlib.util.spec_from_file_location(name, os.path.join(REPO_DIR, "ql-docker-plus.py"))
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        return module
+
+    yield load
+    os.environ.clear()
+    os.environ.update(saved)
@@ -0,0 +1,399 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+ClawCloud + GitHub OAuth 本地模拟服务
+用于在不访问真实站点的情况下测试/压测 ql-docker-plus.py、ql-docker.py、login_script.py
+
+两个端口分别模拟 ClawCloud 与 GitHub:
+  ClawCloud: /  /signin  /apps  /callback  /api/auth/info  /api/account/getAmount (POST)
+  GitHub:    /github.com/login  /github.com/session
+             /github.com/sessions/two-factor/app  /github.com/login/oauth/authorize
+GitHub 页面路径带 github.com 前缀, 使脚本中基于 URL 的判断 ("github.com/login" 等) 保持有效。
+
+用法:
+  python bench/mock_server.py --claw-port 8801 --github-port 8802 --latency 50
+  CLAW_CLOUD_URL=http://127.0.0.1:8801 python ql-docker-plus.py
+"""
+
+import argparse
+import html
+import json
+import secrets
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, quote, urlencode, urlparse
+
+try:
+    import pyotp
+except ImportError:
+    pyotp = None
+
+
+class MockConfig:
+    """模拟服务配置与共享状态"""
+
+    def __init__(self, latency=0.0, login_latency=0.0, render_delay=0.0, balance="5.00",
+                 accounts=None, two_factor=True, used="1.50"):
+        self.latency = latency              # 每个响应的基础延迟 (秒)
+        self.login_latency = login_latency  # 提交密码 / 2FA / 授权的额外延迟 (秒)
+        self.render_delay = render_delay    # 仪表盘前端渲染延迟 (秒), 模拟 SPA 加载
+        self.balance = balance             # 剩余余额 (美元)
+        self.used = used                   # 已消费 (美元)
+        self.accounts = accounts or {}      # {用户名: 2FA 密钥}, 提供密钥时校验 TOTP
+        self.two_factor = two_factor
+        self.claw_url = ""
+        self.github_url = ""
+        self.lock = threading.Lock()
+        self.claw_sessions = {}             # token -> 用户名
+        self.github_sessions = {}           # token -> 用户名 (已完成 2FA)
+        self.pending_2fa = {}               # token -> 用户名 (已验证密码, 待 2FA)
+        self.codes = {}                     # OAuth code -> 用户名
+        self.stats = {}                     # 路径 -> 请求次数
+
+    def count(self, path):
+        with self.lock:
+            self.stats[path] = self.stats.get(path, 0) + 1
+
+    def new_token(self, table, username):
+        token = secrets.token_hex(16)
+        with self.lock:
+            table[token] = username
+        return token
+
+
+def page(title, body, script=""):
+    """生成简单 HTML 页面"""
+    return (
+        "<!DOCTYPE html><html><head><meta charset='utf-8'>"
+        f"<title>{html.escape(title)}</title></head>"
+        f"<body>{body}{script}</body></html>"
+    )
+
+
+class BaseHandler(BaseHTTPRequestHandler):
+    config = None
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, fmt, *args):
+        pass
+
+    def cookies(self):
+        result = {}
+        for part in self.headers.get("Cookie", "").split(";"):
+            if "=" in part:
+                name, value = part.strip().split("=", 1)
+                result[name] = value
+        return result
+
+    def form(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        data = self.rfile.read(length).decode("utf-8") if length else ""
+        return {k: v[0] for k, v in parse_qs(data).items()}
+
+    def query(self):
+        return {k: v[0] for k, v in parse_qs(urlparse(self.path).query).items()}
+
+    def send(self, status, body="", content_type="text/html; charset=utf-8", headers=None):
+        payload = body.encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(payload)))
+        for name, value in (headers or []):
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def redirect(self, location, headers=None):
+        self.send(302, "", headers=[("Location", location)] + (headers or []))
+
+    def delay(self, extra=0.0):
+        total = self.config.latency + extra
+        if total > 0:
+            time.sleep(total)
+
+
+class ClawHandler(BaseHandler):
+    """模拟 ClawCloud 控制台"""
+
+    def session_user(self):
+        token = self.cookies().get("claw_session")
+        return self.config.claw_sessions.get(token)
+
+    def landing(self):
+        authorize = (
+            f"{self.config.github_url}/github.com/login/oauth/authorize?"
+            + urlencode({"client_id": "clawcloud", "redirect_uri": f"{self.config.claw_url}/callback"})
+        )
+        body = (
+            "<h1>Sign in to ClawCloud Run</h1>"
+            f"<button id='github' onclick=\"location.href='{authorize}'\">Continue with GitHub</button>"
+        )
+        return page("ClawCloud Sign in", body)
+
+    def amount(self):
+        """余额接口响应, 与控制台相同以 1/1000000 美元为单位: 剩余 = balance - deductionBalance"""
+        used = int(round(float(self.config.used) * 1000000))
+        total = int(round(float(self.config.balance) * 1000000)) + used
+        return json.dumps({"code": 200, "message": "ok", "data": {"balance": total, "deductionBalance": used}})
+
+    def dashboard(self):
+        # 余额由前端请求接口后渲染; "$" 不能以字面量出现在脚本中, 否则会被 //*[contains(text(), '$')] 命中 <script>
+        content = (
+            "<nav><span>App Launchpad</span> <span>Database</span> <span>Devbox</span> "
+            "<span>Object Storage</span> <span>Terminal</span></nav>"
+            "<input placeholder='Search apps'>"
+            "<div class='region'>Germany</div>"
+        )
+        delay_ms = int(self.config.render_delay * 1000)
+        script = (
+            "<script>setTimeout(function () {"
+            f"document.getElementById('app').innerHTML = \"{content}\";"
+            "fetch('/api/account/getAmount', {method: 'POST'}).then(function (r) { return r.json(); })"
+            ".then(function (d) {"
+            "var left = (d.data.balance - d.data.deductionBalance) / 1000000;"
+            "var el = document.createElement('div'); el.className = 'balance';"
+            "el.textContent = 'Balance: \\u0024' + left.toFixed(2);"
+            "document.getElementById('app').appendChild(el);"
+            "});"
+            f"}}, {delay_ms});</script>"
+        )
+        return page("ClawCloud Dashboard", "<div id='app'></div>", script)
+
+    def do_POST(self):
+        path = urlparse(self.path).path
+        self.config.count(f"claw POST {path}")
+        self.delay()
+
+        if path == "/api/account/getAmount":
+            if self.session_user():
+                self.send(200, self.amount(), "application/json")
+            else:
+                self.send(401, '{"code": 401, "message": "unauthorized"}', "application/json")
+            return
+
+        self.send(404, page("Not Found", "<h1>404</h1>"))
+
+    def do_GET(self):
+        path = urlparse(self.path).path
+        self.config.count(f"claw {path}")
+        self.delay()
+
+        if path == "/callback":
+            username = self.config.codes.pop(self.query().get("code"), None)
+            if not username:
+                self.redirect("/signin")
+                return
+            token = self.config.new_token(self.config.claw_sessions, username)
+            self.redirect("/", [("Set-Cookie", f"claw_session={token}; Path=/; HttpOnly")])
+            return
+
+        if path == "/api/auth/info":
+            username = self.session_user()
+            if username:
+                self.send(200, f'{{"user": "{username}"}}', "application/json")
+            else:
+                self.send(401, '{"error": "unauthorized"}', "application/json")
+            return
+
+        if path == "/signin":
+            self.send(200, self.landing())
+            return
+
+        if path in ("/", "/apps"):
+            if self.session_user():
+                self.send(200, self.dashboard())
+            else:
+                self.redirect("/signin")
+            return
+
+        self.send(404, page("Not Found", "<h1>404</h1>"))
+
+
+class GitHubHandler(BaseHandler):
+    """模拟 GitHub 登录 / 2FA / OAuth 授权"""
+
+    def session_user(self):
+        token = self.cookies().get("gh_session")
+        return self.config.github_sessions.get(token)
+
+    def login_page(self, return_to, error=""):
+        body = (
+            "<h1>Sign in to GitHub</h1>"
+            + (f"<div class='flash-error'>{html.escape(error)}</div>" if error else "")
+            + "<form method='post' action='/github.com/session'>"
+            f"<input type='hidden' name='return_to' value='{html.escape(return_to)}'>"
+            "<input id='login_field' name='login' type='text'>"
+            "<input id='password' name='password' type='password'>"
+            "<input type='submit' name='commit' value='Sign in'>"
+            "</form>"
+        )
+        return page("Sign in to GitHub", body)
+
+    def two_factor_page(self, return_to, error=""):
+        body = (
+            "<h1>Two-factor authentication</h1>"
+            + (f"<div class='flash-error'>{html.escape(error)}</div>" if error else "")
+            + "<form id='otp-form' method='post' action='/github.com/sessions/two-factor'>"
+            f"<input type='hidden' name='return_to' value='{html.escape(return_to)}'>"
+            "<label for='app_totp'>Enter the code from your two-factor authentication app</label>"
+            "<input id='app_totp' name='otp' type='text' autocomplete='one-time-code' placeholder='XXXXXX'>"
+            "<button type='submit' class='btn-primary'>Verify</button>"
+            "</form>"
+        )
+        # 与 GitHub 一致: 输入满 6 位后自动提交
+        script = (
+            "<script>document.getElementById('app_totp').addEventListener('input', function (e) {"
+            "if (e.target.value.length === 6) { document.getElementById('otp-form').submit(); }"
+            "});</script>"
+        )
+        return page("Two-factor authentication", body, script)
+
+    def authorize_page(self, query):
+        body = (
+            "<h1>Authorize ClawCloud</h1>"
+            "<form method='post' action='/github.com/login/oauth/authorize'>"
+            f"<input type='hidden' name='redirect_uri' value='{html.escape(query.get('redirect_uri', ''))}'>"
+            "<button type='submit' name='authorize' value='1'>Authorize clawcloud</button>"
+            "</form>"
+        )
+        return page("Authorize application", body)
+
+    def verify_totp(self, username, code):
+        if not code or len(code) != 6 or not code.isdigit():
+            return False
+        secret = self.config.accounts.get(username)
+        if secret and pyotp:
+            return pyotp.TOTP(secret).verify(code, valid_window=1)
+        return True
+
+    def do_GET(self):
+        parsed = urlparse(self.path)
+        path = parsed.path
+        self.config.count(f"github {path}")
+        self.delay()
+        query = self.query()
+
+        if path == "/github.com/login/oauth/authorize":
+            if self.session_user():
+                self.send(200, self.authorize_page(query))
+            else:
+                self.redirect("/github.com/login?" + urlencode({"return_to": self.path}))
+            return
+
+        if path == "/github.com/login":
+            self.send(200, self.login_page(query.get("return_to", "/")))
+            return
+
+        if path == "/github.com/sessions/two-factor/app":
+            self.send(200, self.two_factor_page(query.get("return_to", "/")))
+            return
+
+        self.send(404, page("Not Found", "<h1>404</h1>"))
+
+    def do_POST(self):
+        path = urlparse(self.path).path
+        self.config.count(f"github POST {path}")
+        self.delay(self.config.login_latency)
+        form = self.form()
+        return_to = form.get("return_to", "/")
+
+        if path == "/github.com/session":
+            username = form.get("login", "")
+            if not username or not form.get("password"):
+                self.send(200, self.login_page(return_to, "Incorrect username or password."))
+                return
+            if not self.config.two_factor:
+                token = self.config.new_token(self.config.github_sessions, username)
+                self.redirect(return_to, [("Set-Cookie", f"gh_session={token}; Path=/")])
+                return
+            token = self.config.new_token(self.config.pending_2fa, username)
+            self.redirect(
+                "/github.com/sessions/two-factor/app?return_to=" + quote(return_to, safe=""),
+                [("Set-Cookie", f"gh_pending={token}; Path=/")],
+            )
+            return
+
+        if path == "/github.com/sessions/two-factor":
+            username = self.config.pending_2fa.get(self.cookies().get("gh_pending"))
+            if not username or not self.verify_totp(username, form.get("otp")):
+                self.send(200, self.two_factor_page(return_to, "Two-factor authentication failed."))
+                return
+            token = self.config.new_token(self.config.github_sessions, username)
+            self.redirect(return_to, [("Set-Cookie", f"gh_session={token}; Path=/")])
+            return
+
+        if path == "/github.com/login/oauth/authorize":
+            username = self.session_user()
+            if not username:
+                self.redirect("/github.com/login")
+                return
+            code = secrets.token_hex(8)
+            with self.config.lock:
+                self.config.codes[code] = username
+            self.redirect(f"{form.get('redirect_uri', '')}?code={code}")
+            return
+
+        self.send(404, page("Not Found", "<h1>404</h1>"))
+
+
+class MockServer:
+    """在后台线程中同时运行模拟 ClawCloud 与 GitHub"""
+
+    def __init__(self, config, claw_port=0, github_port=0, host="127.0.0.1"):
+        self.config = config
+        claw_handler = type("BoundClawHandler", (ClawHandler,), {"config": config})
+        github_handler = type("BoundGitHubHandler", (GitHubHandler,), {"config": config})
+        self.claw = ThreadingHTTPServer((host, claw_port), claw_handler)
+        self.github = ThreadingHTTPServer((host, github_port), github_handler)
+        self.claw.daemon_threads = True
+        self.github.daemon_threads = True
+        config.claw_url = f"http://{host}:{self.claw.server_address[1]}"
+        config.github_url = f"http://{host}:{self.github.server_address[1]}"
+        self.threads = []
+
+    def start(self):
+        for server in (self.claw, self.github):
+            thread = threading.Thread(target=server.serve_forever, daemon=True)
+            thread.start()
+            self.threads.append(thread)
+        return self
+
+    def stop(self):
+        for server in (self.claw, self.github):
+            server.shutdown()
+            server.server_close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ClawCloud + GitHub OAuth 本地模拟服务")
+    parser.add_argument("--claw-port", type=int, default=8801)
+    parser.add_argument("--github-port", type=int, default=8802)
+    parser.add_argument("--latency", type=float, default=0, help="每个响应的基础延迟 (毫秒)")
+    parser.add_argument("--login-latency", type=float, default=0, help="登录/2FA/授权的额外延迟 (毫秒)")
+    parser.add_argument("--render-delay", type=float, default=0, help="仪表盘前端渲染延迟 (毫秒)")
+    parser.add_argument("--balance", default="5.00")
+    parser.add_argument("--used", default="1.50", help="已消费金额 (余额接口)")
+    parser.add_argument("--no-2fa", action="store_true", help="密码登录后不要求两步验证")
+    args = parser.parse_args()
+
+    config = MockConfig(
+        latency=args.latency / 1000,
+        login_latency=args.login_latency / 1000,
+        render_delay=args.render_delay / 1000,
+        balance=args.balance,
+        used=args.used,
+        two_factor=not args.no_2fa,
+    )
+    server = MockServer(config, args.claw_port, args.github_port).start()
+    print(f"ClawCloud 模拟地址: {config.claw_url}")
+    print(f"GitHub 模拟地址:    {config.github_url}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
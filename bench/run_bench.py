@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+端到端基准测试: 启动本地模拟服务, 用真实脚本跑 1 / 10 / 100 个账号并统计耗时
+
+  ql-docker-plus.py  一次运行处理全部账号, 通过 CLAW_TRACE_FILE 汇总每个账号与每个阶段的耗时
+  ql-docker.py       单账号脚本, 每个账号单独运行一次, 统计每个账号的总耗时
+  login_script.py    同上 (需要安装 playwright)
+
+用法:
+  python bench/run_bench.py --script plus --accounts 1 10 100 --concurrency 4
+  python bench/run_bench.py --script plus --accounts 10 --repeat 2   # 第二轮为 Cookie 复用 (热启动)
+  python bench/run_bench.py --script docker --accounts 1 10 --latency 100
+"""
+
+import argparse
+import json
+import math
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from mock_server import MockConfig, MockServer  # noqa: E402
+
+try:
+    import pyotp
+except ImportError:
+    pyotp = None
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SCRIPTS = {
+    "plus": "ql-docker-plus.py",
+    "docker": "ql-docker.py",
+    "playwright": "login_script.py",
+}
+
+
+def make_accounts(count):
+    """生成测试账号 (用户名, 密码, 2FA 密钥)"""
+    accounts = []
+    for i in range(1, count + 1):
+        secret = pyotp.random_base32() if pyotp else "JBSWY3DPEHPK3PXP"
+        accounts.append((f"bench{i:03d}@example.com", f"password{i}", secret))
+    return accounts
+
+
+def base_env(mock, work_dir):
+    """子进程环境: 指向模拟服务, 清除代理与通知配置"""
+    env = dict(os.environ)
+    for name in ("CLAW_PROXY", "ALL_PROXY", "HTTP_PROXY", "HTTPS_PROXY", "http_proxy", "https_proxy",
+                 "all_proxy", "TG_BOT_TOKEN", "TG_CHAT_ID", "WECHAT_API_URL", "WECHAT_AUTH_TOKEN"):
+        env.pop(name, None)
+    env["NO_PROXY"] = env["no_proxy"] = "localhost,127.0.0.1,::1"
+    env["CLAW_CLOUD_URL"] = mock.config.claw_url
+    # 模拟服务的会话接口, 开启免浏览器预检与 HTTP 保活
+    env["CLAW_SESSION_CHECK_PATH"] = "/api/auth/info"
+    env["CLAW_SCRIPT_DIR"] = work_dir
+    env["PYTHONUNBUFFERED"] = "1"
+    # 基准测试每轮都要真实处理账号, 不按调度计划跳过
+    env["CLAW_FORCE_RUN"] = "1"
+    return env
+
+
+def pct(values, p):
+    """最近秩法百分位数"""
+    ordered = sorted(values)
+    rank = max(1, math.ceil(p / 100 * len(ordered)))
+    return ordered[min(rank, len(ordered)) - 1]
+
+
+def summarize(title, values):
+    if not values:
+        return f"{title:<24}{'-':>8}"
+    return (
+        f"{title:<24}{len(values):>8}{statistics.mean(values):>10.2f}"
+        f"{pct(values, 50):>10.2f}{pct(values, 95):>10.2f}{max(values):>10.2f}"
+    )
+
+
+def print_table(rows):
+    print(f"{'':<24}{'次数':>8}{'平均(s)':>10}{'p50(s)':>10}{'p95(s)':>10}{'最大(s)':>10}")
+    for title, values in rows:
+        print(summarize(title, values))
+
+
+def run_plus(accounts, env, work_dir, concurrency, log_file):
+    """一次运行处理全部账号, 返回 (总耗时, 追踪记录)"""
+    trace_file = os.path.join(work_dir, f"trace_{time.time_ns()}.jsonl")
+    env = dict(env)
+    env["CLAW_ACCOUNTS"] = "&".join("----".join(acc) for acc in accounts)
+    env["CLAW_CONCURRENCY"] = str(concurrency)
+    env["CLAW_TRACE_FILE"] = trace_file
+
+    start = time.time()
+    subprocess.run(
+        [sys.executable, os.path.join(REPO_DIR, SCRIPTS["plus"])],
+        env=env, cwd=work_dir, stdout=log_file, stderr=subprocess.STDOUT,
+    )
+    wall = time.time() - start
+
+    records = []
+    if os.path.exists(trace_file):
+        with open(trace_file, "r", encoding="utf-8") as f:
+            records = [json.loads(line) for line in f if line.strip()]
+    return wall, records
+
+
+def run_single(script, accounts, env, work_dir, log_file):
+    """单账号脚本逐个运行, 返回 (总耗时, 每个账号耗时, 失败数)"""
+    durations = []
+    failed = 0
+    start = time.time()
+    for username, password, secret in accounts:
+        env_one = dict(env)
+        env_one.update({"GH_USERNAME": username, "GH_PASSWORD": password, "GH_2FA_SECRET": secret})
+        t0 = time.time()
+        proc = subprocess.run(
+            [sys.executable, os.path.join(REPO_DIR, SCRIPTS[script])],
+            env=env_one, cwd=work_dir, stdout=log_file, stderr=subprocess.STDOUT,
+        )
+        durations.append(time.time() - t0)
+        failed += proc.returncode != 0
+    return time.time() - start, durations, failed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ClawCloud 脚本端到端基准测试")
+    parser.add_argument("--script", choices=sorted(SCRIPTS), default="plus")
+    parser.add_argument("--accounts", type=int, nargs="+", default=[1, 10, 100])
+    parser.add_argument("--concurrency", type=int, default=1, help="ql-docker-plus.py 的 CLAW_CONCURRENCY")
+    parser.add_argument("--repeat", type=int, default=1, help="每个规模重复运行次数 (后续轮次复用 Cookie)")
+    parser.add_argument("--latency", type=float, default=0, help="模拟服务基础延迟 (毫秒)")
+    parser.add_argument("--login-latency", type=float, default=0, help="登录/2FA/授权额外延迟 (毫秒)")
+    parser.add_argument("--render-delay", type=float, default=0, help="仪表盘渲染延迟 (毫秒)")
+    parser.add_argument("--keep", action="store_true", help="保留工作目录 (日志/追踪/Cookie)")
+    args = parser.parse_args()
+
+    for count in args.accounts:
+        accounts = make_accounts(count)
+        config = MockConfig(
+            latency=args.latency / 1000,
+            login_latency=args.login_latency / 1000,
+            render_delay=args.render_delay / 1000,
+            accounts={username: secret for username, _, secret in accounts},
+        )
+        mock = MockServer(config).start()
+        work_dir = tempfile.mkdtemp(prefix=f"claw_bench_{count}_")
+        env = base_env(mock, work_dir)
+
+        try:
+            for round_no in range(1, args.repeat + 1):
+                print("=" * 72)
+                print(f"📊 {SCRIPTS[args.script]} | 账号数 {count} | 第 {round_no} 轮 | 工作目录 {work_dir}")
+                print("=" * 72)
+                log_path = os.path.join(work_dir, f"run_{round_no}.log")
+                with open(log_path, "w", encoding="utf-8") as log_file:
+                    if args.script == "plus":
+                        wall, records = run_plus(accounts, env, work_dir, args.concurrency, log_file)
+                        accounts_rec = [r for r in records if r.get("stage") == "account"]
+                        failed = sum(1 for r in accounts_rec if r.get("outcome") != "ok")
+                        print(f"总耗时 {wall:.2f}s, 成功 {len(accounts_rec) - failed}/{count}\n")
+
+                        print("每个账号:")
+                        print_table([("account", [r["duration"] for r in accounts_rec])])
+
+                        print("\n每个阶段:")
+                        stages = {}
+                        for r in records:
+                            if r.get("stage") != "account":
+                                stages.setdefault(r["stage"], []).append(r["duration"])
+                        print_table(sorted(stages.items()))
+                    else:
+                        wall, durations, failed = run_single(args.script, accounts, env, work_dir, log_file)
+                        print(f"总耗时 {wall:.2f}s, 成功 {count - failed}/{count}\n")
+                        print("每个账号:")
+                        print_table([("account", durations)])
+                print(f"\n日志: {log_path}\n")
+        finally:
+            mock.stop()
+            if not args.keep:
+                shutil.rmtree(work_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+检查: 同时配置 CLAW_PROXY 与 CLAW_PROXIES 时, 账号的 HTTP 请求 (预检 / 保活) 走代理池分配的代理
+
+本地启动两个假的 HTTP 代理 (只处理明文 HTTP 的绝对地址请求), 一个作为 CLAW_PROXY (全局/通知),
+一个作为代理池成员; 账号请求只应出现在代理池代理上, 命中 NO_PROXY 的本机地址仍然直连。
+
+用法:
+  python -m pytest -q bench/test_proxy_pool.py
+"""
+
+import json
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+CONSOLE_URL = "http://console.bench.invalid"
+
+
+def start_proxy():
+    """假代理: 记录收到的绝对地址, 对会话接口返回已登录的 JSON"""
+    seen = []
+
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, fmt, *args):
+            pass
+
+        def do_GET(self):
+            seen.append(self.path)
+            payload = json.dumps({"code": 200, "data": {"user": "bench"}}).encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}", seen
+
+
+def test_pool_proxy_wins_over_claw_proxy(load_plus):
+    env_server, env_proxy, env_seen = start_proxy()
+    pool_server, pool_proxy, pool_seen = start_proxy()
+    local_server, local_url, local_seen = start_proxy()
+    try:
+        plus = load_plus("claw_plus_proxy_test", {
+            "CLAW_CLOUD_URL": CONSOLE_URL,
+            "CLAW_SESSION_CHECK_PATH": "/api/bench/session",
+            "CLAW_PROXY": env_proxy,
+            "CLAW_PROXIES": pool_proxy,
+            "CLAW_PROXY_PROBE_URL": f"{CONSOLE_URL}/",
+            "CLAW_PROXY_PROBE_TIMEOUT": "3",
+        })
+        # 全局代理确实写入了环境变量, 这正是会覆盖 session.proxies 的来源
+        assert os.environ["https_proxy"] == env_proxy
+
+        assert plus.PROXY_POOL.probe() == [pool_proxy]
+        account = plus.AutoLogin({"username": "bench@example.com", "password": "x"}, 1)
+        assert account.proxy == pool_proxy
+
+        host = CONSOLE_URL.split("//")[1]
+        account.old_cookies = [{"name": "claw_session", "value": "t", "domain": host, "path": "/"}]
+        env_seen.clear()
+        pool_seen.clear()
+        assert account.check_session_http() is True
+        assert account.keepalive_http(plus.keepalive_api_urls()) is True
+        assert pool_seen == [f"{CONSOLE_URL}{plus.CLAW_SESSION_CHECK_PATH}"] * 2
+        assert env_seen == []
+
+        # NO_PROXY 中的本机地址不经过代理
+        account.http.get(f"{local_url}/ping", timeout=5)
+        assert local_seen == ["/ping"]
+        assert len(pool_seen) == 2
+    finally:
+        for server in (env_server, pool_server, local_server):
+            server.shutdown()
+
@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+端到端检查: 通过 bench/tg_webhook_fake.py 向内置 Webhook 接收端推送更新, 验证码应路由到正在等待的账号
+
+本地启动一个假的 Telegram Bot API (setWebhook / sendMessage / deleteWebhook), 两个账号同时进入
+交互式 2FA 等待; 一个用 "#序号 验证码" 发送, 一个回复该账号的提示消息, 两者都应收到各自的验证码。
+浏览器相关的截图与填写步骤替换为记录调用, 其余流程与真实运行相同。
+
+用法:
+  python -m pytest -q bench/test_tg_webhook.py
+"""
+
+import atexit
+import itertools
+import json
+import socket
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from tg_webhook_fake import build_update, post_update
+
+TOKEN = "123456:bench"
+CHAT_ID = 424242
+SECRET = "bench-secret"
+
+
+class FakeBotApi(BaseHTTPRequestHandler):
+    """假的 Telegram Bot API, 记录调用的方法"""
+
+    calls = []
+    message_ids = itertools.count(1000)
+
+    def log_message(self, fmt, *args):
+        pass
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        self.rfile.read(length)
+        method = self.path.rsplit("/", 1)[-1]
+        self.calls.append(method)
+        if method in ("sendMessage", "sendPhoto"):
+            result = {"message_id": next(self.message_ids)}
+        elif method == "getUpdates":
+            result = []
+        else:
+            result = True
+        payload = json.dumps({"ok": True, "result": result}).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def waiting_account(plus, idx, api):
+    """构造一个等待验证码的账号, 截图改为发送文字, 填写验证码改为记录"""
+    account = plus.AutoLogin({"username": f"bench{idx}@example.com", "password": "x"}, idx)
+    account.tg.api = api
+    account.submitted = []
+
+    def shot(name, push_to_tg=False, caption=""):
+        account.last_photo = account.tg.send(caption or name)
+
+    account.shot = shot
+    account.submit_otp = account.submitted.append
+    return account
+
+
+def wait_for(condition, timeout=15):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if condition():
+            return True
+        time.sleep(0.05)
+    return False
+
+
+def test_webhook_update_reaches_waiting_account(load_plus):
+    api_server = ThreadingHTTPServer(("127.0.0.1", 0), FakeBotApi)
+    threading.Thread(target=api_server.serve_forever, daemon=True).start()
+    api = f"http://127.0.0.1:{api_server.server_address[1]}/bot{TOKEN}"
+    webhook_url = f"http://127.0.0.1:{free_port()}/telegram"
+
+    plus = load_plus("claw_plus_webhook_test", {
+        "NO_PROXY": "localhost,127.0.0.1,::1",
+        "no_proxy": "localhost,127.0.0.1,::1",
+        "TG_BOT_TOKEN": TOKEN,
+        "TG_CHAT_ID": str(CHAT_ID),
+        "TG_WEBHOOK_URL": webhook_url,
+        "TG_WEBHOOK_LISTEN": "127.0.0.1",
+        "TG_WEBHOOK_PORT": webhook_url.rsplit(":", 1)[-1].split("/")[0],
+        "TG_WEBHOOK_SECRET": SECRET,
+    })
+    plus.TG_ROUTER.tg.api = api
+    accounts = [waiting_account(plus, idx, api) for idx in (1, 2)]
+    results = {}
+    threads = [
+        threading.Thread(target=lambda a=a: results.setdefault(a.account_index, a.wait_for_2fa_code_via_telegram(20)))
+        for a in accounts
+    ]
+    try:
+        for t in threads:
+            t.start()
+
+        router = plus.TG_ROUTER
+        # 两个账号都已登记并送达提示消息, 且 Webhook 已注册
+        assert wait_for(lambda: len(router.waiters) == 2 and all(len(w.message_ids) == 2 for w in router.waiters))
+        assert wait_for(lambda: "setWebhook" in FakeBotApi.calls)
+
+        status, _ = post_update(webhook_url, "wrong", build_update(1, CHAT_ID, "#1 111111"))
+        assert status == 403
+
+        # 账号开始等待之前发送的消息 (例如上一次等待超时后才回复的验证码) 不会被投递
+        stale = build_update(2, CHAT_ID, "#1 999999", date=int(time.time()) - 600)
+        status, _ = post_update(webhook_url, SECRET, stale)
+        assert status == 200
+
+        status, _ = post_update(webhook_url, SECRET, build_update(4, CHAT_ID, "#1 111111"))
+        assert status == 200
+        waiter = next(w for w in router.waiters if w.tag == "2")
+        reply_to = sorted(waiter.message_ids)[0]
+        status, _ = post_update(webhook_url, SECRET, build_update(3, CHAT_ID, "222222", reply_to=reply_to))
+        assert status == 200
+        # 重复推送同一 update_id 不会再次投递
+        post_update(webhook_url, SECRET, build_update(3, CHAT_ID, "222222", reply_to=reply_to))
+
+        for t in threads:
+            t.join(timeout=20)
+        assert results == {1: True, 2: True}
+        assert accounts[0].submitted == ["111111"]
+        assert accounts[1].submitted == ["222222"]
+        assert "getUpdates" not in FakeBotApi.calls
+    finally:
+        atexit.unregister(plus.TG_ROUTER.delete_webhook)
+        plus.TG_ROUTER.delete_webhook()
+        api_server.shutdown()
+
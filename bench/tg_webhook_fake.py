@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+模拟 Telegram 向内置 Webhook 接收端推送更新, 用于在本地测试交互式 2FA 验证码路由
+
+用法 (脚本以 TG_WEBHOOK_URL=http://127.0.0.1:8787/telegram 运行, 并固定 TG_WEBHOOK_SECRET):
+  python bench/tg_webhook_fake.py --secret s3cret --chat-id 123456 --text "#1 123456"
+  python bench/tg_webhook_fake.py --secret s3cret --chat-id 123456 --text 123456 --reply-to 42
+  python bench/tg_webhook_fake.py --secret wrong --text 123456     # 预期返回 403
+"""
+
+import argparse
+import json
+import time
+import urllib.error
+import urllib.request
+
+
+def build_update(update_id, chat_id, text, reply_to=None, date=None):
+    """构造与 Telegram Bot API 相同结构的 message 更新"""
+    message = {
+        "message_id": update_id,
+        "date": date or int(time.time()),
+        "chat": {"id": chat_id, "type": "private"},
+        "from": {"id": chat_id, "is_bot": False, "first_name": "bench"},
+        "text": text,
+    }
+    if reply_to:
+        message["reply_to_message"] = {"message_id": reply_to, "chat": {"id": chat_id, "type": "private"}}
+    return {"update_id": update_id, "message": message}
+
+
+def post_update(url, secret, update):
+    """POST 一条更新, 返回 (HTTP 状态码, 耗时秒数)"""
+    request = urllib.request.Request(
+        url,
+        data=json.dumps(update).encode("utf-8"),
+        headers={"Content-Type": "application/json", "X-Telegram-Bot-Api-Secret-Token": secret},
+        method="POST",
+    )
+    start = time.time()
+    try:
+        with urllib.request.urlopen(request, timeout=10) as resp:
+            status = resp.status
+    except urllib.error.HTTPError as e:
+        status = e.code
+    return status, time.time() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="模拟 Telegram Webhook 推送")
+    parser.add_argument("--url", default="http://127.0.0.1:8787/telegram", help="内置接收端地址")
+    parser.add_argument("--secret", required=True, help="与 TG_WEBHOOK_SECRET 相同")
+    parser.add_argument("--chat-id", type=int, default=0, help="与 TG_CHAT_ID 相同")
+    parser.add_argument("--text", required=True, help="消息内容, 例如 123456 或 \"#2 123456\"")
+    parser.add_argument("--reply-to", type=int, default=None, help="回复的 message_id (截图/提示消息)")
+    parser.add_argument("--update-id", type=int, default=None, help="默认按当前时间生成")
+    parser.add_argument("--repeat", type=int, default=1, help="重复推送同一条更新 (测试去重)")
+    args = parser.parse_args()
+
+    update = build_update(args.update_id or int(time.time() * 1000) % 10**9, args.chat_id, args.text, args.reply_to)
+    for _ in range(args.repeat):
+        status, elapsed = post_update(args.url, args.secret, update)
+        print(f"update_id={update['update_id']} -> HTTP {status} ({elapsed * 1000:.1f} ms)")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,13 +1,213 @@
 # 文件名: login_script.py
 # 作用: 自动登录 ClawCloud Run，支持 GitHub 账号密码 + 2FA 自动验证
 # 仅新增：Telegram 接收消息（成功 / 失败样本）
+# 多账号: 一个浏览器内每个账号独立的 BrowserContext 并发运行, 登录状态 (storage_state) 按账号保存复用
 
 import os
+import re
+import sys
 import time
+import asyncio
 import pyotp
 import requests
 from datetime import datetime
-from playwright.sync_api import sync_playwright
+from urllib.parse import urlparse
+from playwright.async_api import async_playwright, TimeoutError as PlaywrightTimeoutError
+
+
+def get_env_int(name, default):
+    try:
+        return int(os.environ.get(name, default))
+    except ValueError:
+        return default
+
+
+TARGET_URL = os.environ.get("CLAW_CLOUD_URL", "https://ap-northeast-1.run.claw.cloud/")
+# 同时运行的账号数量 (每个账号一个 BrowserContext, 共用一个浏览器)
+CONCURRENCY = max(1, get_env_int("CLAW_CONCURRENCY", 3))
+# 每个账号的 storage_state 保存目录 (GitHub Actions 中配合缓存使用)
+STATE_DIR = os.environ.get("CLAW_STATE_DIR", "claw_state")
+# 单个账号登录流程的总超时 (秒)
+LOGIN_TIMEOUT = get_env_int("CLAW_LOGIN_TIMEOUT", 180)
+# 同一页面状态最多处理次数, 超过视为卡住
+MAX_STATE_VISITS = 3
+# TOTP: 当前时间窗口剩余不足该秒数时等待下一个窗口再生成, 避免提交前过期
+TOTP_MIN_REMAINING = get_env_int("CLAW_TOTP_MIN_REMAINING", 5)
+# 提交验证码后等待离开两步验证页的时间 (秒), 超时视为验证码被拒绝
+TOTP_VERIFY_TIMEOUT = get_env_int("CLAW_TOTP_VERIFY_TIMEOUT", 15)
+# GitHub 输满 6 位会自动提交; 输入后这段时间内仍未开始提交才按回车 (秒)
+OTP_AUTO_SUBMIT_GRACE = 2
+
+# 余额接口: 从控制台自身的 JSON 接口响应中读取余额 (URL 关键字, 逗号分隔)
+BALANCE_API_PATTERNS = [
+    p.strip() for p in os.environ.get("CLAW_BALANCE_API", "/api/account/getAmount").split(",") if p.strip()
+]
+# 接口金额单位换算: 控制台 (Sealos) 接口以 1/1000000 美元为单位
+BALANCE_SCALE = max(1, get_env_int("CLAW_BALANCE_SCALE", 1000000))
+# 进入控制台后等待余额接口响应的时间 (秒)
+BALANCE_WAIT = get_env_int("CLAW_BALANCE_WAIT", 10)
+
+# 输入验证码前监听表单提交与页面卸载, 用于判断自动提交是否已经开始
+OTP_SUBMIT_WATCH_JS = """
+(input) => {
+    window.__clawOtpSubmitted = false;
+    const mark = () => { window.__clawOtpSubmitted = true; };
+    if (input.form) input.form.addEventListener('submit', mark, true);
+    window.addEventListener('beforeunload', mark);
+}
+"""
+OTP_SUBMIT_STARTED_JS = """
+(input) => !input.isConnected || window.__clawOtpSubmitted === true || document.readyState !== 'complete'
+"""
+
+STATE_LANDING = "landing"
+STATE_GITHUB_LOGIN = "github_login"
+STATE_TWO_FACTOR = "two_factor"
+STATE_AUTHORIZE = "authorize"
+STATE_DASHBOARD = "dashboard"
+STATE_UNKNOWN = "unknown"
+
+# 一次脚本注入识别当前页面所处的登录阶段
+PAGE_STATE_JS = """
+() => {
+    const url = location.href;
+    const text = document.body ? document.body.innerText : '';
+    if (url.includes('github.com')) {
+        if (document.querySelector('#app_totp') || url.includes('two-factor')) return 'two_factor';
+        if (document.querySelector('#login_field')) return 'github_login';
+        if (url.toLowerCase().includes('authorize')) return 'authorize';
+        return 'unknown';
+    }
+    if (text.includes('App Launchpad') || text.includes('Devbox')
+        || url.includes('private-team') || url.includes('console')) return 'dashboard';
+    const buttons = document.querySelectorAll('button, a');
+    for (const el of buttons) {
+        if ((el.innerText || '').includes('GitHub')) return 'landing';
+    }
+    return 'unknown';
+}
+"""
+
+
+# 资源拦截: 屏蔽图片/媒体/字体及第三方统计脚本, 减少流量与加载时间
+BLOCK_RESOURCES = os.environ.get("CLAW_BLOCK_RESOURCES", "1").strip().lower() in ("1", "true", "yes", "on")
+BLOCK_RESOURCE_TYPES = {"image", "media", "font"}
+BLOCK_HOSTS = [
+    "google-analytics.com", "googletagmanager.com", "doubleclick.net",
+    "fonts.googleapis.com", "fonts.gstatic.com", "hotjar.com", "clarity.ms",
+    "sentry.io", "intercom.io", "intercomcdn.com", "facebook.net", "crisp.chat",
+] + [h.strip() for h in os.environ.get("CLAW_BLOCK_EXTRA", "").split(",") if h.strip()]
+
+
+class ResourceBlocker:
+    """通过 route 拦截不需要的资源, 并统计请求数与实际传输字节数"""
+
+    def __init__(self):
+        self.requests = 0
+        self.blocked = 0
+        self.bytes = 0
+
+    def should_block(self, request):
+        if request.resource_type in BLOCK_RESOURCE_TYPES:
+            return True
+        host = urlparse(request.url).hostname or ""
+        return any(host == h or host.endswith("." + h) for h in BLOCK_HOSTS)
+
+    async def handle(self, route, request):
+        self.requests += 1
+        if self.should_block(request):
+            self.blocked += 1
+            await route.abort()
+        else:
+            await route.continue_()
+
+    async def on_finished(self, request):
+        try:
+            sizes = await request.sizes()
+            self.bytes += sizes.get("responseBodySize", 0) + sizes.get("responseHeadersSize", 0)
+        except Exception:
+            pass
+
+    async def attach(self, context):
+        await context.route("**/*", self.handle)
+        context.on("requestfinished", self.on_finished)
+
+    def summary(self):
+        return f"请求 {self.requests} 个, 拦截 {self.blocked} 个, 实际传输 {self.bytes / 1024:.1f} KB"
+
+
+def find_json_key(data, keys):
+    """深度优先查找包含任一 key 的字典, 返回 (字典, key)"""
+    if isinstance(data, dict):
+        for key in keys:
+            if key in data:
+                return data, key
+        children = data.values()
+    elif isinstance(data, list):
+        children = data
+    else:
+        return None, None
+    for child in children:
+        node, key = find_json_key(child, keys)
+        if node is not None:
+            return node, key
+    return None, None
+
+
+def parse_balance_payload(data):
+    """解析余额接口 JSON: {"data": {"balance": 总充值, "deductionBalance": 已消费}}, 剩余 = 两者之差"""
+    node, _ = find_json_key(data, ["balance"])
+    if node is None:
+        return None
+    try:
+        total = float(node["balance"])
+        used = float(node.get("deductionBalance") or 0)
+    except (TypeError, ValueError):
+        return None
+
+    info = {"balance": f"${(total - used) / BALANCE_SCALE:.2f}"}
+    if "deductionBalance" in node:
+        info["used"] = f"${used / BALANCE_SCALE:.2f}"
+    plan_node, plan_key = find_json_key(data, ["plan", "planName", "subscription"])
+    if plan_node is not None and isinstance(plan_node[plan_key], str):
+        info["plan"] = plan_node[plan_key]
+    return info
+
+
+async def fresh_totp(secret, used=None, min_remaining=TOTP_MIN_REMAINING):
+    """生成剩余有效时间充足的 TOTP 验证码
+
+    当前时间窗口剩余不足 min_remaining 秒, 或验证码与 used (刚被拒绝的验证码) 相同时,
+    等待进入下一个时间窗口再生成 (只挂起当前账号)。返回 (验证码, 剩余有效秒数)。
+    """
+    totp = pyotp.TOTP(secret)
+    while True:
+        now = time.time()
+        remaining = totp.interval - now % totp.interval
+        code = totp.at(now)
+        if remaining >= min_remaining and code != used:
+            return code, remaining
+        await asyncio.sleep(remaining + 0.1)
+
+
+def load_accounts():
+    """读取账号: 优先 CLAW_ACCOUNTS (与 ql-docker-plus.py 格式相同), 其次 GH_USERNAME 单账号"""
+    accounts = []
+    for acc_str in os.environ.get("CLAW_ACCOUNTS", "").strip().split("&"):
+        parts = acc_str.strip().split("----")
+        if len(parts) >= 2:
+            accounts.append({
+                "username": parts[0].split('#')[0].strip(),
+                "password": parts[1].strip(),
+                "totp_secret": parts[2].strip() if len(parts) > 2 else "",
+            })
+    if not accounts and os.environ.get("GH_USERNAME"):
+        accounts.append({
+            "username": os.environ.get("GH_USERNAME", "").strip(),
+            "password": os.environ.get("GH_PASSWORD", "").strip(),
+            "totp_secret": os.environ.get("GH_2FA_SECRET", "").strip(),
+        })
+    return accounts
 
 
 def mask_account(account: str) -> str:
@@ -41,127 +241,247 @@ def send_tg_message(text: str):
         print(f"⚠️ TG 消息发送失败: {e}")
 
 
-def run_login():
-    username = os.environ.get("GH_USERNAME")
-    password = os.environ.get("GH_PASSWORD")
-    totp_secret = os.environ.get("GH_2FA_SECRET")
+def state_path(username):
+    return os.path.join(STATE_DIR, f"state_{re.sub(r'[^A-Za-z0-9_-]', '_', username)}.json")
 
-    now_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    masked_user = mask_account(username)
 
-    if not username or not password:
-        msg = (
-            "❌ ClawCloud 登录失败\n\n"
-            f"👤 账号：{masked_user}\n"
-            f"🕒 时间：{now_time}\n"
-            "⚠️ 原因：缺少 GH_USERNAME 或 GH_PASSWORD"
-        )
-        print(msg)
-        send_tg_message(msg)
-        return
+class AccountLogin:
+    """单个账号的登录流程, 运行在独立的 BrowserContext 中"""
 
-    print("🚀 [Step 1] 启动浏览器...")
-    with sync_playwright() as p:
-        browser = p.chromium.launch(headless=True)
-        context = browser.new_context(viewport={'width': 1920, 'height': 1080})
-        page = context.new_page()
+    def __init__(self, browser, account, index):
+        self.browser = browser
+        self.username = account["username"]
+        self.password = account["password"]
+        self.totp_secret = account["totp_secret"]
+        self.index = index
+        self.masked = mask_account(self.username)
+        self.screenshot = f"login_result_{index}.png"
+        self.blocker = ResourceBlocker()
+        self.context = None
+        self.page = None
+        self.reason = ""
+        self.reused_state = False
+        self.balance_info = {}
+        self.balance_ready = asyncio.Event()
 
-        target_url = "https://ap-northeast-1.run.claw.cloud/"
-        print(f"🌐 [Step 2] 正在访问: {target_url}")
-        page.goto(target_url)
-        page.wait_for_load_state("networkidle")
+    def log(self, msg):
+        print(f"[{self.index}:{self.masked}] {msg}")
 
-        print("🔍 [Step 3] 寻找 GitHub 按钮...")
+    async def on_response(self, response):
+        """监听余额接口响应, 接口返回即得到准确余额, 无需扫描页面"""
+        if self.balance_ready.is_set() or not any(p in response.url for p in BALANCE_API_PATTERNS):
+            return
         try:
-            page.locator("button:has-text('GitHub')").click(timeout=10000)
-        except:
-            pass
+            info = parse_balance_payload(await response.json())
+        except Exception:
+            return
+        if info:
+            self.balance_info = info
+            self.balance_ready.set()
 
-        print("⏳ [Step 4] 等待跳转到 GitHub...")
+    async def wait_balance(self):
         try:
-            page.wait_for_url(lambda url: "github.com" in url, timeout=15000)
-            if "login" in page.url:
-                page.fill("#login_field", username)
-                page.fill("#password", password)
-                page.click("input[name='commit']")
-        except:
-            pass
+            await asyncio.wait_for(self.balance_ready.wait(), BALANCE_WAIT)
+        except asyncio.TimeoutError:
+            self.log("⚠️ 未捕获到余额接口响应")
+
+    async def page_state(self):
+        try:
+            return await self.page.evaluate(PAGE_STATE_JS)
+        except Exception:
+            # 跳转过程中执行上下文被销毁, 视为尚未就绪
+            return STATE_UNKNOWN
+
+    async def wait_state(self, timeout, leave=None):
+        """轮询页面状态, 直到识别出已知状态 (且不是 leave) 或超时"""
+        deadline = time.monotonic() + timeout
+        state = STATE_UNKNOWN
+        while time.monotonic() < deadline:
+            state = await self.page_state()
+            if state != STATE_UNKNOWN and state != leave:
+                return state
+            await asyncio.sleep(0.25)
+        return state
+
+    async def handle_landing(self):
+        await self.page.locator("button:has-text('GitHub'), a:has-text('GitHub')").first.click(timeout=10000)
 
-        page.wait_for_timeout(3000)
+    async def handle_github_login(self):
+        await self.page.fill("#login_field", self.username)
+        await self.page.fill("#password", self.password)
+        await self.page.click("input[name='commit']")
 
-        if "two-factor" in page.url or page.locator("#app_totp").count() > 0:
-            print("🔐 [Step 5] 检测到 2FA")
-            if totp_secret:
+    async def handle_two_factor(self):
+        if not self.totp_secret:
+            raise RuntimeError("检测到 2FA 但未配置 2FA 密钥")
+        used = None
+        for attempt in (1, 2):
+            token, remaining = await fresh_totp(self.totp_secret, used)
+            self.log(f"填写 2FA 验证码 (剩余有效 {remaining:.0f} 秒)")
+            field = await self.page.wait_for_selector("#app_totp")
+            await field.evaluate(OTP_SUBMIT_WATCH_JS)
+            await field.fill(token)
+            # GitHub 填满 6 位会自动提交, 没有开始提交时再按回车
+            if not await self.otp_submitted(field):
                 try:
-                    token = pyotp.TOTP(totp_secret).now()
-                    page.fill("#app_totp", token)
-                except Exception as e:
-                    msg = (
-                        "❌ ClawCloud 登录失败\n\n"
-                        f"👤 账号：{masked_user}\n"
-                        f"🕒 时间：{now_time}\n"
-                        f"⚠️ 原因：2FA 验证码填写失败\n{e}"
-                    )
-                    print(msg)
-                    send_tg_message(msg)
-            else:
-                msg = (
-                    "🚨 ClawCloud 登录中断（致命）\n\n"
-                    f"👤 账号：{masked_user}\n"
-                    f"🕒 时间：{now_time}\n"
-                    "❌ 检测到 2FA 但未配置 GH_2FA_SECRET"
-                )
-                print(msg)
-                send_tg_message(msg)
-                exit(1)
-
-        page.wait_for_timeout(3000)
-        if "authorize" in page.url.lower():
-            try:
-                page.click("button:has-text('Authorize')", timeout=5000)
-            except:
-                pass
+                    await field.press("Enter")
+                except Exception:
+                    pass
 
-        print("⏳ [Step 6] 等待跳转回 ClawCloud 控制台...")
-        page.wait_for_timeout(20000)
+            # 校验结果: 离开两步验证页即为通过
+            if await self.wait_state(TOTP_VERIFY_TIMEOUT, leave=STATE_TWO_FACTOR) != STATE_TWO_FACTOR:
+                return
+            used = token
+            if attempt == 1:
+                self.log("⚠️ 2FA 验证码未通过，使用下一个时间窗口的验证码重试")
+        raise RuntimeError("2FA 验证码两次均未通过，请检查 2FA 密钥与系统时间")
 
-        final_url = page.url
-        page.screenshot(path="login_result.png")
+    async def otp_submitted(self, field):
+        """等待自动提交完成 (输入框随页面跳转失效), 期间不再按回车, 避免同一验证码提交两次"""
+        try:
+            await self.page.wait_for_function(OTP_SUBMIT_STARTED_JS, arg=field, timeout=OTP_AUTO_SUBMIT_GRACE * 1000)
+        except PlaywrightTimeoutError:
+            return False
+        except Exception:
+            # 页面已跳转, 原输入框所在的执行上下文已销毁
+            return True
+        try:
+            await self.page.wait_for_function(
+                "(input) => !input.isConnected", arg=field, timeout=TOTP_VERIFY_TIMEOUT * 1000
+            )
+        except Exception:
+            pass
+        return True
+
+    async def handle_authorize(self):
+        await self.page.click("button:has-text('Authorize')", timeout=5000)
 
-        is_success = False
-        if page.get_by_text("App Launchpad").count() > 0:
-            is_success = True
-        elif page.get_by_text("Devbox").count() > 0:
-            is_success = True
-        elif "private-team" in final_url or "console" in final_url:
-            is_success = True
-        elif "signin" not in final_url and "github.com" not in final_url:
-            is_success = True
+    async def login_flow(self):
+        """页面状态机: 着陆页 -> GitHub 登录 -> 2FA -> 授权 -> 控制台"""
+        handlers = {
+            STATE_LANDING: self.handle_landing,
+            STATE_GITHUB_LOGIN: self.handle_github_login,
+            STATE_TWO_FACTOR: self.handle_two_factor,
+            STATE_AUTHORIZE: self.handle_authorize,
+        }
+        deadline = time.monotonic() + LOGIN_TIMEOUT
+        visits = {}
+        state = await self.wait_state(30)
+        while state != STATE_DASHBOARD and time.monotonic() < deadline:
+            if state not in handlers:
+                self.reason = "无法识别当前页面"
+                return False
+            visits[state] = visits.get(state, 0) + 1
+            if visits[state] > MAX_STATE_VISITS:
+                self.reason = f"页面状态 {state} 重复出现，登录卡住"
+                return False
+            self.log(f"处理页面: {state}")
+            await handlers[state]()
+            state = await self.wait_state(min(30, max(1, deadline - time.monotonic())), leave=state)
+        if state != STATE_DASHBOARD:
+            self.reason = self.reason or "GitHub 登录或 2FA 未通过"
+        return state == STATE_DASHBOARD
 
-        if is_success:
-            msg = (
+    async def run(self):
+        path = state_path(self.username)
+        options = {"viewport": {'width': 1920, 'height': 1080}}
+        if os.path.exists(path):
+            options["storage_state"] = path
+            self.reused_state = True
+        self.context = await self.browser.new_context(**options)
+        if BLOCK_RESOURCES:
+            await self.blocker.attach(self.context)
+        self.page = await self.context.new_page()
+        self.page.on("response", self.on_response)
+
+        try:
+            self.log(f"🌐 正在访问: {TARGET_URL}" + (" (复用登录状态)" if self.reused_state else ""))
+            await self.page.goto(TARGET_URL)
+            success = await self.login_flow()
+            if success:
+                await self.wait_balance()
+            await self.page.screenshot(path=self.screenshot)
+            if success:
+                os.makedirs(STATE_DIR, exist_ok=True)
+                await self.context.storage_state(path=path)
+            if BLOCK_RESOURCES:
+                self.log(f"🚫 资源拦截: {self.blocker.summary()}")
+            return success
+        except Exception as e:
+            self.reason = self.reason or str(e)
+            try:
+                await self.page.screenshot(path=self.screenshot)
+            except Exception:
+                pass
+            return False
+        finally:
+            await self.context.close()
+
+    def message(self, success):
+        now_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        if success:
+            return (
                 "🎉 ClawCloud 登录成功\n\n"
-                f"👤 账号：{masked_user}\n"
+                f"👤 账号：{self.masked}\n"
                 f"🕒 时间：{now_time}\n"
-                "🌐 控制台：\n"
-                f"{final_url}"
+                + ("♻️ 复用已保存的登录状态\n" if self.reused_state else "")
+                + (f"💵 当前剩余：{self.balance_info['balance']}\n" if self.balance_info else "")
+                + (f"📉 已消费：{self.balance_info['used']}\n" if "used" in self.balance_info else "")
+                + (f"📦 套餐：{self.balance_info['plan']}\n" if "plan" in self.balance_info else "")
+                + "🌐 控制台：\n"
+                f"{self.page.url}"
             )
-            print(msg)
-            send_tg_message(msg)
+        return (
+            "❌ ClawCloud 登录失败\n\n"
+            f"👤 账号：{self.masked}\n"
+            f"🕒 时间：{now_time}\n"
+            f"⚠️ 原因：{self.reason}\n\n"
+            f"📸 已生成调试截图：{self.screenshot}"
+        )
+
+
+async def run_account(browser, semaphore, account, index):
+    async with semaphore:
+        login = AccountLogin(browser, account, index)
+        if not login.password:
+            login.reason = "缺少账号密码"
+            success = False
         else:
-            msg = (
-                "❌ ClawCloud 登录失败\n\n"
-                f"👤 账号：{masked_user}\n"
-                f"🕒 时间：{now_time}\n"
-                "⚠️ 原因：GitHub 登录或 2FA 未通过\n\n"
-                "📸 已生成调试截图：login_result.png"
-            )
-            print(msg)
-            send_tg_message(msg)
-            exit(1)
+            success = await login.run()
+        msg = login.message(success)
+        print(msg)
+        await asyncio.to_thread(send_tg_message, msg)
+        return success
+
+
+async def run_login():
+    accounts = load_accounts()
+    if not accounts:
+        msg = (
+            "❌ ClawCloud 登录失败\n\n"
+            f"🕒 时间：{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n"
+            "⚠️ 原因：缺少 CLAW_ACCOUNTS 或 GH_USERNAME / GH_PASSWORD"
+        )
+        print(msg)
+        send_tg_message(msg)
+        return False
+
+    print(f"🚀 启动浏览器... 共 {len(accounts)} 个账号, 并发 {min(CONCURRENCY, len(accounts))}")
+    semaphore = asyncio.Semaphore(CONCURRENCY)
+    async with async_playwright() as p:
+        browser = await p.chromium.launch(headless=True)
+        try:
+            results = await asyncio.gather(*[
+                run_account(browser, semaphore, account, index)
+                for index, account in enumerate(accounts, 1)
+            ])
+        finally:
+            await browser.close()
 
-        browser.close()
+    print(f"✅ 完成: 成功 {sum(results)}/{len(results)}")
+    return all(results)
 
 
 if __name__ == "__main__":
-    run_login()
+    if not asyncio.run(run_login()):
+        sys.exit(1)
@@ -10,10 +10,34 @@ import os
 import sys
 import time
 import json
+import math
+import queue
+import random
+import signal
+import socketserver
+import secrets
+import collections
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import atexit
+import shutil
+import socket
+import tempfile
+import threading
+import sqlite3
+import subprocess
 import requests
 import re
+import io
+import base64
+import hashlib
 import pyotp
+import argparse
+from contextlib import closing, contextmanager
+from requests.adapters import HTTPAdapter
+from requests.utils import should_bypass_proxies
+from concurrent.futures import Future, ThreadPoolExecutor
 from datetime import datetime
+from urllib.parse import urlparse
 from loguru import logger
 from selenium import webdriver
 from selenium.webdriver.chrome.options import Options
@@ -22,7 +46,13 @@ from selenium.webdriver.common.by import By
 from selenium.webdriver.common.keys import Keys
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
-from selenium.common.exceptions import TimeoutException, NoSuchElementException
+from selenium.common.exceptions import TimeoutException, NoSuchElementException, WebDriverException
+
+try:
+    # 可选依赖: 安装 Pillow 后截图会缩放并压缩为 JPEG 再上传
+    from PIL import Image
+except ImportError:
+    Image = None
 
 # ============ 配置区域 ============
 
@@ -35,12 +65,14 @@ ACCOUNTS_CONFIG = []
 # 格式: 用户名----密码----2FA密钥(可选)
 # 多个账号用 & 分隔
 
-def load_accounts_from_env():
-    """从环境变量加载账号配置"""
+def load_accounts_from_env(env_accounts=None):
+    """从环境变量加载账号配置 (常驻模式重新加载时由控制命令传入 CLAW_ACCOUNTS 的值)"""
     accounts = []
     
     # 优先使用环境变量
-    env_accounts = os.environ.get("CLAW_ACCOUNTS", "").strip()
+    if env_accounts is None:
+        env_accounts = os.environ.get("CLAW_ACCOUNTS", "")
+    env_accounts = env_accounts.strip()
     
     if env_accounts:
         logger.info("从环境变量 CLAW_ACCOUNTS 加载账号配置")
@@ -71,7 +103,293 @@ WECHAT_AUTH_TOKEN = os.environ.get("WECHAT_AUTH_TOKEN", "").strip()
 CLAW_CLOUD_URL = os.environ.get("CLAW_CLOUD_URL", "https://eu-central-1.run.claw.cloud").strip()
 
 # 脚本目录
-SCRIPT_DIR = "/ql/data/scripts"
+SCRIPT_DIR = os.environ.get("CLAW_SCRIPT_DIR", "/ql/data/scripts").strip()
+CLAW_HOST = CLAW_CLOUD_URL.split("//")[-1].split("/")[0].split(":")[0]
+
+
+def is_claw_cookie(cookie):
+    """是否为 ClawCloud 域名下的 Cookie (包括自定义 CLAW_CLOUD_URL 的域名)"""
+    domain = cookie.get("domain", "")
+    return "claw.cloud" in domain or domain.lstrip(".") == CLAW_HOST
+
+
+def get_env_int(name, default):
+    """读取整数型环境变量, 非法值回退到默认值"""
+    value = os.environ.get(name, "").strip()
+    if value.lstrip("-").isdigit():
+        return int(value)
+    return default
+
+
+def get_env_bool(name, default=False):
+    """读取布尔型环境变量 (1/true/yes/on 视为开启)"""
+    value = os.environ.get(name, "").strip().lower()
+    if not value:
+        return default
+    return value in ("1", "true", "yes", "on")
+
+
+# 并发数: 同时处理的账号数量 (每个账号一个 Chromium, 低内存机器建议保持 1~2)
+CLAW_CONCURRENCY = max(1, get_env_int("CLAW_CONCURRENCY", 1))
+
+# 浏览器池模式: 整次运行只启动一个 Chromium, 每个账号使用独立的浏览器上下文 (Cookie 互不共享)
+CLAW_BROWSER_POOL = get_env_bool("CLAW_BROWSER_POOL")
+
+# 免浏览器预检: 先用本地 Cookie 直接请求 ClawCloud 接口, 会话有效时不再启动浏览器
+CLAW_FAST_CHECK = get_env_bool("CLAW_FAST_CHECK", True)
+# 预检使用的轻量鉴权接口 (需返回 JSON, 未登录时返回 401/403 或跳转到 /signin)
+# 控制台没有公开的会话接口, 需在浏览器开发者工具中确认后配置; 未配置时不做预检, HTTP 保活也回退为浏览器
+CLAW_SESSION_CHECK_PATH = os.environ.get("CLAW_SESSION_CHECK_PATH", "").strip()
+
+# 保活方式: http (复用会话 Cookie 直接请求, 毫秒级, 需配置 CLAW_SESSION_CHECK_PATH) / browser (浏览器加载页面)
+CLAW_KEEPALIVE_MODE = os.environ.get("CLAW_KEEPALIVE_MODE", "http").strip().lower()
+# 额外需要保活的区域地址, 多个用逗号分隔 (例如 https://ap-northeast-1.run.claw.cloud)
+CLAW_KEEPALIVE_REGIONS = [
+    u.strip().rstrip("/") for u in os.environ.get("CLAW_KEEPALIVE_REGIONS", "").split(",") if u.strip()
+]
+
+# 阶段耗时追踪文件 (JSONL, 每个阶段一行), 设为空字符串可关闭
+CLAW_TRACE_FILE = os.environ.get("CLAW_TRACE_FILE", os.path.join(SCRIPT_DIR, "claw_trace.jsonl")).strip()
+
+# 通知发送失败后的最大重试次数 (指数退避)
+NOTIFY_RETRIES = max(0, get_env_int("CLAW_NOTIFY_RETRIES", 3))
+# 未配置 2FA 密钥时, 通过 TG 等待用户回复验证码的最长时间 (秒)
+TG_2FA_WAIT = max(1, get_env_int("TG_2FA_WAIT", 180))
+
+# 可选: Telegram Webhook 公网地址 (通过隧道转发到本机), 配置后验证码由 Telegram 主动推送, 不再轮询
+TG_WEBHOOK_URL = os.environ.get("TG_WEBHOOK_URL", "").strip()
+TG_WEBHOOK_LISTEN = os.environ.get("TG_WEBHOOK_LISTEN", "0.0.0.0").strip()
+TG_WEBHOOK_PORT = get_env_int("TG_WEBHOOK_PORT", 8787)
+# Webhook 校验密钥 (X-Telegram-Bot-Api-Secret-Token), 未配置时每次启动随机生成
+TG_WEBHOOK_SECRET = os.environ.get("TG_WEBHOOK_SECRET", "").strip() or secrets.token_urlsafe(24)
+
+# 截图: 默认只在内存中处理并直接上传, CLAW_SAVE_SHOTS=1 时额外保存到脚本目录便于调试
+CLAW_SAVE_SHOTS = get_env_bool("CLAW_SAVE_SHOTS")
+CLAW_SHOT_FORMAT = os.environ.get("CLAW_SHOT_FORMAT", "jpeg").strip().lower()
+CLAW_SHOT_MAX_WIDTH = get_env_int("CLAW_SHOT_MAX_WIDTH", 1280)
+CLAW_SHOT_QUALITY = get_env_int("CLAW_SHOT_QUALITY", 70)
+
+# 会话存储 (SQLite), 所有账号的 Cookie 保存在同一个库中
+CLAW_SESSION_DB = os.environ.get("CLAW_SESSION_DB", os.path.join(SCRIPT_DIR, "claw_sessions.db")).strip()
+
+# 调度: 距上次成功不足保活间隔、且会话 Cookie 不会在临界时间内过期的账号本次跳过
+KEEPALIVE_INTERVAL_HOURS = get_env_int("CLAW_KEEPALIVE_INTERVAL_HOURS", 20)
+RELOGIN_MARGIN_HOURS = get_env_int("CLAW_RELOGIN_MARGIN_HOURS", 48)
+# 忽略调度计划, 处理所有账号
+CLAW_FORCE_RUN = get_env_bool("CLAW_FORCE_RUN")
+
+# 资源拦截: 通过 DevTools 协议屏蔽图片/媒体/字体及第三方统计脚本, 减少流量与加载时间
+CLAW_BLOCK_RESOURCES = get_env_bool("CLAW_BLOCK_RESOURCES", True)
+BLOCK_URL_PATTERNS = [
+    # 图片 / 媒体 / 字体
+    "*.png", "*.jpg", "*.jpeg", "*.gif", "*.webp", "*.ico", "*.bmp",
+    "*.mp4", "*.webm", "*.mp3", "*.ogg",
+    "*.woff", "*.woff2", "*.ttf", "*.otf", "*.eot",
+    # 第三方统计 / 广告 / 客服
+    "*google-analytics.com*", "*googletagmanager.com*", "*doubleclick.net*",
+    "*fonts.googleapis.com*", "*fonts.gstatic.com*", "*hotjar.com*", "*clarity.ms*",
+    "*sentry.io*", "*intercom.io*", "*intercomcdn.com*", "*facebook.net*", "*crisp.chat*",
+] + [p.strip() for p in os.environ.get("CLAW_BLOCK_EXTRA", "").split(",") if p.strip()]
+
+# 余额接口: 从控制台自身的 JSON 接口响应中读取余额 (URL 关键字, 逗号分隔), 失败时回退为页面扫描
+BALANCE_API_PATTERNS = [
+    p.strip() for p in os.environ.get("CLAW_BALANCE_API", "/api/account/getAmount").split(",") if p.strip()
+]
+# 接口金额单位换算: 控制台 (Sealos) 接口以 1/1000000 美元为单位
+BALANCE_SCALE = max(1, get_env_int("CLAW_BALANCE_SCALE", 1000000))
+# 进入仪表盘后等待余额接口响应的时间 (秒)
+BALANCE_WAIT = get_env_int("CLAW_BALANCE_WAIT", 10)
+
+# 余额历史: 预测余额耗尽天数的统计窗口 (天), 剩余天数低于阈值时在汇总中提醒
+BALANCE_WINDOW_DAYS = max(1, get_env_int("CLAW_BALANCE_WINDOW_DAYS", 30))
+BALANCE_WARN_DAYS = get_env_int("CLAW_BALANCE_WARN_DAYS", 7)
+# 区域名: eu-central-1.run.claw.cloud -> eu-central-1
+CLAW_REGION = CLAW_HOST.split(".run.")[0]
+
+# 持久化浏览器配置: 每个账号使用固定的 --user-data-dir, 复用 HTTP 缓存 / localStorage / 浏览器会话
+CLAW_PERSIST_PROFILE = get_env_bool("CLAW_PERSIST_PROFILE")
+CLAW_PROFILE_DIR = os.environ.get("CLAW_PROFILE_DIR", os.path.join(SCRIPT_DIR, "profiles")).strip()
+# 单个配置目录的大小上限 (MB), 超出后按最久未使用淘汰缓存文件
+CLAW_PROFILE_MAX_MB = max(10, get_env_int("CLAW_PROFILE_MAX_MB", 150))
+# 超过该天数未使用的缓存文件直接淘汰
+CLAW_PROFILE_CACHE_DAYS = max(1, get_env_int("CLAW_PROFILE_CACHE_DAYS", 7))
+
+# 附加模式: 复用已运行的浏览器服务, 不可用时回退为本地启动
+# Selenium Standalone / Grid 地址, 例如 http://127.0.0.1:4444/wd/hub
+CLAW_REMOTE_WEBDRIVER = os.environ.get("CLAW_REMOTE_WEBDRIVER", "").strip().rstrip("/")
+# 常驻 Chromium 的调试地址 (--remote-debugging-port), 例如 127.0.0.1:9222
+CLAW_DEBUGGER_ADDRESS = os.environ.get("CLAW_DEBUGGER_ADDRESS", "").strip()
+
+# 内存调控: 可用内存不足时暂缓启动新的账号浏览器, 浏览器进程树占用超过上限时回收
+CLAW_MEM_GOVERNOR = get_env_bool("CLAW_MEM_GOVERNOR", True)
+# 启动新的账号浏览器前需要的可用内存 (MB)
+CLAW_MEM_MIN_FREE_MB = get_env_int("CLAW_MEM_MIN_FREE_MB", 400)
+# 单个浏览器进程树 (Chromium + chromedriver) 的 RSS 上限 (MB)
+CLAW_MEM_BROWSER_MAX_MB = get_env_int("CLAW_MEM_BROWSER_MAX_MB", 800)
+# 采样间隔 (秒)
+CLAW_MEM_SAMPLE_INTERVAL = max(1, get_env_int("CLAW_MEM_SAMPLE_INTERVAL", 2))
+
+# 常驻模式 (--daemon): 控制套接字路径、计划时间随机抖动、失败后重试间隔
+CLAW_DAEMON_SOCKET = os.environ.get("CLAW_DAEMON_SOCKET", os.path.join(SCRIPT_DIR, "claw_daemon.sock")).strip()
+CLAW_DAEMON_JITTER_MINUTES = max(0, get_env_int("CLAW_DAEMON_JITTER_MINUTES", 30))
+CLAW_DAEMON_RETRY_MINUTES = max(1, get_env_int("CLAW_DAEMON_RETRY_MINUTES", 60))
+
+# ============ 登录状态机 ============
+
+STATE_LANDING = "landing"            # ClawCloud 登录页 (GitHub 按钮)
+STATE_GITHUB_LOGIN = "github_login"  # GitHub 账号密码页
+STATE_TWO_FACTOR = "two_factor"      # GitHub 两步验证页
+STATE_AUTHORIZE = "authorize"        # GitHub OAuth 授权页
+STATE_DASHBOARD = "dashboard"        # ClawCloud 仪表盘
+STATE_UNKNOWN = "unknown"            # 页面尚未就绪或无法识别
+
+# 每个状态等待页面跳转的最长时间 (秒), 条件满足即刻返回
+STATE_TIMEOUTS = {
+    STATE_LANDING: 30,
+    STATE_GITHUB_LOGIN: 30,
+    STATE_TWO_FACTOR: 30,
+    STATE_AUTHORIZE: 45,
+    STATE_DASHBOARD: 30,
+    STATE_UNKNOWN: 30,
+}
+# TOTP: 当前时间窗口剩余不足该秒数时等待下一个窗口再生成, 避免提交前过期
+TOTP_MIN_REMAINING = get_env_int("CLAW_TOTP_MIN_REMAINING", 5)
+# 提交验证码后等待离开两步验证页的时间 (秒), 超时视为验证码被拒绝
+TOTP_VERIFY_TIMEOUT = get_env_int("CLAW_TOTP_VERIFY_TIMEOUT", 15)
+# 整个登录流程的总时限, 以及同一状态最多处理次数 (防止死循环)
+LOGIN_TIMEOUT = get_env_int("CLAW_LOGIN_TIMEOUT", 300)
+MAX_STATE_VISITS = 3
+
+GITHUB_BUTTON_XPATH = "//button[contains(text(), 'GitHub')] | //a[contains(text(), 'GitHub')]"
+
+# 两步验证页的候选选择器; 实际查找顺序由选择器命中缓存决定 (上次命中的排在最前)
+OTP_INPUT_SELECTORS = [
+    "input#otp",
+    "input[name='otp']",
+    "input[placeholder='XXXXXX']",
+    "input[autocomplete='one-time-code']",
+    "input[type='tel']",
+]
+OTP_SUBMIT_SELECTORS = [
+    "button[type='submit']",
+    "input[type='submit']",
+    "button.btn-primary",
+]
+# GitHub 输满 6 位会自动提交; 输入后这段时间内仍未开始提交才手动点击 (秒)
+OTP_AUTO_SUBMIT_GRACE = 2
+
+# 输入验证码前监听表单提交与页面卸载, 用于判断自动提交是否已经开始
+OTP_SUBMIT_WATCH_JS = """
+const input = arguments[0];
+window.__clawOtpSubmitted = false;
+const mark = () => { window.__clawOtpSubmitted = true; };
+if (input.form) input.form.addEventListener('submit', mark, true);
+window.addEventListener('beforeunload', mark);
+"""
+OTP_SUBMIT_STARTED_JS = """
+const input = arguments[0];
+return !input.isConnected || window.__clawOtpSubmitted === true || document.readyState !== 'complete';
+"""
+
+# 一次往返按顺序竞速全部候选选择器, 返回 [命中序号, 元素]; 全部未命中返回 null
+FIND_SELECTOR_JS = """
+const selectors = arguments[0];
+const onlyVisible = arguments[1];
+const visible = (el) => {
+    const rect = el.getBoundingClientRect();
+    const style = window.getComputedStyle(el);
+    return rect.width > 0 && rect.height > 0 && style.visibility !== 'hidden' && style.display !== 'none';
+};
+for (let i = 0; i < selectors.length; i++) {
+    let els;
+    try {
+        els = document.querySelectorAll(selectors[i]);
+    } catch (e) {
+        continue;
+    }
+    for (const el of els) {
+        if (!onlyVisible || visible(el)) return [i, el];
+    }
+}
+return null;
+"""
+
+# ============ 登录状态检测 ============
+
+LOGIN_STATE_IN = "logged_in"
+LOGIN_STATE_OUT = "logged_out"
+LOGIN_STATE_UNKNOWN = "unknown"
+
+# 仪表盘标志: 文本或 CSS 选择器 (以 css: 开头)
+# 强标志只会出现在已登录的控制台, 命中时即使页面上有 GitHub 按钮也判定为已登录
+DASHBOARD_STRONG_MARKERS = [
+    "css:input[placeholder*='Search']",
+    "App Launchpad",
+]
+# 弱标志 (产品名/区域名) 也可能出现在登录页的介绍文字中, 只在没有 GitHub 登录按钮时生效
+DASHBOARD_MARKERS = [
+    "Database",
+    "Devbox",
+    "Object Storage",
+    "Terminal",
+    "Germany",
+    "Japan",
+]
+DASHBOARD_DETECT_TIMEOUT = get_env_int("CLAW_DETECT_TIMEOUT", 30)
+
+# 一次往返同时检查登录页与仪表盘标志, 只统计可见元素
+# 判定顺序: 强标志 → GitHub 登录按钮 → 弱标志
+LOGIN_STATE_JS = """
+const strongMarkers = arguments[0];
+const weakMarkers = arguments[1];
+const visible = (el) => {
+    if (!el) return false;
+    const rect = el.getBoundingClientRect();
+    const style = window.getComputedStyle(el);
+    return rect.width > 0 && rect.height > 0 && style.visibility !== 'hidden' && style.display !== 'none';
+};
+const ownText = (el) => Array.from(el.childNodes)
+    .filter((n) => n.nodeType === Node.TEXT_NODE)
+    .map((n) => n.nodeValue)
+    .join('');
+
+if (location.href.includes('/signin')) {
+    return {state: 'logged_out', marker: '/signin'};
+}
+if (!document.body) {
+    return {state: 'unknown', marker: null};
+}
+const walker = document.createTreeWalker(document.body, NodeFilter.SHOW_TEXT);
+const texts = [];
+while (walker.nextNode()) {
+    const node = walker.currentNode;
+    if (node.nodeValue.trim() && node.parentElement) texts.push(node);
+}
+const findMarker = (markers) => {
+    for (const marker of markers) {
+        if (marker.startsWith('css:')) {
+            if (visible(document.querySelector(marker.slice(4)))) return marker.slice(4);
+            continue;
+        }
+        for (const node of texts) {
+            if (node.nodeValue.includes(marker) && visible(node.parentElement)) return marker;
+        }
+    }
+    return null;
+};
+
+// 强标志优先: 已登录的控制台页面也可能有 "从 GitHub 部署" 之类的链接
+let marker = findMarker(strongMarkers);
+if (marker) return {state: 'logged_in', marker: marker};
+for (const el of document.querySelectorAll('button, a')) {
+    if (ownText(el).includes('GitHub') && visible(el)) {
+        return {state: 'logged_out', marker: 'GitHub 登录按钮'};
+    }
+}
+marker = findMarker(weakMarkers);
+if (marker) return {state: 'logged_in', marker: marker};
+return {state: 'unknown', marker: null};
+"""
 
 # ============ 代理配置 ============
 # 优先读取 CLAW_PROXY, 其次是 ALL_PROXY, HTTP_PROXY
@@ -79,9 +397,14 @@ CLAW_PROXY = os.environ.get("CLAW_PROXY") or os.environ.get("ALL_PROXY") or os.e
 
 if CLAW_PROXY:
     # 关键修复: 如果使用了代理，必须设置 no_proxy 排除 localhost
-    # 否则 Selenium 无法连接 ChromeDriver
-    os.environ["no_proxy"] = "localhost,127.0.0.1,::1"
-    os.environ["NO_PROXY"] = "localhost,127.0.0.1,::1"
+    # 否则 Selenium 无法连接 ChromeDriver (附加模式的浏览器服务同理)
+    no_proxy = ["localhost", "127.0.0.1", "::1"]
+    for address in (CLAW_REMOTE_WEBDRIVER, CLAW_DEBUGGER_ADDRESS):
+        host = address.split("//")[-1].split("/")[0].rsplit(":", 1)[0]
+        if host and host not in no_proxy:
+            no_proxy.append(host)
+    os.environ["no_proxy"] = ",".join(no_proxy)
+    os.environ["NO_PROXY"] = ",".join(no_proxy)
     
     # 确保 requests 库也能自动使用代理 (Telegram 需要)
     os.environ["http_proxy"] = CLAW_PROXY
@@ -93,9 +416,1558 @@ if CLAW_PROXY:
     logger.info("已设置 NO_PROXY 环境变量以保护本地 WebDriver 连接")
 else:
     logger.info("未检测到代理配置，使用直连模式")
+
+# 代理池: 多个代理用逗号或换行分隔, 每个账号固定使用其中一个 (浏览器与 HTTP 请求),
+# 通知等全局请求仍使用 CLAW_PROXY; 代理池全部不可用时账号回退为 CLAW_PROXY / 直连
+CLAW_PROXIES = [p.strip() for p in re.split(r"[,\n]", os.environ.get("CLAW_PROXIES", "")) if p.strip()]
+# 代理探测: 通过代理请求该地址并计时, 超时或连接失败视为不可用
+CLAW_PROXY_PROBE_URL = os.environ.get("CLAW_PROXY_PROBE_URL", CLAW_CLOUD_URL).strip()
+CLAW_PROXY_PROBE_TIMEOUT = max(1, get_env_int("CLAW_PROXY_PROBE_TIMEOUT", 8))
 # ================================
 
 
+# ============ 浏览器 ============
+
+# 与 webdriver 启动参数保持一致, 浏览器池模式直接用于启动 Chromium 进程
+CHROME_ARGS = [
+    "--headless",
+    "--no-sandbox",
+    "--disable-dev-shm-usage",
+    "--disable-gpu",
+    "--disable-blink-features=AutomationControlled",
+    "--window-size=1920,1080",
+]
+
+
+def find_chrome():
+    """查找 Chromium"""
+    candidates = [
+        "/usr/bin/chromium",
+        "/usr/bin/chromium-browser",
+        "/usr/bin/google-chrome",
+    ]
+    for path in candidates:
+        if os.path.exists(path):
+            return path
+    return None
+
+
+def find_chromedriver():
+    """查找 ChromeDriver"""
+    candidates = [
+        "/usr/bin/chromedriver",
+        "/usr/local/bin/chromedriver",
+    ]
+    for path in candidates:
+        if os.path.exists(path):
+            return path
+    return None
+
+
+def build_chrome_options(chrome_path, proxy=CLAW_PROXY):
+    """生成本地启动 Chromium 的 Options"""
+    options = Options()
+    for arg in CHROME_ARGS:
+        options.add_argument(arg)
+    options.add_experimental_option("excludeSwitches", ["enable-automation"])
+    options.add_experimental_option("useAutomationExtension", False)
+
+    # 配置浏览器代理
+    if proxy:
+        options.add_argument(f"--proxy-server={proxy}")
+
+    # 远程 WebDriver 由服务端决定浏览器路径
+    if chrome_path:
+        options.binary_location = chrome_path
+    enable_performance_log(options)
+    return options
+
+
+def enable_performance_log(options):
+    """开启 ChromeDriver 性能日志 (Network 事件), 用于统计请求数与流量"""
+    options.set_capability("goog:loggingPrefs", {"performance": "ALL"})
+    options.add_experimental_option("perfLoggingPrefs", {"enableNetwork": True, "enablePage": False})
+
+
+def create_chrome_driver(options):
+    """启动 ChromeDriver 会话"""
+    chromedriver_path = find_chromedriver()
+    if chromedriver_path:
+        service = Service(executable_path=chromedriver_path)
+        return webdriver.Chrome(service=service, options=options)
+    return webdriver.Chrome(options=options)
+
+
+def remote_webdriver_ready(url, timeout=3):
+    """检查 Selenium 服务是否可用 (GET /status)"""
+    try:
+        resp = requests.get(f"{url}/status", timeout=timeout)
+        return bool(resp.json().get("value", {}).get("ready", resp.ok))
+    except Exception:
+        return False
+
+
+def create_remote_driver(options):
+    """在 Selenium 服务上创建会话 (每个会话是独立的浏览器, quit 只关闭自己)"""
+    # ChromiumRemoteConnection 额外注册了 executeCdpCommand, 远程会话也能执行 CDP 命令
+    from selenium.webdriver.chromium.remote_connection import ChromiumRemoteConnection
+
+    connection = ChromiumRemoteConnection(CLAW_REMOTE_WEBDRIVER, vendor_prefix="goog", browser_name="chrome")
+    return webdriver.Remote(command_executor=connection, options=options)
+
+
+def create_browser_pool(pool_default=False):
+    """浏览器池: 配置了 CLAW_DEBUGGER_ADDRESS 时附加到外部浏览器, 否则按需启动共享 Chromium
+
+    pool_default 为未设置 CLAW_BROWSER_POOL 时是否开启 (常驻模式默认开启, 浏览器随进程常驻)
+    """
+    if CLAW_DEBUGGER_ADDRESS:
+        return BrowserPool(CLAW_DEBUGGER_ADDRESS)
+    if get_env_bool("CLAW_BROWSER_POOL", pool_default) and not CLAW_PERSIST_PROFILE:
+        return BrowserPool()
+    return None
+
+
+class BrowserPool:
+    """共享浏览器池: 整次运行只启动一个 Chromium, 每个账号分配独立的浏览器上下文
+
+    每个账号通过 CDP 的 Target.createBrowserContext 获得一个类似无痕窗口的上下文,
+    Cookie/Storage 互相隔离; ChromeDriver 通过 debuggerAddress 附加到该浏览器,
+    只操作属于自己的标签页。
+
+    传入 external_address 时不启动 Chromium, 而是附加到外部已运行的浏览器,
+    关闭时只断开连接, 不关闭外部浏览器。
+    """
+
+    def __init__(self, external_address=None):
+        self.external_address = external_address
+        self.process = None
+        self.port = None
+        self.user_data_dir = None
+        self.ws = None
+        self.msg_id = 0
+        self.ws_lock = threading.Lock()
+        # 可重入: 检查内存、关闭并重启浏览器、占用 active 名额在同一把锁内完成
+        self.start_lock = threading.RLock()
+        self.active = 0
+
+    @property
+    def debugger_address(self):
+        return self.external_address or f"127.0.0.1:{self.port}"
+
+    def start(self):
+        """启动共享 Chromium (只执行一次)"""
+        with self.start_lock:
+            if self.ws:
+                return
+
+            # websocket-client 是 selenium 的依赖, 无需额外安装
+            import websocket
+
+            if self.external_address:
+                resp = requests.get(f"http://{self.external_address}/json/version", timeout=3)
+                # 浏览器返回的地址可能是它自己视角的 localhost, 改为实际连接的地址
+                ws_url = re.sub(r"^ws://[^/]+", f"ws://{self.external_address}", resp.json()["webSocketDebuggerUrl"])
+                self.ws = websocket.create_connection(ws_url, timeout=30, suppress_origin=True)
+                logger.info(f"已附加到外部浏览器: {self.external_address}")
+                return
+
+            chrome_path = find_chrome()
+            if not chrome_path:
+                raise RuntimeError("未找到 Chromium")
+
+            with socket.socket() as sock:
+                sock.bind(("127.0.0.1", 0))
+                self.port = sock.getsockname()[1]
+
+            self.user_data_dir = tempfile.mkdtemp(prefix="claw_pool_")
+            args = [chrome_path] + CHROME_ARGS + [
+                f"--remote-debugging-port={self.port}",
+                f"--user-data-dir={self.user_data_dir}",
+                "--no-first-run",
+                "--no-default-browser-check",
+            ]
+            if CLAW_PROXY:
+                args.append(f"--proxy-server={CLAW_PROXY}")
+            args.append("about:blank")
+
+            self.process = subprocess.Popen(
+                args, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+            )
+
+            ws_url = None
+            deadline = time.time() + 30
+            while time.time() < deadline:
+                if self.process.poll() is not None:
+                    raise RuntimeError(f"Chromium 进程提前退出 (code={self.process.returncode})")
+                try:
+                    resp = requests.get(f"http://{self.debugger_address}/json/version", timeout=2)
+                    ws_url = resp.json().get("webSocketDebuggerUrl")
+                    if ws_url:
+                        break
+                except Exception:
+                    pass
+                time.sleep(0.2)
+
+            if not ws_url:
+                self.close()
+                raise RuntimeError("等待 Chromium 调试端口超时")
+
+            self.ws = websocket.create_connection(ws_url, timeout=30, suppress_origin=True)
+            logger.info(f"共享浏览器已启动: {self.debugger_address}")
+
+    def cdp(self, method, params=None):
+        """在浏览器级连接上执行 CDP 命令"""
+        with self.ws_lock:
+            self.msg_id += 1
+            msg_id = self.msg_id
+            self.ws.send(json.dumps({"id": msg_id, "method": method, "params": params or {}}))
+            while True:
+                msg = json.loads(self.ws.recv())
+                if msg.get("id") != msg_id:
+                    continue
+                if "error" in msg:
+                    raise RuntimeError(f"CDP {method} 失败: {msg['error']}")
+                return msg.get("result", {})
+
+    @property
+    def pid(self):
+        """本地启动的共享 Chromium 进程号 (外部浏览器为 None)"""
+        return self.process.pid if self.process and not self.external_address else None
+
+    def recycle_if_bloated(self):
+        """没有账号在使用时, 进程树内存超过上限则重启共享浏览器
+
+        整个检查、关闭、重启过程持有 start_lock, 其他账号的 new_driver 会等待重启完成。
+        """
+        with self.start_lock:
+            if self.active or not self.pid or not CLAW_MEM_GOVERNOR:
+                return
+            rss = process_tree_rss(self.pid)
+            if rss < CLAW_MEM_BROWSER_MAX_MB * 1024 * 1024:
+                return
+            logger.warning(f"共享浏览器占用 {rss / 1024 / 1024:.0f} MB，超过上限，重新启动")
+            self.close()
+            self.start()
+
+    def new_driver(self, proxy=None):
+        """创建独立上下文并返回附加到该上下文标签页的 driver, 指定 proxy 时该上下文单独走此代理"""
+        with self.start_lock:
+            self.recycle_if_bloated()
+            self.start()
+            # 释放锁之前占用名额, 之后其他账号不会在创建上下文期间回收浏览器
+            self.active += 1
+
+        try:
+            params = {"proxyServer": proxy} if proxy else {}
+            context_id = self.cdp("Target.createBrowserContext", params)["browserContextId"]
+        except Exception:
+            self.release_slot()
+            raise
+        try:
+            target_id = self.cdp(
+                "Target.createTarget",
+                {"url": "about:blank", "browserContextId": context_id}
+            )["targetId"]
+
+            options = Options()
+            options.add_experimental_option("debuggerAddress", self.debugger_address)
+            enable_performance_log(options)
+            driver = create_chrome_driver(options)
+        except Exception:
+            self.dispose_context(context_id)
+            self.release_slot()
+            raise
+
+        # ChromeDriver 的窗口句柄即 DevTools targetId
+        for handle in driver.window_handles:
+            if handle.upper().endswith(target_id.upper()):
+                driver.switch_to.window(handle)
+                return driver, context_id
+
+        try:
+            driver.quit()
+        except Exception:
+            pass
+        self.dispose_context(context_id)
+        self.release_slot()
+        raise RuntimeError("未找到新建上下文对应的标签页")
+
+    def release_slot(self):
+        with self.start_lock:
+            self.active = max(0, self.active - 1)
+
+    def dispose_context(self, context_id):
+        try:
+            self.cdp("Target.disposeBrowserContext", {"browserContextId": context_id})
+        except Exception as e:
+            logger.debug(f"销毁浏览器上下文失败: {e}")
+
+    def release(self, driver, context_id):
+        """释放账号占用的上下文 (附加模式下 quit 不会关闭共享浏览器)"""
+        try:
+            driver.quit()
+        except Exception:
+            pass
+        self.dispose_context(context_id)
+        self.release_slot()
+
+    def alive(self):
+        if self.external_address:
+            try:
+                return requests.get(f"http://{self.external_address}/json/version", timeout=3).ok
+            except Exception:
+                return False
+        return self.process is not None and self.process.poll() is None
+
+    def ensure_alive(self):
+        """常驻模式下检查共享浏览器, 已退出则重新启动"""
+        with self.start_lock:
+            if self.ws and not self.alive():
+                logger.warning("共享浏览器已退出，重新启动")
+                self.close()
+            self.start()
+
+    def close(self):
+        """关闭共享浏览器 (外部浏览器只断开连接)"""
+        with self.start_lock:
+            self.close_locked()
+
+    def close_locked(self):
+        if self.ws:
+            if not self.external_address:
+                try:
+                    self.cdp("Browser.close")
+                except Exception:
+                    pass
+            try:
+                self.ws.close()
+            except Exception:
+                pass
+            self.ws = None
+        if self.process:
+            try:
+                self.process.wait(timeout=10)
+            except Exception:
+                self.process.kill()
+            self.process = None
+        if self.user_data_dir:
+            shutil.rmtree(self.user_data_dir, ignore_errors=True)
+            self.user_data_dir = None
+
+
+class ProfileManager:
+    """每个账号一个持久化的 Chromium 配置目录
+
+    只淘汰缓存类目录 (HTTP 缓存 / 代码缓存 / GPU 缓存等), Cookie、localStorage、
+    Service Worker 注册信息始终保留, 热启动时无需重新注入 Cookie。
+    """
+
+    # 相对于配置目录, 允许淘汰的缓存子目录
+    CACHE_DIRS = [
+        "Default/Cache",
+        "Default/Code Cache",
+        "Default/GPUCache",
+        "Default/Service Worker/CacheStorage",
+        "Default/Service Worker/ScriptCache",
+        "GrShaderCache",
+        "GraphiteDawnCache",
+        "ShaderCache",
+        "component_crx_cache",
+    ]
+    # 崩溃后残留的单实例锁文件
+    LOCK_FILES = ["SingletonLock", "SingletonSocket", "SingletonCookie"]
+
+    def __init__(self, root, max_bytes, max_age_days):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.max_age = max_age_days * 86400
+
+    def path(self, username):
+        name = re.sub(r"[^A-Za-z0-9_-]", "_", username)
+        return os.path.join(self.root, name)
+
+    def is_warm(self, path):
+        """配置目录中已有 Cookie 数据库, 说明之前成功运行过"""
+        return any(
+            os.path.exists(os.path.join(path, "Default", sub))
+            for sub in ("Cookies", os.path.join("Network", "Cookies"))
+        )
+
+    def prepare(self, username):
+        """创建配置目录并清理残留锁, 返回 (目录, 是否为热启动)"""
+        path = self.path(username)
+        os.makedirs(path, exist_ok=True)
+        self.clear_stale_lock(path)
+        return path, self.is_warm(path)
+
+    def clear_stale_lock(self, path):
+        """SingletonLock 指向 "主机名-进程号", 进程已不存在时删除锁文件"""
+        lock = os.path.join(path, "SingletonLock")
+        try:
+            target = os.readlink(lock)
+        except OSError:
+            return
+        try:
+            pid = int(target.rsplit("-", 1)[-1])
+            os.kill(pid, 0)
+            return
+        except (ValueError, ProcessLookupError):
+            pass
+        except PermissionError:
+            return
+        for name in self.LOCK_FILES:
+            try:
+                os.unlink(os.path.join(path, name))
+            except OSError:
+                pass
+
+    def cache_files(self, path):
+        """返回 [(最后访问时间, 大小, 路径)]"""
+        files = []
+        for sub in self.CACHE_DIRS:
+            for dirpath, _, names in os.walk(os.path.join(path, sub)):
+                for name in names:
+                    full = os.path.join(dirpath, name)
+                    try:
+                        st = os.stat(full)
+                    except OSError:
+                        continue
+                    files.append((max(st.st_atime, st.st_mtime), st.st_size, full))
+        return files
+
+    def dir_size(self, path):
+        total = 0
+        for dirpath, _, names in os.walk(path):
+            for name in names:
+                try:
+                    total += os.lstat(os.path.join(dirpath, name)).st_size
+                except OSError:
+                    pass
+        return total
+
+    def trim(self, path):
+        """淘汰过期缓存, 总大小仍超过上限时按最久未使用继续淘汰; 返回 (淘汰字节数, 剩余大小)"""
+        now = time.time()
+        freed = 0
+        files = sorted(self.cache_files(path))
+        size = self.dir_size(path)
+        for used, file_size, full in files:
+            if now - used < self.max_age and size - freed <= self.max_bytes:
+                break
+            try:
+                os.unlink(full)
+                freed += file_size
+            except OSError:
+                pass
+        return freed, size - freed
+
+
+PROFILES = ProfileManager(CLAW_PROFILE_DIR, CLAW_PROFILE_MAX_MB * 1024 * 1024, CLAW_PROFILE_CACHE_DAYS)
+
+
+# ============ 内存调控 ============
+
+PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+
+def read_int_file(path):
+    try:
+        with open(path, "r") as f:
+            value = f.read().strip()
+    except OSError:
+        return None
+    return int(value) if value.isdigit() else None
+
+
+def mem_available():
+    """可用内存 (字节): /proc/meminfo 的 MemAvailable 与容器 cgroup 剩余额度取较小值; 无法读取返回 None"""
+    available = None
+    try:
+        with open("/proc/meminfo", "r") as f:
+            for line in f:
+                if line.startswith("MemAvailable:"):
+                    available = int(line.split()[1]) * 1024
+                    break
+    except OSError:
+        pass
+
+    # cgroup v2 / v1 内存限制 (Docker 容器内 MemAvailable 反映的是宿主机)
+    for limit_path, usage_path in (
+        ("/sys/fs/cgroup/memory.max", "/sys/fs/cgroup/memory.current"),
+        ("/sys/fs/cgroup/memory/memory.limit_in_bytes", "/sys/fs/cgroup/memory/memory.usage_in_bytes"),
+    ):
+        limit, usage = read_int_file(limit_path), read_int_file(usage_path)
+        if limit and usage is not None and limit < (1 << 60):
+            remaining = max(0, limit - usage)
+            available = remaining if available is None else min(available, remaining)
+            break
+    return available
+
+
+def process_tree_rss(root_pid):
+    """进程及其全部子进程的 RSS 之和 (字节), 读取 /proc/<pid>/stat 与 statm"""
+    children = {}
+    for entry in os.listdir("/proc") if os.path.isdir("/proc") else []:
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat", "r") as f:
+                # comm 字段可能包含空格, 从最后一个 ")" 之后解析
+                fields = f.read().rsplit(")", 1)[1].split()
+            children.setdefault(int(fields[1]), []).append(int(entry))
+        except (OSError, IndexError, ValueError):
+            continue
+
+    total = 0
+    stack = [root_pid]
+    while stack:
+        pid = stack.pop()
+        try:
+            with open(f"/proc/{pid}/statm", "r") as f:
+                total += int(f.read().split()[1]) * PAGE_SIZE
+        except (OSError, IndexError, ValueError):
+            pass
+        stack.extend(children.get(pid, []))
+    return total
+
+
+class MemoryMonitor:
+    """后台线程按固定间隔采样一个浏览器进程树的 RSS, 记录峰值与平均值"""
+
+    def __init__(self, pid, label, on_exceed=None):
+        self.pid = pid
+        self.label = label
+        self.on_exceed = on_exceed
+        self.peak = 0
+        self.total = 0
+        self.count = 0
+        self.exceeded = False
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self.loop, name=f"claw-mem-{label}", daemon=True)
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def sample(self):
+        rss = process_tree_rss(self.pid)
+        if not rss:
+            return
+        self.peak = max(self.peak, rss)
+        self.total += rss
+        self.count += 1
+        if not self.exceeded and rss > CLAW_MEM_BROWSER_MAX_MB * 1024 * 1024:
+            self.exceeded = True
+            if self.on_exceed:
+                self.on_exceed(rss)
+
+    def loop(self):
+        while not self.stopped.wait(CLAW_MEM_SAMPLE_INTERVAL):
+            self.sample()
+
+    def stop(self):
+        self.stopped.set()
+        self.thread.join(timeout=5)
+        self.sample()
+
+    @property
+    def average(self):
+        return self.total / self.count if self.count else 0
+
+
+class MemoryGovernor:
+    """准入控制: 可用内存低于 CLAW_MEM_MIN_FREE_MB 时新的账号浏览器排队等待
+
+    至少允许一个浏览器运行, 避免所有账号互相等待; 浏览器关闭后唤醒排队的账号。
+    """
+
+    def __init__(self, min_free_mb):
+        self.min_free = min_free_mb * 1024 * 1024
+        self.cond = threading.Condition()
+        self.active = 0
+        self.lowest_free = None
+
+    def has_headroom(self):
+        available = mem_available()
+        if available is not None:
+            self.lowest_free = available if self.lowest_free is None else min(self.lowest_free, available)
+        return available is None or available >= self.min_free
+
+    def acquire(self, label):
+        """阻塞直到有足够内存启动浏览器, 返回等待秒数"""
+        start = time.time()
+        with self.cond:
+            notified = False
+            while CLAW_MEM_GOVERNOR and self.active and not self.has_headroom():
+                if not notified:
+                    logger.info(f"[{label}] 可用内存不足 {self.min_free // 1024 // 1024} MB，等待其他账号释放浏览器")
+                    notified = True
+                # 浏览器关闭时会被唤醒, 同时定期重新检查 (其他进程也可能释放内存)
+                self.cond.wait(timeout=5)
+            self.active += 1
+        return time.time() - start
+
+    def release(self):
+        with self.cond:
+            self.active = max(0, self.active - 1)
+            self.cond.notify_all()
+
+
+GOVERNOR = MemoryGovernor(CLAW_MEM_MIN_FREE_MB)
+
+
+# ============ 阶段耗时追踪 ============
+
+# 本次运行的唯一标识, 用于在追踪文件中区分不同次运行
+RUN_ID = f"{datetime.now().strftime('%Y%m%d%H%M%S')}-{os.getpid()}"
+
+
+def new_run_id(seq):
+    """常驻模式下每一批运行使用新的标识"""
+    global RUN_ID
+    RUN_ID = f"{datetime.now().strftime('%Y%m%d%H%M%S')}-{os.getpid()}-{seq}"
+    return RUN_ID
+
+
+class Tracer:
+    """阶段耗时追踪: 每个 span 以一行 JSON 追加写入追踪文件"""
+
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+
+    def write(self, record):
+        if not self.path:
+            return
+        line = json.dumps(record, ensure_ascii=False)
+        with self.lock:
+            try:
+                with open(self.path, "a", encoding="utf-8") as f:
+                    f.write(line + "\n")
+            except OSError as e:
+                logger.debug(f"写入追踪文件失败: {e}")
+
+    def event(self, stage, account=None, **fields):
+        """记录一个瞬时事件 (duration 为 0), 用于统计类数据"""
+        now = time.time()
+        record = {"run_id": RUN_ID, "stage": stage, "account": account,
+                  "start": now, "end": now, "duration": 0, "outcome": "ok"}
+        record.update(fields)
+        self.write(record)
+
+    @contextmanager
+    def span(self, stage, account=None, **fields):
+        """记录一个阶段的起止时间与结果, 调用方可通过返回的 dict 设置 outcome 等字段"""
+        record = {"run_id": RUN_ID, "stage": stage, "account": account, "start": time.time()}
+        record.update(fields)
+        try:
+            yield record
+        except Exception as e:
+            record["outcome"] = "error"
+            record["error"] = str(e)[:200]
+            raise
+        finally:
+            record["end"] = time.time()
+            record["duration"] = round(record["end"] - record["start"], 3)
+            record.setdefault("outcome", "ok")
+            self.write(record)
+
+
+TRACER = Tracer(CLAW_TRACE_FILE)
+
+
+def percentile(values, pct):
+    """最近秩法计算百分位数"""
+    ordered = sorted(values)
+    rank = max(1, math.ceil(pct / 100 * len(ordered)))
+    return ordered[min(rank, len(ordered)) - 1]
+
+
+def trace_report(path, last_runs=0):
+    """汇总追踪文件, 输出每个阶段的 p50/p95 耗时"""
+    if not path or not os.path.exists(path):
+        print(f"❌ 追踪文件不存在: {path}")
+        return
+
+    records = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                records.append(json.loads(line))
+            except ValueError:
+                continue
+
+    if last_runs:
+        run_ids = []
+        for r in records:
+            if r.get("run_id") not in run_ids:
+                run_ids.append(r.get("run_id"))
+        keep = set(run_ids[-last_runs:])
+        records = [r for r in records if r.get("run_id") in keep]
+
+    stages = {}
+    for r in records:
+        stages.setdefault(r.get("stage"), []).append(r)
+
+    run_count = len({r.get("run_id") for r in records})
+    print(f"📈 阶段耗时统计 ({run_count} 次运行, {len(records)} 条记录)\n")
+    print(f"{'阶段':<22}{'次数':>6}{'p50(s)':>10}{'p95(s)':>10}{'最大(s)':>10}{'失败':>6}")
+    for stage, items in sorted(stages.items(), key=lambda kv: str(kv[0])):
+        durations = [r.get("duration", 0) for r in items]
+        failed = sum(1 for r in items if r.get("outcome") in ("error", "fail"))
+        print(
+            f"{str(stage):<22}{len(items):>6}{percentile(durations, 50):>10.2f}"
+            f"{percentile(durations, 95):>10.2f}{max(durations):>10.2f}{failed:>6}"
+        )
+
+    lookups = stages.get("selector")
+    if lookups:
+        print("\n🎯 选择器缓存\n")
+        print(f"{'元素':<22}{'查找':>6}{'命中':>6}{'未命中':>8}{'无缓存':>8}{'未找到':>8}")
+        slots = {}
+        for r in lookups:
+            slots.setdefault(f"{r.get('page')}/{r.get('slot')}", []).append(r)
+        for slot, items in sorted(slots.items()):
+            found = [r for r in items if r.get("outcome") == "ok"]
+            hits = sum(1 for r in found if r.get("cache_hit") is True)
+            misses = sum(1 for r in found if r.get("cache_hit") is False)
+            print(
+                f"{slot:<22}{len(items):>6}{hits:>6}{misses:>8}"
+                f"{len(found) - hits - misses:>8}{len(items) - len(found):>8}"
+            )
+
+
+def encode_screenshot(png):
+    """按配置缩放并重新编码截图, 返回 (图片字节, 扩展名); 未安装 Pillow 时原样返回 PNG"""
+    if Image is None or (CLAW_SHOT_FORMAT == "png" and not CLAW_SHOT_MAX_WIDTH):
+        return png, "png"
+    try:
+        img = Image.open(io.BytesIO(png))
+        if CLAW_SHOT_MAX_WIDTH and img.width > CLAW_SHOT_MAX_WIDTH:
+            height = int(img.height * CLAW_SHOT_MAX_WIDTH / img.width)
+            img = img.resize((CLAW_SHOT_MAX_WIDTH, height), Image.LANCZOS)
+        buf = io.BytesIO()
+        if CLAW_SHOT_FORMAT in ("jpeg", "jpg"):
+            img.convert("RGB").save(buf, format="JPEG", quality=CLAW_SHOT_QUALITY, optimize=True)
+            return buf.getvalue(), "jpg"
+        img.save(buf, format="PNG", optimize=True)
+        return buf.getvalue(), "png"
+    except Exception as e:
+        logger.debug(f"截图压缩失败, 使用原图: {e}")
+        return png, "png"
+
+
+# ============ HTTP 连接池 ============
+
+# 所有账号共享同一个 HTTPAdapter (连接池, 复用 TLS 连接), 每个账号使用独立 Session 隔离 Cookie
+HTTP_ADAPTER = HTTPAdapter(pool_connections=10, pool_maxsize=max(10, CLAW_CONCURRENCY * 2))
+HTTP_USER_AGENT = (
+    "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 "
+    "(KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
+)
+
+
+class AccountSession(requests.Session):
+    """使用账号专用代理的 Session
+
+    requests 会让环境变量中的代理 (CLAW_PROXY 设置的 http(s)_proxy) 覆盖 session.proxies,
+    因此在合并环境配置之后再写入账号代理; 命中 NO_PROXY 的地址 (本机等) 仍然直连。
+    """
+
+    def __init__(self, proxy=None):
+        super().__init__()
+        self.account_proxy = proxy
+
+    def merge_environment_settings(self, url, proxies, stream, verify, cert):
+        settings = super().merge_environment_settings(url, proxies, stream, verify, cert)
+        if self.account_proxy and not should_bypass_proxies(url, no_proxy=None):
+            settings["proxies"] = dict(settings["proxies"] or {}, http=self.account_proxy, https=self.account_proxy)
+        return settings
+
+
+def new_http_session(cookies=None, proxy=None):
+    """创建挂载共享连接池的 Session, 可选注入 Selenium 格式的 Cookie 与账号专用代理
+
+    注意: 不要调用 session.close(), 否则会关闭共享的连接池
+    """
+    session = AccountSession(proxy)
+    session.mount("https://", HTTP_ADAPTER)
+    session.mount("http://", HTTP_ADAPTER)
+    session.headers["User-Agent"] = HTTP_USER_AGENT
+    for cookie in cookies or []:
+        session.cookies.set(
+            cookie["name"],
+            cookie["value"],
+            domain=cookie.get("domain", ""),
+            path=cookie.get("path", "/"),
+        )
+    return session
+
+# 保活请求的共享线程池, 所有账号/区域的 HTTP 保活请求并发执行
+HTTP_EXECUTOR = ThreadPoolExecutor(max_workers=8, thread_name_prefix="claw-http")
+
+
+def keepalive_urls():
+    """生成浏览器保活地址列表: 主区域与额外区域的首页和 Apps 页面"""
+    urls = []
+    for base in [CLAW_CLOUD_URL.rstrip("/")] + CLAW_KEEPALIVE_REGIONS:
+        region = base.split("//")[-1].split(".")[0]
+        urls.append((f"{base}/", f"{region} 首页"))
+        urls.append((f"{base}/apps", f"{region} Apps页面"))
+    return urls
+
+
+def keepalive_api_urls():
+    """生成 HTTP 保活地址列表: 各区域的鉴权接口
+
+    首页与 Apps 页面是前端路由, 未登录同样返回 200, 无法确认会话被使用,
+    因此 HTTP 保活请求需要登录的接口, 并校验返回体中的登录身份。
+    """
+    urls = []
+    for base in [CLAW_CLOUD_URL.rstrip("/")] + CLAW_KEEPALIVE_REGIONS:
+        region = base.split("//")[-1].split(".")[0]
+        urls.append((f"{base}{CLAW_SESSION_CHECK_PATH}", f"{region} 会话接口"))
+    return urls
+
+
+# ============ 会话存储 ============
+
+class SessionStore:
+    """SQLite 会话存储
+
+    所有账号的 Cookie 保存在同一个库中, 主键为 (账号, 域名, 名称, 路径);
+    每次保存在一个事务内整体替换该账号的 Cookie, 中途崩溃不会留下半写入的数据;
+    读取时按账号索引查询, 并过滤掉已过期的 Cookie。
+    """
+
+    SCHEMA = [
+        """
+        CREATE TABLE IF NOT EXISTS cookies (
+            account    TEXT    NOT NULL,
+            domain     TEXT    NOT NULL,
+            name       TEXT    NOT NULL,
+            path       TEXT    NOT NULL DEFAULT '/',
+            value      TEXT    NOT NULL,
+            expiry     INTEGER,
+            secure     INTEGER NOT NULL DEFAULT 0,
+            http_only  INTEGER NOT NULL DEFAULT 0,
+            same_site  TEXT,
+            updated_at REAL    NOT NULL,
+            PRIMARY KEY (account, domain, name, path)
+        )
+        """,
+        "CREATE INDEX IF NOT EXISTS idx_cookies_expiry ON cookies (account, expiry)",
+        """
+        CREATE TABLE IF NOT EXISTS accounts (
+            account      TEXT PRIMARY KEY,
+            last_attempt REAL,
+            last_success REAL,
+            last_status  TEXT,
+            last_balance TEXT
+        )
+        """,
+        # 余额时间序列: 金额以美分整数存储; 无 rowid 表按 (账号, 区域, 时间) 聚簇, 按账号查询只扫描相邻页
+        """
+        CREATE TABLE IF NOT EXISTS balance_samples (
+            account    TEXT    NOT NULL,
+            region     TEXT    NOT NULL,
+            ts         INTEGER NOT NULL,
+            balance    INTEGER NOT NULL,
+            used       INTEGER,
+            PRIMARY KEY (account, region, ts)
+        ) WITHOUT ROWID
+        """,
+        # 不指定账号的时间窗口查询 (余额报告) 走时间索引, 不扫描整表
+        "CREATE INDEX IF NOT EXISTS idx_balance_samples_ts ON balance_samples (ts)",
+        # 选择器命中缓存: 每个页面/元素 (slot) 各候选选择器的命中次数与最近命中时间
+        """
+        CREATE TABLE IF NOT EXISTS selector_hits (
+            page       TEXT    NOT NULL,
+            slot       TEXT    NOT NULL,
+            selector   TEXT    NOT NULL,
+            hits       INTEGER NOT NULL DEFAULT 0,
+            last_hit   REAL    NOT NULL,
+            PRIMARY KEY (page, slot, selector)
+        ) WITHOUT ROWID
+        """,
+        # 代理池分配: 账号跨运行固定使用同一代理, 失效切换时更新
+        """
+        CREATE TABLE IF NOT EXISTS proxy_assignments (
+            account     TEXT PRIMARY KEY,
+            proxy       TEXT NOT NULL,
+            assigned_at REAL NOT NULL,
+            failovers   INTEGER NOT NULL DEFAULT 0
+        )
+        """,
+    ]
+
+    def __init__(self, path):
+        self.path = path
+        self.init_lock = threading.Lock()
+        self.initialized = False
+
+    def connect(self):
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def init(self):
+        with self.init_lock:
+            if self.initialized:
+                return
+            with closing(self.connect()) as conn:
+                conn.execute("PRAGMA journal_mode=WAL")
+                for sql in self.SCHEMA:
+                    conn.execute(sql)
+            self.initialized = True
+
+    @contextmanager
+    def transaction(self):
+        """写事务: 提前获取写锁, 异常时整体回滚"""
+        self.init()
+        with closing(self.connect()) as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+
+    def query(self, sql, params=()):
+        self.init()
+        with closing(self.connect()) as conn:
+            return conn.execute(sql, params).fetchall()
+
+    def load_cookies(self, account, domain=None):
+        """按账号 (可选域名) 读取未过期的 Cookie, 返回 Selenium 格式"""
+        sql = "SELECT * FROM cookies WHERE account = ? AND (expiry IS NULL OR expiry > ?)"
+        params = [account, int(time.time())]
+        if domain:
+            sql += " AND domain LIKE ?"
+            params.append(f"%{domain}")
+        cookies = []
+        for row in self.query(sql, params):
+            cookie = {
+                "name": row["name"],
+                "value": row["value"],
+                "domain": row["domain"],
+                "path": row["path"],
+                "secure": bool(row["secure"]),
+                "httpOnly": bool(row["http_only"]),
+            }
+            if row["expiry"] is not None:
+                cookie["expiry"] = row["expiry"]
+            if row["same_site"]:
+                cookie["sameSite"] = row["same_site"]
+            cookies.append(cookie)
+        return cookies
+
+    def save_cookies(self, account, cookies):
+        """原子替换账号的全部 Cookie"""
+        now = time.time()
+        rows = [
+            (
+                account,
+                c.get("domain", ""),
+                c["name"],
+                c.get("path") or "/",
+                c.get("value", ""),
+                int(c["expiry"]) if c.get("expiry") is not None else None,
+                int(bool(c.get("secure"))),
+                int(bool(c.get("httpOnly"))),
+                c.get("sameSite"),
+                now,
+            )
+            for c in cookies
+        ]
+        with self.transaction() as conn:
+            conn.execute("DELETE FROM cookies WHERE account = ?", (account,))
+            conn.executemany(
+                "INSERT OR REPLACE INTO cookies "
+                "(account, domain, name, path, value, expiry, secure, http_only, same_site, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+
+    def session_expiry(self, account):
+        """ClawCloud 会话的过期时间: 取长效 Cookie (有效期 >= 1 天) 中最早的过期时间
+
+        短效 Cookie (CSRF、统计等) 不代表会话本身, 不参与计算。
+        """
+        best = None
+        for row in self.query(
+            "SELECT domain, expiry, updated_at FROM cookies WHERE account = ? AND expiry IS NOT NULL",
+            (account,),
+        ):
+            if not is_claw_cookie({"domain": row["domain"]}):
+                continue
+            if row["expiry"] - row["updated_at"] < 86400:
+                continue
+            if best is None or row["expiry"] < best:
+                best = row["expiry"]
+        return best
+
+    def account_info(self, account):
+        rows = self.query("SELECT * FROM accounts WHERE account = ?", (account,))
+        return dict(rows[0]) if rows else {}
+
+    def record_run(self, account, success, balance=None):
+        """记录一次运行结果; 成功时更新 last_success, 有效余额才覆盖上次余额"""
+        now = time.time()
+        with self.transaction() as conn:
+            conn.execute(
+                "INSERT INTO accounts (account, last_attempt, last_success, last_status, last_balance) "
+                "VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT(account) DO UPDATE SET "
+                "last_attempt = excluded.last_attempt, "
+                "last_success = COALESCE(excluded.last_success, accounts.last_success), "
+                "last_status = excluded.last_status, "
+                "last_balance = COALESCE(excluded.last_balance, accounts.last_balance)",
+                (account, now, now if success else None, "ok" if success else "fail", balance),
+            )
+
+    def add_balance_sample(self, account, region, balance, used=None, ts=None):
+        """记录一次余额采样 (美分)"""
+        with self.transaction() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO balance_samples (account, region, ts, balance, used) VALUES (?, ?, ?, ?, ?)",
+                (account, region, int(ts or time.time()), balance, used),
+            )
+
+    def balance_samples(self, accounts=None, since=0):
+        """按时间顺序返回 since 之后的余额采样, 可按账号列表过滤
+
+        指定账号时按主键前缀 (账号) 查找, 否则按时间索引查找窗口内的采样。
+        """
+        params = [int(since)]
+        if accounts:
+            accounts = list(accounts)
+            sql = (
+                "SELECT account, region, ts, balance, used FROM balance_samples "
+                f"WHERE ts >= ? AND account IN ({', '.join('?' * len(accounts))})"
+            )
+            params += accounts
+        else:
+            # 没有统计信息时查询规划器倾向于全表扫描以省去排序, 显式指定时间索引
+            sql = (
+                "SELECT account, region, ts, balance, used FROM balance_samples "
+                "INDEXED BY idx_balance_samples_ts WHERE ts >= ?"
+            )
+        return self.query(sql + " ORDER BY account, region, ts", params)
+
+    def selector_winners(self):
+        """每个 (页面, slot) 最近命中的选择器"""
+        winners = {}
+        for row in self.query("SELECT page, slot, selector, last_hit FROM selector_hits ORDER BY last_hit"):
+            winners[(row["page"], row["slot"])] = row["selector"]
+        return winners
+
+    def add_selector_hit(self, page, slot, selector):
+        with self.transaction() as conn:
+            conn.execute(
+                "INSERT INTO selector_hits (page, slot, selector, hits, last_hit) VALUES (?, ?, ?, 1, ?) "
+                "ON CONFLICT(page, slot, selector) DO UPDATE SET "
+                "hits = selector_hits.hits + 1, last_hit = excluded.last_hit",
+                (page, slot, selector, time.time()),
+            )
+
+    def proxy_assignment(self, account):
+        rows = self.query("SELECT proxy FROM proxy_assignments WHERE account = ?", (account,))
+        return rows[0]["proxy"] if rows else None
+
+    def set_proxy_assignment(self, account, proxy, failover=False):
+        with self.transaction() as conn:
+            conn.execute(
+                "INSERT INTO proxy_assignments (account, proxy, assigned_at, failovers) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT(account) DO UPDATE SET proxy = excluded.proxy, assigned_at = excluded.assigned_at, "
+                "failovers = proxy_assignments.failovers + excluded.failovers",
+                (account, proxy, time.time(), int(failover)),
+            )
+
+    def has_cookies(self, account):
+        return bool(self.query("SELECT 1 FROM cookies WHERE account = ? LIMIT 1", (account,)))
+
+    def migrate_json(self, account, json_path):
+        """导入旧版 cookies_*.json 文件 (仅当库中没有该账号时), 导入后重命名原文件"""
+        if not os.path.exists(json_path) or self.has_cookies(account):
+            return False
+        try:
+            with open(json_path, "r", encoding="utf-8") as f:
+                cookies = json.load(f)
+            if cookies:
+                self.save_cookies(account, cookies)
+            os.replace(json_path, json_path + ".migrated")
+            logger.info(f"已迁移旧版 Cookie 文件: {os.path.basename(json_path)}")
+            return True
+        except Exception as e:
+            logger.warning(f"迁移 Cookie 文件失败: {e}")
+            return False
+
+
+SESSION_STORE = SessionStore(CLAW_SESSION_DB)
+
+
+class SelectorCache:
+    """选择器命中缓存
+
+    记录每个页面元素上次命中的选择器 (持久化到会话库), 查找时排在候选列表最前;
+    进程内只读取一次, 之后命中结果同时更新内存与会话库。
+    """
+
+    def __init__(self, store):
+        self.store = store
+        self.lock = threading.Lock()
+        self.winners = None
+
+    def winner(self, page, slot):
+        with self.lock:
+            if self.winners is None:
+                try:
+                    self.winners = self.store.selector_winners()
+                except sqlite3.Error as e:
+                    logger.debug(f"读取选择器缓存失败: {e}")
+                    self.winners = {}
+            return self.winners.get((page, slot))
+
+    def order(self, page, slot, selectors):
+        """上次命中的选择器排在最前, 其余保持原顺序"""
+        cached = self.winner(page, slot)
+        if cached not in selectors:
+            return list(selectors), None
+        return [cached] + [sel for sel in selectors if sel != cached], cached
+
+    def record(self, page, slot, selector):
+        with self.lock:
+            if self.winners is not None:
+                self.winners[(page, slot)] = selector
+        try:
+            self.store.add_selector_hit(page, slot, selector)
+        except sqlite3.Error as e:
+            logger.debug(f"写入选择器缓存失败: {e}")
+
+
+SELECTOR_CACHE = SelectorCache(SESSION_STORE)
+
+
+# ============ 代理池 ============
+
+# 浏览器导航 / requests 报错中代表代理本身不可用的关键字
+PROXY_ERROR_MARKERS = ("ERR_PROXY", "ERR_TUNNEL_CONNECTION_FAILED", "ERR_SOCKS", "ProxyError")
+
+
+def mask_proxy(proxy):
+    """日志与通知中隐藏代理的账号密码"""
+    return re.sub(r"//[^/@]+@", "//***@", proxy or "") or "直连"
+
+
+def is_proxy_error(error):
+    if isinstance(error, requests.exceptions.ProxyError):
+        return True
+    return any(marker in str(error) for marker in PROXY_ERROR_MARKERS)
+
+
+def probe_proxy(proxy, url=CLAW_PROXY_PROBE_URL, timeout=CLAW_PROXY_PROBE_TIMEOUT):
+    """通过代理请求探测地址, 返回耗时 (秒); 不可用返回 None"""
+    start = time.time()
+    try:
+        resp = requests.get(url, proxies={"http": proxy, "https": proxy}, timeout=timeout, allow_redirects=False)
+    except requests.RequestException as e:
+        logger.debug(f"代理探测失败 {mask_proxy(proxy)}: {e}")
+        return None
+    if resp.status_code >= 500:
+        return None
+    return time.time() - start
+
+
+class ProxyPool:
+    """代理池
+
+    每批运行开始时并发探测全部代理并按延迟排序; 账号优先沿用会话库中记录的代理
+    (跨运行保持出口 IP 不变, 降低风控概率), 该代理不可用时才改用最快的可用代理;
+    运行中代理失效时标记为不可用并切换到下一个。
+    """
+
+    def __init__(self, proxies, store):
+        self.proxies = proxies
+        self.store = store
+        self.lock = threading.Lock()
+        self.latency = {}
+        self.failed = set()
+
+    def probe(self):
+        """并发探测全部代理, 清除上一批的失效标记"""
+        with ThreadPoolExecutor(max_workers=min(16, len(self.proxies)), thread_name_prefix="claw-proxy") as executor:
+            results = list(executor.map(probe_proxy, self.proxies))
+        with self.lock:
+            self.latency = dict(zip(self.proxies, results))
+            self.failed = set()
+        for proxy, latency in zip(self.proxies, results):
+            TRACER.event("proxy_probe", proxy=mask_proxy(proxy), latency=latency,
+                         outcome="ok" if latency is not None else "fail")
+        healthy = self.healthy()
+        logger.info(
+            f"代理池探测完成: 可用 {len(healthy)}/{len(self.proxies)} 个"
+            + (f", 最快 {mask_proxy(healthy[0])} ({self.latency[healthy[0]] * 1000:.0f} ms)" if healthy else "")
+        )
+        return healthy
+
+    def healthy(self):
+        """可用代理, 按延迟从低到高排列"""
+        with self.lock:
+            alive = [p for p in self.proxies if self.latency.get(p) is not None and p not in self.failed]
+            return sorted(alive, key=lambda p: self.latency[p])
+
+    def assign(self, account):
+        """账号本次使用的代理: 沿用上次分配的可用代理, 否则分配最快的可用代理; 全部不可用返回 None"""
+        try:
+            sticky = self.store.proxy_assignment(account)
+        except sqlite3.Error as e:
+            logger.debug(f"读取代理分配失败: {e}")
+            sticky = None
+        healthy = self.healthy()
+        if sticky in healthy:
+            return sticky
+        if not healthy:
+            return None
+        self.save(account, healthy[0])
+        return healthy[0]
+
+    def failover(self, account, proxy):
+        """标记代理失效并为账号切换到下一个可用代理, 没有可用代理时返回 None"""
+        with self.lock:
+            self.failed.add(proxy)
+        healthy = self.healthy()
+        if not healthy:
+            return None
+        self.save(account, healthy[0], failover=True)
+        return healthy[0]
+
+    def save(self, account, proxy, failover=False):
+        try:
+            self.store.set_proxy_assignment(account, proxy, failover)
+        except sqlite3.Error as e:
+            logger.debug(f"写入代理分配失败: {e}")
+
+
+PROXY_POOL = ProxyPool(CLAW_PROXIES, SESSION_STORE) if CLAW_PROXIES else None
+
+
+# ============ 调度计划 ============
+
+def plan_account(username, now=None):
+    """计算账号下次需要处理的时间
+
+    next_due 取以下两者中较早的一个:
+      - 上次成功时间 + CLAW_KEEPALIVE_INTERVAL_HOURS (需要保活)
+      - 会话 Cookie 过期时间 - CLAW_RELOGIN_MARGIN_HOURS (需要重新登录)
+    从未成功或没有会话 Cookie 的账号总是需要处理。
+    """
+    now = now or time.time()
+    try:
+        info = SESSION_STORE.account_info(username)
+        expiry = SESSION_STORE.session_expiry(username)
+    except Exception as e:
+        logger.warning(f"读取账号调度信息失败: {e}")
+        info, expiry = {}, None
+
+    plan = {
+        "due": True,
+        "reason": "",
+        "next_due": now,
+        "last_success": info.get("last_success"),
+        "last_status": info.get("last_status"),
+        "last_balance": info.get("last_balance"),
+    }
+
+    if not info.get("last_success"):
+        plan["reason"] = "从未成功保活"
+        return plan
+    if info.get("last_status") != "ok":
+        plan["reason"] = "上次运行失败"
+        return plan
+    if not expiry:
+        plan["reason"] = "没有可用的会话 Cookie"
+        return plan
+
+    keepalive_at = info["last_success"] + KEEPALIVE_INTERVAL_HOURS * 3600
+    relogin_at = expiry - RELOGIN_MARGIN_HOURS * 3600
+    if relogin_at <= keepalive_at:
+        plan["next_due"], plan["reason"] = relogin_at, "会话即将过期，需要重新登录"
+    else:
+        plan["next_due"], plan["reason"] = keepalive_at, "到达保活间隔"
+    plan["due"] = now >= plan["next_due"]
+    return plan
+
+
+def find_json_key(data, keys):
+    """深度优先查找包含任一 key 的字典, 返回 (字典, key)"""
+    if isinstance(data, dict):
+        for key in keys:
+            if key in data:
+                return data, key
+        children = data.values()
+    elif isinstance(data, list):
+        children = data
+    else:
+        return None, None
+    for child in children:
+        node, key = find_json_key(child, keys)
+        if node is not None:
+            return node, key
+    return None, None
+
+
+# 会话接口返回体中代表登录身份的字段
+SESSION_IDENTITY_KEYS = ["user", "userId", "uid", "username", "login", "email", "namespace", "userCrUid"]
+
+
+def session_payload_ok(data):
+    """会话接口返回体是否确认已登录: 业务码 (如有) 表示成功, 且包含非空的身份字段
+
+    控制台接口常以 HTTP 200 返回 {"code": 401, ...} 之类的错误, 不能只看状态码。
+    """
+    if not isinstance(data, dict):
+        return False
+    if "code" in data and str(data["code"]) not in ("0", "200"):
+        return False
+    if data.get("success") is False or data.get("error"):
+        return False
+    node, key = find_json_key(data, SESSION_IDENTITY_KEYS)
+    return node is not None and node[key] not in (None, "", {}, [])
+
+
+def parse_balance_payload(data):
+    """解析余额接口 JSON, 返回 {"balance", "used", "plan"} (没有的字段不返回); 无余额字段返回 None
+
+    控制台接口格式: {"data": {"balance": 总充值, "deductionBalance": 已消费}}, 剩余 = 两者之差。
+    """
+    node, _ = find_json_key(data, ["balance"])
+    if node is None:
+        return None
+    try:
+        total = float(node["balance"])
+        used = float(node.get("deductionBalance") or 0)
+    except (TypeError, ValueError):
+        return None
+
+    info = {"balance": f"${(total - used) / BALANCE_SCALE:.2f}"}
+    if "deductionBalance" in node:
+        info["used"] = f"${used / BALANCE_SCALE:.2f}"
+    plan_node, plan_key = find_json_key(data, ["plan", "planName", "subscription"])
+    if plan_node is not None and isinstance(plan_node[plan_key], str):
+        info["plan"] = plan_node[plan_key]
+    return info
+
+
+def parse_money(text):
+    """"$1,234.56" -> 123456 (美分); 无法解析返回 None"""
+    match = re.search(r"-?\d[\d,]*(?:\.\d+)?", text or "")
+    if not match:
+        return None
+    return int(round(float(match.group().replace(",", "")) * 100))
+
+
+def balance_forecast(samples):
+    """根据一个账号/区域按时间排序的采样计算消耗速度
+
+    只累计相邻采样之间的下降量 (充值造成的上升不抵消消耗), 除以采样跨度得到每日消耗;
+    返回 {"balance", "samples", "burn_per_day", "days_left"} (金额为美分, 无法预测时 days_left 为 None)。
+    """
+    latest = samples[-1]["balance"]
+    result = {"balance": latest, "samples": len(samples), "burn_per_day": None, "days_left": None}
+    span_days = (samples[-1]["ts"] - samples[0]["ts"]) / 86400
+    if len(samples) < 2 or span_days < 1 / 24:
+        return result
+
+    spent = sum(max(0, prev["balance"] - cur["balance"]) for prev, cur in zip(samples, samples[1:]))
+    burn = spent / span_days
+    result["burn_per_day"] = burn
+    if burn > 0:
+        result["days_left"] = max(0.0, latest / burn)
+    return result
+
+
+def balance_forecasts(accounts=None, days=BALANCE_WINDOW_DAYS):
+    """按 (账号, 区域) 分组计算统计窗口内的消耗预测, 可只计算指定账号"""
+    groups = {}
+    for row in SESSION_STORE.balance_samples(accounts, time.time() - days * 86400):
+        groups.setdefault((row["account"], row["region"]), []).append(row)
+    return {key: balance_forecast(samples) for key, samples in groups.items()}
+
+
+def format_cents(cents):
+    return f"${cents / 100:.2f}"
+
+
+def format_forecast(forecast):
+    """例如: 每日消耗 $0.12，约 25.3 天耗尽"""
+    if forecast["burn_per_day"] is None:
+        return f"采样不足 ({forecast['samples']} 次)，暂无法预测"
+    if forecast["days_left"] is None:
+        return "统计窗口内没有消耗"
+    return f"每日消耗 {format_cents(forecast['burn_per_day'])}，约 {forecast['days_left']:.1f} 天耗尽"
+
+
+def balance_report(days=BALANCE_WINDOW_DAYS):
+    """输出每个账号/区域的余额、每日消耗和预计耗尽时间"""
+    forecasts = balance_forecasts(days=days)
+    if not forecasts:
+        print("❌ 还没有余额采样记录")
+        return
+
+    print(f"💵 余额消耗预测 (最近 {days} 天)\n")
+    print(f"{'账号':<32}{'区域':<16}{'采样':>6}{'余额':>10}{'日均消耗':>10}{'剩余天数':>10}  预计耗尽")
+    ordered = sorted(forecasts.items(), key=lambda kv: (kv[1]["days_left"] is None, kv[1]["days_left"] or 0))
+    for (account, region), f in ordered:
+        burn = format_cents(f["burn_per_day"]) if f["burn_per_day"] is not None else "-"
+        days_left = f"{f['days_left']:.1f}" if f["days_left"] is not None else "-"
+        zero_at = format_ts(time.time() + f["days_left"] * 86400) if f["days_left"] is not None else "-"
+        print(
+            f"{account:<32}{region:<16}{f['samples']:>6}{format_cents(f['balance']):>10}"
+            f"{burn:>10}{days_left:>10}  {zero_at}"
+        )
+
+
+def fresh_totp(secret, used=None, min_remaining=TOTP_MIN_REMAINING):
+    """生成剩余有效时间充足的 TOTP 验证码
+
+    当前时间窗口剩余不足 min_remaining 秒, 或验证码与 used (刚被拒绝的验证码) 相同时,
+    等待进入下一个时间窗口再生成。返回 (验证码, 剩余有效秒数)。
+    """
+    totp = pyotp.TOTP(secret)
+    while True:
+        now = time.time()
+        remaining = totp.interval - now % totp.interval
+        code = totp.at(now)
+        if remaining >= min_remaining and code != used:
+            return code, remaining
+        time.sleep(remaining + 0.1)
+
+
+def format_ts(ts):
+    return datetime.fromtimestamp(ts).strftime("%Y-%m-%d %H:%M:%S") if ts else "未知"
+
+
+def mask_username(username):
+    """用户名脱敏 (保留前 3 个字符)"""
+    if "@" not in username[:3]:
+        return username[:3] + "**"
+    return username.split("@")[0][:3] + "**"
+
+
+def skipped_notify_content(username, plan):
+    """未到期账号的汇总信息 (使用缓存的状态与余额)"""
+    display_user = mask_username(username)
+    balance = plan.get("last_balance") or "未知"
+    balance_display = balance if balance.startswith('$') else f"${balance}"
+    content = "登录逻辑： ⏭️ 未到期，跳过本次运行\n"
+    content += f"用户： {display_user}\n"
+    content += f"上次成功： {format_ts(plan.get('last_success'))}\n"
+    content += f"下次计划： {format_ts(plan.get('next_due'))} ({plan.get('reason')})\n"
+    content += f"💵上次余额：{balance_display}\n"
+    content += "保活结果： ✅ 会话有效 (缓存)\n"
+    content += f"时间： {time.strftime('%Y-%m-%d %H:%M:%S')}"
+    return content
+
+
+# ============ 通知分发 ============
+
+class NotifyError(Exception):
+    """通知发送失败 (retry=True 时由分发器重试)"""
+
+    def __init__(self, msg, retry=True, retry_after=None):
+        super().__init__(msg)
+        self.retry = retry
+        self.retry_after = retry_after
+
+
+class NotifyDispatcher:
+    """后台通知队列
+
+    登录线程只负责入队, 由单个后台线程按顺序发送; 每个接口域名复用一个长连接 Session,
+    失败时按指数退避有限次重试。进程退出前调用 flush() 等待队列清空。
+    """
+
+    def __init__(self, retries=NOTIFY_RETRIES, backoff=1.0):
+        self.retries = retries
+        self.backoff = backoff
+        self.queue = queue.Queue()
+        self.sessions = {}
+        self.thread = None
+        self.lock = threading.Lock()
+
+    def session(self, url):
+        """按接口域名复用 Session (keep-alive)"""
+        host = url.split("//")[-1].split("/")[0]
+        with self.lock:
+            if host not in self.sessions:
+                self.sessions[host] = new_http_session()
+            return self.sessions[host]
+
+    def submit(self, func, *args, desc="通知"):
+        """入队一个发送任务, 返回 Future (可选等待结果)"""
+        future = Future()
+        with self.lock:
+            if not self.thread or not self.thread.is_alive():
+                self.thread = threading.Thread(target=self.worker, name="claw-notify", daemon=True)
+                self.thread.start()
+        self.queue.put((func, args, desc, future))
+        return future
+
+    def worker(self):
+        while True:
+            func, args, desc, future = self.queue.get()
+            try:
+                future.set_result(self.call(func, args, desc))
+            except Exception as e:
+                logger.warning(f"{desc}发送失败: {e}")
+                future.set_exception(e)
+            finally:
+                self.queue.task_done()
+
+    def call(self, func, args, desc):
+        for attempt in range(self.retries + 1):
+            try:
+                return func(*args)
+            except (NotifyError, requests.RequestException) as e:
+                retry = getattr(e, "retry", True)
+                if not retry or attempt >= self.retries:
+                    raise
+                delay = getattr(e, "retry_after", None) or self.backoff * (2 ** attempt)
+                logger.debug(f"{desc}发送失败, {delay:.1f}s 后重试: {e}")
+                time.sleep(delay)
+
+    def flush(self, timeout=60):
+        """等待队列中的通知全部发送完成"""
+        deadline = time.time() + timeout
+        while self.queue.unfinished_tasks and time.time() < deadline:
+            time.sleep(0.1)
+        if self.queue.unfinished_tasks:
+            logger.warning(f"仍有 {self.queue.unfinished_tasks} 条通知未发送完成")
+
+
+NOTIFIER = NotifyDispatcher()
+atexit.register(NOTIFIER.flush)
+
+
+def check_notify_response(resp, desc):
+    """根据 HTTP 状态判断是否需要重试 (429/5xx 重试, 其他 4xx 直接失败)"""
+    if resp.status_code == 429:
+        retry_after = None
+        try:
+            retry_after = resp.json().get("parameters", {}).get("retry_after")
+        except ValueError:
+            pass
+        raise NotifyError(f"{desc} 被限流 HTTP 429", retry_after=retry_after)
+    if resp.status_code >= 500:
+        raise NotifyError(f"{desc} HTTP {resp.status_code}")
+    if resp.status_code >= 400:
+        raise NotifyError(f"{desc} HTTP {resp.status_code}: {resp.text[:100]}", retry=False)
+    return resp
+
+
 class Telegram:
     """Telegram 通知类"""
     
@@ -103,117 +1975,361 @@ class Telegram:
         self.token = TG_BOT_TOKEN
         self.chat_id = int(TG_CHAT_ID) if TG_CHAT_ID and TG_CHAT_ID.isdigit() else None
         self.ok = bool(self.token and self.chat_id and self.token != "your_tg_bot_token")
-        self.last_update_id = 0
+        self.api = f"https://api.telegram.org/bot{self.token}"
 
     def send(self, msg):
-        """发送 TG 消息"""
+        """发送 TG 消息 (后台发送, 返回 Future, 结果为 message_id)"""
         if not self.ok:
-            return
-        try:
-            requests.post(
-                f"https://api.telegram.org/bot{self.token}/sendMessage",
-                data={"chat_id": self.chat_id, "text": msg, "parse_mode": "HTML"},
-                timeout=30
-            )
-        except Exception as e:
-            logger.warning(f"TG 消息发送失败: {e}")
+            return None
+        return NOTIFIER.submit(self._send, msg, desc="TG 消息")
+
+    def _send(self, msg):
+        url = f"{self.api}/sendMessage"
+        resp = NOTIFIER.session(url).post(
+            url,
+            data={"chat_id": self.chat_id, "text": msg, "parse_mode": "HTML"},
+            timeout=30
+        )
+        check_notify_response(resp, "TG 消息")
+        return resp.json().get("result", {}).get("message_id")
 
-    def photo(self, path, caption=""):
-        """发送 TG 图片"""
-        if not self.ok or not os.path.exists(path):
+    def photo(self, data, filename, caption=""):
+        """发送内存中的 TG 图片 (后台发送, Future 结果为 message_id)"""
+        if not self.ok or not data:
             return None
-        try:
-            with open(path, 'rb') as f:
-                resp = requests.post(
-                    f"https://api.telegram.org/bot{self.token}/sendPhoto",
-                    data={"chat_id": self.chat_id, "caption": caption[:1024]},
-                    files={"photo": f},
-                    timeout=60
-                )
-                if resp.ok:
-                    return resp.json().get("result", {}).get("message_id")
-        except Exception as e:
-            logger.warning(f"TG 图片发送失败: {e}")
-        return None
+        return NOTIFIER.submit(self._photo, data, filename, caption, desc="TG 图片")
+
+    def _photo(self, data, filename, caption):
+        url = f"{self.api}/sendPhoto"
+        resp = NOTIFIER.session(url).post(
+            url,
+            data={"chat_id": self.chat_id, "caption": caption[:1024]},
+            files={"photo": (filename, data)},
+            timeout=60
+        )
+        check_notify_response(resp, "TG 图片")
+        return resp.json().get("result", {}).get("message_id")
 
-    def get_updates(self, offset=None, timeout=30):
-        """获取 TG 更新"""
+    def get_updates(self, offset=None, timeout=30, session=None):
+        """获取 TG 更新 (长轮询应使用独立的 session, 避免占用通知发送的连接)"""
         if not self.ok:
             return []
-        url = f"https://api.telegram.org/bot{self.token}/getUpdates"
-        params = {"timeout": timeout}
+        url = f"{self.api}/getUpdates"
+        params = {"timeout": timeout, "allowed_updates": json.dumps(["message"])}
         if offset:
             params["offset"] = offset
         try:
-            resp = requests.get(url, params=params, timeout=timeout + 10)
+            resp = (session or NOTIFIER.session(url)).get(url, params=params, timeout=timeout + 10)
             if resp.ok:
                 return resp.json().get("result", [])
         except Exception as e:
             logger.warning(f"获取 TG 更新失败: {e}")
         return []
 
-    def clear_pending_updates(self):
-        """清除由于积压的消息"""
+
+class CodeWaiter:
+    """一个正在等待 TG 验证码的账号"""
+
+    def __init__(self, tag):
+        self.tag = str(tag)
+        self.message_ids = set()
+        self.codes = queue.Queue()
+        # 登记时间 (与 TG 消息的 date 一样精确到秒), 更早发送的消息不属于本次等待
+        self.since = int(time.time())
+
+    def add_message(self, future, timeout=30):
+        """登记发给该账号的 TG 消息 (Future 结果为 message_id), 用户回复这些消息即路由到该账号"""
+        if future is None:
+            return
         try:
-            updates = self.get_updates(timeout=1)
-            if updates:
-                last_id = updates[-1]["update_id"]
-                self.last_update_id = last_id + 1
-                self.get_updates(offset=self.last_update_id, timeout=1)
-                logger.info("已清理 TG 积压消息")
-        except:
-            pass
+            message_id = future.result(timeout=timeout)
+        except Exception:
+            return
+        if message_id:
+            self.message_ids.add(message_id)
+
+    def get(self, timeout):
+        try:
+            return self.codes.get(timeout=max(0, timeout))
+        except queue.Empty:
+            return None
+
+
+class TelegramRouter:
+    """进程内唯一的 TG 更新轮询线程, 把 6 位验证码路由给正在等待的账号
+
+    路由规则 (依次匹配):
+      1. 回复 (reply) 了发给某个账号的截图/消息
+      2. 带账号序号前缀, 例如 "#2 123456" 或 "2:123456"
+      3. 只有一个账号在等待时, 直接发送 6 位数字
+    首次轮询时跳过启动前积压的消息, 之后 offset 只由本线程推进, 不会互相丢失更新;
+    无人等待期间发送的消息早于账号的登记时间, 不会被投递给之后才开始等待的账号。
+
+    配置 TG_WEBHOOK_URL 时改为 Webhook 模式: 启动内置 HTTP 接收端并调用 setWebhook,
+    更新由 Telegram 推送; setWebhook 失败时回退为轮询。两种来源按 update_id 去重。
+    """
+
+    CODE_RE = re.compile(r"^\s*(?:#?(\d{1,3})\s*[:：#\s]\s*)?(\d{6})\s*$")
+
+    def __init__(self, tg):
+        self.tg = tg
+        self.lock = threading.Lock()
+        self.has_waiters = threading.Condition(self.lock)
+        self.waiters = []
+        self.offset = None
+        self.thread = None
+        self.session = requests.Session()
+        self.webhook = None
+        self.seen = collections.deque(maxlen=200)
+
+    def register(self, tag):
+        waiter = CodeWaiter(tag)
+        with self.lock:
+            self.waiters.append(waiter)
+            start = not self.thread
+            if start:
+                self.thread = threading.Thread(target=self.run, name="claw-tg-router", daemon=True)
+            self.has_waiters.notify_all()
+        if start:
+            self.thread.start()
+        return waiter
+
+    def run(self):
+        if TG_WEBHOOK_URL and self.start_webhook():
+            return
+        self.loop()
+
+    def start_webhook(self):
+        """启动内置接收端并注册 Webhook, 成功返回 True"""
+        try:
+            self.webhook = WebhookServer(self, TG_WEBHOOK_LISTEN, TG_WEBHOOK_PORT, TG_WEBHOOK_SECRET)
+        except OSError as e:
+            logger.warning(f"TG Webhook 接收端启动失败，改为轮询: {e}")
+            return False
+
+        url = f"{self.tg.api}/setWebhook"
+        try:
+            resp = self.session.post(url, data={
+                "url": TG_WEBHOOK_URL,
+                "secret_token": TG_WEBHOOK_SECRET,
+                "allowed_updates": json.dumps(["message"]),
+                # 与轮询模式一样不处理启动前积压的消息
+                "drop_pending_updates": "true",
+            }, timeout=15)
+            check_notify_response(resp, "TG setWebhook")
+        except Exception as e:
+            logger.warning(f"TG setWebhook 失败，改为轮询 (接收端保持运行): {e}")
+            return False
+
+        atexit.register(self.delete_webhook)
+        logger.info(f"TG Webhook 已启用: {TG_WEBHOOK_URL} -> {TG_WEBHOOK_LISTEN}:{self.webhook.port}")
+        return True
+
+    def delete_webhook(self):
+        """退出时删除 Webhook, 否则下次运行的 getUpdates 会返回 409"""
+        try:
+            self.session.post(f"{self.tg.api}/deleteWebhook", timeout=10)
+        except Exception as e:
+            logger.warning(f"TG deleteWebhook 失败: {e}")
+        if self.webhook:
+            self.webhook.close()
+
+    def unregister(self, waiter):
+        with self.lock:
+            if waiter in self.waiters:
+                self.waiters.remove(waiter)
+
+    def skip_backlog(self):
+        """offset=-1 只返回最后一条更新, 从它之后开始接收"""
+        updates = self.tg.get_updates(offset=-1, timeout=0, session=self.session)
+        self.offset = updates[-1]["update_id"] + 1 if updates else 0
+
+    def loop(self):
+        while True:
+            with self.lock:
+                while not self.waiters:
+                    self.has_waiters.wait()
+            if self.offset is None:
+                self.skip_backlog()
+            started = time.time()
+            updates = self.tg.get_updates(offset=self.offset, timeout=10, session=self.session)
+            if not updates and time.time() - started < 1:
+                # 请求失败 (立即返回) 时避免空转
+                time.sleep(2)
+            for update in updates:
+                self.offset = update["update_id"] + 1
+                self.dispatch_update(update)
+
+    def dispatch_update(self, update):
+        update_id = update.get("update_id")
+        with self.lock:
+            if update_id is not None:
+                if update_id in self.seen:
+                    return
+                self.seen.append(update_id)
+        self.dispatch(update.get("message") or {})
+
+    def dispatch(self, message):
+        if message.get("chat", {}).get("id") != self.tg.chat_id or "text" not in message:
+            return
+        match = self.CODE_RE.match(message["text"])
+        if not match:
+            return
+        tag, code = match.groups()
+        reply_to = (message.get("reply_to_message") or {}).get("message_id")
+        sent_at = message.get("date") or int(time.time())
+
+        with self.lock:
+            waiters = [w for w in self.waiters if sent_at >= w.since]
+            target = None
+            if reply_to:
+                target = next((w for w in waiters if reply_to in w.message_ids), None)
+            if not target and tag:
+                target = next((w for w in waiters if w.tag == tag), None)
+            if not target and not tag and len(waiters) == 1:
+                target = waiters[0]
+            waiting = [w.tag for w in waiters]
+
+        if target:
+            target.codes.put(code)
+        elif waiting:
+            self.tg.send(
+                "❓ 无法确定验证码属于哪个账号，请直接回复对应账号的截图，"
+                f"或加上账号序号发送，例如：#{waiting[0]} {code}\n"
+                f"正在等待的账号序号：{', '.join(waiting)}"
+            )
+
+
+class WebhookHandler(BaseHTTPRequestHandler):
+    """接收 Telegram 推送的更新, 校验密钥后交给路由"""
+
+    def log_message(self, fmt, *args):
+        pass
+
+    def do_POST(self):
+        server = self.server
+        if self.path.split("?")[0] != server.path:
+            self.reply(404)
+            return
+        if self.headers.get("X-Telegram-Bot-Api-Secret-Token") != server.secret:
+            self.reply(403)
+            return
+        try:
+            length = int(self.headers.get("Content-Length") or 0)
+            update = json.loads(self.rfile.read(length).decode("utf-8"))
+        except ValueError:
+            self.reply(400)
+            return
+        # 先确认收到, 避免 Telegram 因超时重试
+        self.reply(200)
+        server.router.dispatch_update(update)
+
+    def reply(self, status):
+        self.send_response(status)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+
+class WebhookServer:
+    """内置 Webhook 接收端, 路径取自 TG_WEBHOOK_URL (默认 /telegram)"""
+
+    def __init__(self, router, host, port, secret):
+        self.httpd = ThreadingHTTPServer((host, port), WebhookHandler)
+        self.httpd.daemon_threads = True
+        self.httpd.router = router
+        self.httpd.secret = secret
+        self.httpd.path = urlparse(TG_WEBHOOK_URL).path or "/telegram"
+        self.port = self.httpd.server_address[1]
+        threading.Thread(target=self.httpd.serve_forever, name="claw-tg-webhook", daemon=True).start()
+
+    def close(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+TG_ROUTER = TelegramRouter(Telegram())
 
 
 class WeChat:
     """自定义微信通知类 (兼容 Nodeloc/LinuxDo 脚本配置)"""
+
+    # 记录每个接口可用的请求方式, 避免每次都先 GET 再 POST
+    method_cache_file = os.path.join(SCRIPT_DIR, "claw_wechat_method.json")
+    method_lock = threading.Lock()
+
     def __init__(self):
         self.url = WECHAT_API_URL
         self.token = WECHAT_AUTH_TOKEN
         self.ok = bool(self.url and self.token)
 
+    @classmethod
+    def load_methods(cls):
+        try:
+            with open(cls.method_cache_file, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    @classmethod
+    def save_method(cls, url, method):
+        with cls.method_lock:
+            methods = cls.load_methods()
+            if methods.get(url) == method:
+                return
+            methods[url] = method
+            try:
+                with open(cls.method_cache_file, "w", encoding="utf-8") as f:
+                    json.dump(methods, f, ensure_ascii=False)
+            except OSError as e:
+                logger.debug(f"保存微信接口请求方式失败: {e}")
+
     def send(self, content):
-        """发送文本消息"""
+        """发送文本消息 (后台发送, 返回 Future)"""
         if not self.ok:
-            return
-        
+            return None
+        return NOTIFIER.submit(self._send, content, desc="微信通知")
+
+    def _send(self, content):
         params = {
             "token": self.token,
             "title": "ClawCloud 保活通知",
             "content": content
         }
-        
-        try:
-            # 优先尝试 GET 请求
-            resp = requests.get(self.url, params=params, timeout=10)
-            
-            # 如果 GET 失败 (405 Method Not Allowed), 尝试 POST
+        session = NOTIFIER.session(self.url)
+        method = self.load_methods().get(self.url, "GET")
+
+        if method == "POST":
+            resp = session.post(self.url, json=params, timeout=10)
+        else:
+            resp = session.get(self.url, params=params, timeout=10)
+            # GET 不被支持 (405 Method Not Allowed) 时改用 POST 并记住
             if resp.status_code == 405:
-                resp = requests.post(self.url, json=params, timeout=10)
-            
-            if resp.status_code >= 400:
-                logger.warning(f"微信通知发送失败 HTTP {resp.status_code}: {resp.text[:100]}")
-            else:
-                logger.info("微信通知发送成功")
-                
-        except Exception as e:
-            logger.warning(f"微信通知异常: {e}")
+                resp = session.post(self.url, json=params, timeout=10)
+                if resp.status_code < 400:
+                    self.save_method(self.url, "POST")
+
+        check_notify_response(resp, "微信通知")
+        logger.info("微信通知发送成功")
 
 
 class AutoLogin:
     """ClawCloud 自动登录和保活类"""
     
-    def __init__(self, account, account_index):
+    def __init__(self, account, account_index, browser_pool=None):
         self.logs = []
         self.shots = []
+        self.last_shot_hash = None
+        self.last_photo = None
         self.n = 0
         self.used_old_cookie = False
         self.authenticator_2fa = False
         self.github_mobile_2fa = False
+        self.two_factor_failed = False
         self.username = account["username"]
         self.password = account["password"]
         self.totp_secret = account.get("totp_secret", "").strip()  # 2FA 密钥
         self.account_index = account_index
+        # 旧版 Cookie 文件, 首次运行时自动迁移到会话库
         self.cookie_file = os.path.join(
             SCRIPT_DIR,
             f"cookies_{self.username.replace('@', '_').replace('.', '_')}.json"
@@ -222,9 +2338,58 @@ class AutoLogin:
         self.wx = WeChat()
         self.old_cookies = self.load_cookies()
         self.balance = "未知"
+        self.balance_info = {}
+        # 性能日志中匹配余额接口的响应: requestId -> URL
+        self.api_responses = {}
+        # 性能日志不可用 (如 Selenium 服务不支持) 时置为 False, 不再等待接口响应
+        self.perf_log = True
         self.success = True
         self.notify_content = ""
         self.driver = None
+        self.browser_pool = browser_pool
+        self.browser_context_id = None
+        self.http = None
+        self.net_stats = {"requests": 0, "blocked": 0, "bytes": 0}
+        self.profile_dir = None
+        self.profile_warm = False
+        self.mem_slot = False
+        self.mem_monitor = None
+        self.mem_stats = {}
+        self.proxy = CLAW_PROXY
+        if PROXY_POOL:
+            self.proxy = PROXY_POOL.assign(self.username) or CLAW_PROXY
+        self.retry_flow = False
+
+    def span(self, stage, **fields):
+        """记录当前账号一个阶段的耗时"""
+        return TRACER.span(stage, self.account_index, **fields)
+
+    def find_selector(self, page, slot, selectors, timeout=10, visible=True):
+        """在候选选择器中查找元素, 返回 (元素, 命中的选择器), 超时返回 (None, None)
+
+        上次命中的选择器排在最前, 每次轮询用一次 JS 查询竞速全部候选,
+        不再逐个选择器等待超时; 命中情况写入追踪 (stage=selector)。
+        """
+        ordered, cached = SELECTOR_CACHE.order(page, slot, selectors)
+        with self.span("selector", page=page, slot=slot) as record:
+            deadline = time.time() + timeout
+            while True:
+                try:
+                    found = self.driver.execute_script(FIND_SELECTOR_JS, ordered, visible)
+                except Exception:
+                    found = None
+                if found:
+                    break
+                if time.time() >= deadline:
+                    record["outcome"] = "fail"
+                    return None, None
+                time.sleep(0.2)
+
+            selector = ordered[int(found[0])]
+            record["selector"] = selector
+            record["cache_hit"] = None if cached is None else selector == cached
+        SELECTOR_CACHE.record(page, slot, selector)
+        return found[1], selector
 
     def log(self, msg, level="INFO"):
         """记录日志"""
@@ -234,446 +2399,609 @@ class AutoLogin:
         self.logs.append(msg)
 
     def shot(self, name, push_to_tg=False, caption=""):
-        """截图"""
+        """截图 (内存中处理, 与上一张相同的画面不重复发送, 需要推送时改为只发送文字说明)"""
         if not (push_to_tg or "两步验证" in name or "失败" in name):
             return None
         
-        self.n += 1
-        filename = f"{self.n:02d}_{self.username[:8]}_{name}.png"
-        filepath = os.path.join(SCRIPT_DIR, filename)
-        
         try:
-            self.driver.save_screenshot(filepath)
-            self.shots.append(filepath)
-            if push_to_tg:
-                self.tg.photo(filepath, caption or name)
-            return filepath
+            png = self.driver.get_screenshot_as_png()
         except Exception as e:
             logger.warning(f"截图失败: {e}")
-        return None
+            return None
 
-    def load_cookies(self):
-        """加载本地 Cookie"""
-        if not os.path.exists(self.cookie_file):
-            self.log("未检测到本地 Cookies，将进行登录", "INFO")
+        digest = hashlib.sha1(png).hexdigest()
+        if digest == self.last_shot_hash:
+            logger.debug(f"截图与上一张相同, 跳过: {name}")
+            if push_to_tg:
+                # 画面相同但提示不同 (如最终失败告警), 只发送文字, 不能吞掉通知
+                self.last_photo = self.tg.send(caption or name)
             return None
+        self.last_shot_hash = digest
+
+        data, ext = encode_screenshot(png)
+        self.n += 1
+        filename = f"{self.n:02d}_{self.username[:8]}_{name}.{ext}"
+        self.shots.append(filename)
+
+        if CLAW_SAVE_SHOTS:
+            try:
+                with open(os.path.join(SCRIPT_DIR, filename), "wb") as f:
+                    f.write(data)
+            except OSError as e:
+                logger.warning(f"截图保存失败: {e}")
+
+        if push_to_tg:
+            self.last_photo = self.tg.photo(data, filename, caption or name)
+        return filename
+
+    def load_cookies(self):
+        """从会话库加载本地 Cookie (已过期的不会返回)"""
         try:
-            with open(self.cookie_file, "r", encoding="utf-8") as f:
-                cookies = json.load(f)
-                if cookies:
-                    self.log("检测到本地 Cookies，尝试复用", "INFO")
-                    return cookies
+            SESSION_STORE.migrate_json(self.username, self.cookie_file)
+            cookies = SESSION_STORE.load_cookies(self.username)
         except Exception as e:
             logger.warning(f"加载 Cookie 失败: {e}")
-        return None
+            return None
+        if not cookies:
+            self.log("未检测到本地 Cookies，将进行登录", "INFO")
+            return None
+        self.log("检测到本地 Cookies，尝试复用", "INFO")
+        return cookies
 
     def save_cookies(self, cookies):
-        """保存 Cookie"""
+        """保存 Cookie 到会话库 (事务写入)"""
         if not cookies:
             return
         try:
-            with open(self.cookie_file, "w", encoding="utf-8") as f:
-                json.dump(cookies, f, indent=2, ensure_ascii=False)
+            SESSION_STORE.save_cookies(self.username, cookies)
             self.log("已保存最新 Cookies", "SUCCESS")
         except Exception as e:
             logger.warning(f"保存 Cookie 失败: {e}")
 
-    def is_logged_in(self):
-        """检测是否已登录"""
-        self.log("正在检测是否已登录到仪表盘...", "INFO")
-        
-        for attempt in range(3):  # 减少尝试次数从5到3
+    def detect_login_state(self):
+        """注入一次脚本, 同时检查仪表盘与登录页标志
+
+        返回 (状态, 命中的标志), 状态为 LOGIN_STATE_IN / LOGIN_STATE_OUT / LOGIN_STATE_UNKNOWN
+        """
+        try:
+            result = self.driver.execute_script(LOGIN_STATE_JS, DASHBOARD_STRONG_MARKERS, DASHBOARD_MARKERS) or {}
+        except Exception as e:
+            logger.debug(f"检测异常: {e}")
+            return LOGIN_STATE_UNKNOWN, None
+        return result.get("state", LOGIN_STATE_UNKNOWN), result.get("marker")
+
+    def check_session_http(self):
+        """不启动浏览器, 用本地 Cookie 判断 ClawCloud 会话是否有效
+
+        返回 True (有效) / False (已失效) / None (无法判断, 交给浏览器流程)
+        """
+        cookies = [c for c in self.old_cookies or [] if is_claw_cookie(c)]
+        if not cookies:
+            return None
+
+        self.http = new_http_session(cookies, self.proxy)
+        url = f"{CLAW_CLOUD_URL}{CLAW_SESSION_CHECK_PATH}"
+        try:
+            resp = self.http.get(url, timeout=10, allow_redirects=False)
+        except requests.RequestException as e:
+            if self.proxy_failover(e):
+                return self.check_session_http()
+            self.log(f"免浏览器预检请求失败: {e}", "WARN")
+            return None
+
+        location = resp.headers.get("Location", "")
+        if resp.status_code in (401, 403) or (resp.is_redirect and "signin" in location):
+            self.log(f"免浏览器预检: 会话已失效 (HTTP {resp.status_code})", "INFO")
+            return False
+
+        if resp.status_code == 200 and "json" in resp.headers.get("Content-Type", ""):
             try:
-                # 检查是否在登录页
-                if "/signin" in self.driver.current_url:
-                    return False
-                
-                # 检查是否有 GitHub 登录按钮
+                if session_payload_ok(resp.json()):
+                    return True
+            except ValueError:
+                pass
+
+        # 返回体没有确认登录身份时不当作有效, 交给浏览器流程, 避免误判后被调度计划跳过
+        self.log(f"免浏览器预检无法判断会话状态 (HTTP {resp.status_code})", "INFO")
+        return None
+
+    def is_logged_in(self, timeout=None):
+        """检测是否已登录 (所有标志共享同一个截止时间)"""
+        self.log("正在检测是否已登录到仪表盘...", "INFO")
+        with self.span("dashboard_detection") as span:
+            state = self.wait_login_state(timeout or DASHBOARD_DETECT_TIMEOUT)
+            span["outcome"] = state
+        return state == LOGIN_STATE_IN
+
+    def wait_login_state(self, timeout):
+        """在截止时间内轮询登录状态, 返回三态结果"""
+        deadline = time.time() + timeout
+        refresh_at = time.time() + timeout / 2
+        refreshed = False
+
+        while True:
+            state, marker = self.detect_login_state()
+            if state == LOGIN_STATE_IN:
+                self.log(f"检测成功: 找到元素 {marker}", "SUCCESS")
+                return state
+            if state == LOGIN_STATE_OUT:
+                self.log(f"检测到登录页标志: {marker}", "INFO")
+                return state
+
+            now = time.time()
+            if now >= deadline:
+                break
+            # 页面迟迟没有渲染出任何标志时刷新一次
+            if not refreshed and now >= refresh_at:
+                self.log("仪表盘未就绪，刷新后继续检测...", "WARN")
                 try:
-                    github_btns = self.driver.find_elements(By.XPATH, "//button[contains(text(), 'GitHub')] | //a[contains(text(), 'GitHub')]")
-                    if github_btns:
-                        return False
-                except:
+                    self.driver.refresh()
+                except Exception:
                     pass
-                
-                # 检查仪表盘元素(减少等待时间)
-                selectors = [
-                    (By.XPATH, "//*[contains(text(), 'App Launchpad')]"),
-                    (By.XPATH, "//*[contains(text(), 'Database')]"),
-                    (By.XPATH, "//*[contains(text(), 'Devbox')]"),
-                    (By.XPATH, "//*[contains(text(), 'Object Storage')]"),
-                    (By.XPATH, "//*[contains(text(), 'Terminal')]"),
-                    (By.CSS_SELECTOR, "input[placeholder*='Search']"),
-                    (By.XPATH, "//*[contains(text(), 'Germany')]"),
-                    (By.XPATH, "//*[contains(text(), 'Japan')]"),
-                ]
-                
-                for by, selector in selectors:
-                    try:
-                        elem = WebDriverWait(self.driver, 10).until(  # 减少从15到10秒
-                            EC.visibility_of_element_located((by, selector))
-                        )
-                        if elem:
-                            self.log(f"第 {attempt+1} 次检测成功: 找到元素 {selector}", "SUCCESS")
-                            return True
-                    except:
-                        continue
-                        
-            except Exception as e:
-                logger.debug(f"检测异常: {e}")
-            
-            self.log(f"第 {attempt+1} 次检测未通过，等待重试...", "WARN")
-            time.sleep(5)  # 减少从8到5秒
-            
-            try:
-                self.driver.refresh()
-                time.sleep(3)  # 减少从5到3秒
-            except:
-                pass
-        
-        return False
+                refreshed = True
+            time.sleep(0.5)
+
+        self.log(f"{timeout} 秒内无法判断登录状态", "WARN")
+        return LOGIN_STATE_UNKNOWN
 
     def wait_for_2fa_code_via_telegram(self, max_wait=180):
-        """通过 TG 等待 2FA 验证码"""
+        """通过 TG 等待 2FA 验证码 (由共享的 TG_ROUTER 按账号路由)"""
         if not self.tg.ok:
             self.log("未配置 TG 机器人，无法进行交互式验证", "ERROR")
             return False
 
-        self.tg.clear_pending_updates()
+        waiter = TG_ROUTER.register(self.account_index)
+        try:
+            return self.receive_2fa_code(waiter, max_wait)
+        finally:
+            TG_ROUTER.unregister(waiter)
 
+    def receive_2fa_code(self, waiter, max_wait):
         caption = (
             f"⚠️ 【第{self.account_index}个账号】GitHub 两步验证（Authenticator app）\n\n"
             "⚠️ 检测到未配置 totp_secret (2FA密钥)\n"
             "请立即查看 Google Authenticator / Authy 等当前 6 位动态码\n"
-            "👉 直接在本 TG 对话框回复数字（例如：123456）\n"
+            "👉 直接回复本图片发送数字（例如：123456）\n"
+            f"👉 或带上账号序号发送（例如：#{self.account_index} 123456）\n"
             "🤖 脚本收到后会立即自动填写并提交\n"
             f"⏳ 最多等待 {max_wait} 秒"
         )
+        self.last_photo = None
         self.shot("两步验证页面", push_to_tg=True, caption=caption)
-        self.tg.send("🚀 正在等待您回复验证码...（回复后立即自动填写）")
+        prompt = self.tg.send(f"🚀 【第{self.account_index}个账号】正在等待您回复验证码...（回复后立即自动填写）")
+        waiter.add_message(self.last_photo)
+        waiter.add_message(prompt)
+
+        self.authenticator_2fa = True
+        deadline = time.time() + max_wait
+
+        while True:
+            text = waiter.get(deadline - time.time())
+            if not text:
+                break
+            self.tg.send(f"✅ 【第{self.account_index}个账号】收到验证码：{text}，立即自动填写并提交...")
+
+            try:
+                self.submit_otp(text)
+
+                self.log(f"已立即使用验证码 {text} 自动填写并提交", "SUCCESS")
+                self.tg.send(f"✅ 【第{self.account_index}个账号】已自动填写验证码 {text} 并提交")
+                return True
+
+            except Exception as e:
+                self.log(f"自动填写失败: {e}", "ERROR")
+                self.tg.send(f"❌ 【第{self.account_index}个账号】自动填写失败，请手动输入当前验证码完成登录")
+                return False
+
+        self.tg.send(f"⏰ 【第{self.account_index}个账号】等待超时，未收到验证码（请手动完成验证）")
+        self.log("等待验证码超时", "WARN")
+        return False
+
+    def detect_page_state(self):
+        """根据 URL 与页面元素判断当前所处的登录阶段"""
+        try:
+            url = self.driver.current_url
+        except Exception:
+            return STATE_UNKNOWN
+
+        if "github.com" in url:
+            if "oauth/authorize" in url:
+                return STATE_AUTHORIZE
+            if "two-factor" in url or "two_factor" in url:
+                return STATE_TWO_FACTOR
+            if "github.com/login" in url or "github.com/session" in url:
+                return STATE_GITHUB_LOGIN
+            return STATE_UNKNOWN
+
+        if "/signin" in url:
+            return STATE_LANDING
+
+        login_state, _ = self.detect_login_state()
+        if login_state == LOGIN_STATE_OUT:
+            return STATE_LANDING
+        if login_state == LOGIN_STATE_IN:
+            return STATE_DASHBOARD
+        return STATE_UNKNOWN
+
+    def wait_for_state(self, timeout, leave=None):
+        """等待页面进入一个已知状态 (且不同于 leave), 超时返回当前状态"""
+        def changed(_):
+            state = self.detect_page_state()
+            if state != STATE_UNKNOWN and state != leave:
+                return state
+            return False
+
+        try:
+            return WebDriverWait(self.driver, timeout, poll_frequency=0.5).until(changed)
+        except TimeoutException:
+            return self.detect_page_state()
 
+    def handle_landing(self):
+        """ClawCloud 登录页: 点击 GitHub 登录按钮"""
+        login_btn = WebDriverWait(self.driver, 10).until(
+            EC.element_to_be_clickable((By.XPATH, GITHUB_BUTTON_XPATH))
+        )
+        self.shot("ClawCloud登录界面")
+        login_btn.click()
+        self.log("已点击 GitHub 登录按钮", "SUCCESS")
+
+    def handle_github_login(self):
+        """GitHub 密码登录页: 填写账号密码并提交"""
+        self.log("进入 GitHub 密码登录页面", "INFO")
+
+        username_field = WebDriverWait(self.driver, 10).until(
+            EC.presence_of_element_located((By.ID, "login_field"))
+        )
+        username_field.clear()
+        username_field.send_keys(self.username)
+        
+        password_field = self.driver.find_element(By.ID, "password")
+        password_field.clear()
+        password_field.send_keys(self.password)
+        
+        submit_btn = self.driver.find_element(By.CSS_SELECTOR, "input[type='submit']")
+        submit_btn.click()
+        
+        self.log("✅ 已提交账号密码", "SUCCESS")
+        self.shot("提交密码后")
+
+    def handle_two_factor(self):
+        """GitHub 两步验证页: Authenticator 自动填写 / GitHub Mobile 等待批准
+
+        返回值为等待离开该页面的超时时间
+        """
+        self.log("⚠️ 检测到两步验证", "WARN")
+        WebDriverWait(self.driver, 10).until(
+            EC.presence_of_element_located((By.XPATH, "//*[contains(text(), 'Two-factor authentication')]"))
+        )
+        
+        # 检查是 Authenticator 还是 GitHub Mobile
+        page_text = self.driver.page_source
+        
+        if "Enter the code from your two-factor authentication app" not in page_text:
+            # GitHub Mobile
+            self.github_mobile_2fa = True
+            caption = (
+                f"⚠️ 【第{self.account_index}个账号】检测到 GitHub 两步验证（GitHub Mobile）\n\n"
+                "请打开手机 GitHub App，批准登录请求\n"
+                "脚本已等待60秒供您操作，完成后会自动继续"
+            )
+            self.shot("两步验证页面", push_to_tg=True, caption=caption)
+            self.log("等待60秒让你手动批准 GitHub Mobile 2FA...", "WARN")
+            return 60
+
+        # Authenticator app - 使用 pyotp 自动生成
         self.authenticator_2fa = True
-        start_time = time.time()
+        
+        if not self.totp_secret and self.tg.ok:
+            # 没有配置密钥: 通过共享的 TG 路由等待用户回复验证码 (多个账号可同时等待)
+            if self.wait_for_2fa_code_via_telegram(TG_2FA_WAIT):
+                return TOTP_VERIFY_TIMEOUT
+            self.two_factor_failed = True
+            return 1
+
+        if not self.totp_secret:
+            # 没有配置密钥也没有配置 TG, 发送微信通知并等待手动输入
+            caption = (
+                f"⚠️ 【第{self.account_index}个账号】检测到 GitHub 两步验证\n\n"
+                "未配置 totp_secret,无法自动填写验证码\n"
+                "请手动输入验证码或配置 2FA 密钥"
+            )
+            self.shot("两步验证页面", push_to_tg=True, caption=caption)
+            self.log("未配置 2FA 密钥,等待60秒手动输入", "WARN")
+            return 60
+
+        used = None
+        for attempt in (1, 2):
+            try:
+                token, remaining = fresh_totp(self.totp_secret, used)
+                self.log(f"生成 2FA 验证码: {token} (剩余有效 {remaining:.0f} 秒)", "INFO")
+                self.submit_otp(token)
+            except Exception as e:
+                self.log(f"2FA 自动填写失败: {e}", "ERROR")
+                self.shot("2FA失败页面", push_to_tg=True, caption=f"❌ 2FA 自动填写失败: {e}")
+                return STATE_TIMEOUTS[STATE_TWO_FACTOR]
+
+            # 校验结果: 离开两步验证页即为通过
+            if self.wait_for_state(TOTP_VERIFY_TIMEOUT, leave=STATE_TWO_FACTOR) != STATE_TWO_FACTOR:
+                self.log("✅ 2FA 验证码已自动填写并提交", "SUCCESS")
+                return 1
+            used = token
+            if attempt == 1:
+                self.log("2FA 验证码未通过，使用下一个时间窗口的验证码重试", "WARN")
+
+        self.two_factor_failed = True
+        self.log("2FA 验证码两次均未通过，请检查 2FA 密钥与系统时间", "ERROR")
+        self.shot("2FA失败页面", push_to_tg=True, caption="❌ 2FA 验证码两次均未通过，请检查 2FA 密钥与系统时间")
+        return 1
+
+    def submit_otp(self, token):
+        """填写并提交验证码 (GitHub 输满 6 位会自动提交, 已跳转时不再点击)"""
+        otp_input, _ = self.find_selector(STATE_TWO_FACTOR, "otp_input", OTP_INPUT_SELECTORS)
+        if not otp_input:
+            raise Exception("未找到 OTP 输入框")
+
+        otp_input.clear()
+        self.driver.execute_script(OTP_SUBMIT_WATCH_JS, otp_input)
+        otp_input.send_keys(token)
+        self.log("已输入 2FA 验证码", "INFO")
+
+        if self.wait_otp_submitted(otp_input):
+            return
+
+        # 查找并点击提交按钮
+        try:
+            submit_btn, selector = self.find_selector(STATE_TWO_FACTOR, "otp_submit", OTP_SUBMIT_SELECTORS, timeout=2)
+            if submit_btn:
+                submit_btn.click()
+                self.log(f"已点击提交按钮: {selector}", "INFO")
+            else:
+                # 如果找不到按钮,尝试按回车
+                otp_input.send_keys(Keys.RETURN)
+                self.log("已按回车提交", "INFO")
+
+        except Exception as e:
+            logger.warning(f"提交方式失败: {e}")
+            # 最后的尝试:直接提交表单
+            try:
+                self.driver.execute_script("arguments[0].form.submit();", otp_input)
+                self.log("已通过 JS 提交表单", "INFO")
+            except:
+                pass
+
+    def wait_otp_submitted(self, otp_input):
+        """等待输满 6 位后的自动提交完成, 返回是否已提交
+
+        自动提交开始后等待页面跳转 (输入框失效), 最长 TOTP_VERIFY_TIMEOUT 秒, 期间不再点击或回车,
+        避免同一验证码提交两次; OTP_AUTO_SUBMIT_GRACE 秒内未开始提交时返回 False, 由调用方手动提交。
+        """
+        def started(driver):
+            try:
+                return driver.execute_script(OTP_SUBMIT_STARTED_JS, otp_input)
+            except WebDriverException:
+                # 输入框已失效或页面正在跳转
+                return True
+
+        try:
+            WebDriverWait(self.driver, OTP_AUTO_SUBMIT_GRACE, poll_frequency=0.1).until(started)
+        except TimeoutException:
+            return False
+        try:
+            WebDriverWait(self.driver, TOTP_VERIFY_TIMEOUT, poll_frequency=0.2).until(EC.staleness_of(otp_input))
+        except TimeoutException:
+            self.log("2FA 验证码已自动提交，但页面未跳转", "WARN")
+        return True
+
+    def handle_authorize(self):
+        """GitHub OAuth 授权页: 点击 Authorize"""
+        self.log("检测到 GitHub 授权页面", "SUCCESS")
+        self.shot("GitHub授权页")
+        auth_btn = WebDriverWait(self.driver, 10).until(
+            EC.element_to_be_clickable((By.XPATH, "//button[contains(text(), 'Authorize')]"))
+        )
+        auth_btn.click()
+        self.log("✅ 已自动授权 ClawCloud", "SUCCESS")
+
+    def full_github_login(self):
+        """执行完整 GitHub 登录流程
+
+        状态机: 登录页 → GitHub 登录 → 2FA → 授权 → 仪表盘。
+        每一步只等待 URL/DOM 条件成立 (带超时), 页面就绪即进入下一步。
+        """
+        self.log("执行完整 GitHub 登录流程", "STEP")
+
+        handlers = {
+            STATE_LANDING: self.handle_landing,
+            STATE_GITHUB_LOGIN: self.handle_github_login,
+            STATE_TWO_FACTOR: self.handle_two_factor,
+            STATE_AUTHORIZE: self.handle_authorize,
+        }
+        visits = {}
+        refreshed = False
+        deadline = time.time() + LOGIN_TIMEOUT
+        state = self.wait_for_state(timeout=STATE_TIMEOUTS[STATE_LANDING])
+
+        while time.time() < deadline:
+            if state == STATE_DASHBOARD:
+                self.log("已跳转回 ClawCloud 仪表盘", "SUCCESS")
+                return True
+
+            if state == STATE_TWO_FACTOR and self.two_factor_failed:
+                # 验证码已重试过或等待超时, 继续提交只会触发 GitHub 的频率限制
+                break
+
+            visits[state] = visits.get(state, 0) + 1
+            if visits[state] > MAX_STATE_VISITS:
+                self.log(f"登录流程在 {state} 阶段重复失败，放弃", "ERROR")
+                break
+
+            handler = handlers.get(state)
+            if handler is None:
+                # 页面未就绪: 回到 ClawCloud 时先刷新一次, 否则强制跳转首页
+                if not refreshed and CLAW_CLOUD_URL in self.driver.current_url:
+                    self.log("仪表盘未就绪，刷新页面", "WARN")
+                    self.driver.refresh()
+                    refreshed = True
+                else:
+                    self.log("未自动返回，强制跳转首页", "WARN")
+                    self.driver.get(CLAW_CLOUD_URL)
+                timeout = STATE_TIMEOUTS[STATE_DASHBOARD]
+                remaining = max(1, deadline - time.time())
+                state = self.wait_for_state(timeout=min(timeout, remaining), leave=state)
+                continue
+
+            # 每个阶段的 span 覆盖页面操作以及等待跳转到下一阶段
+            with self.span(state) as span:
+                try:
+                    timeout = handler() or STATE_TIMEOUTS[state]
+                except Exception as e:
+                    self.log(f"{state} 阶段处理异常: {e}", "ERROR")
+                    self.shot("登录异常页面")
+                    timeout = STATE_TIMEOUTS[state]
+
+                remaining = max(1, deadline - time.time())
+                previous = state
+                state = self.wait_for_state(timeout=min(timeout, remaining), leave=state)
+                span["outcome"] = "fail" if state == previous else state
 
-        while time.time() - start_time < max_wait:
-            updates = self.tg.get_updates(offset=self.tg.last_update_id, timeout=10)
-            for update in updates:
-                self.tg.last_update_id = update["update_id"] + 1
-                message = update.get("message", {})
-                
-                if message.get("chat", {}).get("id") == self.tg.chat_id and "text" in message:
-                    text = message["text"].strip()
-                    
-                    if re.fullmatch(r'\d{6}', text):
-                        self.tg.send(f"✅ 收到验证码：{text}，立即自动填写并提交...")
-                        
-                        try:
-                            # 查找 OTP 输入框
-                            otp_input = None
-                            selectors = [
-                                "input#otp",
-                                "input[name='otp']",
-                                "input[placeholder='XXXXXX']",
-                                "input[autocomplete='one-time-code']",
-                                "input[type='tel']",
-                            ]
-                            
-                            for sel in selectors:
-                                try:
-                                    otp_input = WebDriverWait(self.driver, 5).until(
-                                        EC.visibility_of_element_located((By.CSS_SELECTOR, sel))
-                                    )
-                                    if otp_input:
-                                        break
-                                except:
-                                    continue
-                            
-                            if not otp_input:
-                                raise Exception("未找到 OTP 输入框")
-                            
-                            # 填写验证码
-                            otp_input.clear()
-                            otp_input.send_keys(text)
-                            
-                            # 尝试点击提交按钮
-                            try:
-                                verify_btn = self.driver.find_element(By.XPATH, "//button[contains(text(), 'Verify')]")
-                                verify_btn.click()
-                            except:
-                                # 如果没有按钮,按回车
-                                otp_input.send_keys(Keys.RETURN)
-                            
-                            self.log(f"已立即使用验证码 {text} 自动填写并提交", "SUCCESS")
-                            self.tg.send(f"✅ 已自动填写验证码 {text} 并提交")
-                            time.sleep(8)
-                            return True
-                            
-                        except Exception as e:
-                            self.log(f"自动填写失败: {e}", "ERROR")
-                            self.tg.send("❌ 自动填写失败，请手动输入当前验证码完成登录")
-                            return False
-            
-            time.sleep(0.5)
-        
-        self.tg.send("⏰ 等待超时，未收到验证码（请手动完成验证）")
-        self.log("等待验证码超时", "WARN")
         return False
 
-    def full_github_login(self):
-        """执行完整 GitHub 登录流程"""
-        self.log("执行完整 GitHub 登录流程", "STEP")
-        
-        # 查找 GitHub 登录按钮
-        try:
-            login_btn = WebDriverWait(self.driver, 10).until(
-                EC.element_to_be_clickable((By.XPATH, "//button[contains(text(), 'GitHub')] | //a[contains(text(), 'GitHub')]"))
-            )
-        except:
-            self.log("未找到登录按钮，说明已登录", "SUCCESS")
-            return
-        
-        self.shot("ClawCloud登录界面")
-        login_btn.click()
-        self.log("已点击 GitHub 登录按钮", "SUCCESS")
-        time.sleep(3)
+    def keepalive(self):
+        """保活访问"""
+        self.log("开始保活访问...", "STEP")
         
-        # 检查是否直接到授权页
-        try:
-            WebDriverWait(self.driver, 15).until(
-                lambda d: "oauth/authorize" in d.current_url
-            )
-            self.log("检测到 GitHub 授权页面", "SUCCESS")
-            self.shot("GitHub授权页")
-            
-            try:
-                auth_btn = WebDriverWait(self.driver, 10).until(
-                    EC.element_to_be_clickable((By.XPATH, "//button[contains(text(), 'Authorize')]"))
-                )
-                auth_btn.click()
-                self.log("✅ 已自动授权 ClawCloud", "SUCCESS")
-                
-                # 等待跳转回 ClawCloud
-                try:
-                    WebDriverWait(self.driver, 30).until(
-                        lambda d: CLAW_CLOUD_URL in d.current_url
-                    )
-                except:
-                    self.driver.get(CLAW_CLOUD_URL)
-                
-                time.sleep(10)
-                self.driver.refresh()
-                time.sleep(5)
-                self.log("授权完成，已强制刷新仪表盘", "SUCCESS")
+        urls = keepalive_urls()
+        with self.span("keepalive", mode=CLAW_KEEPALIVE_MODE) as span:
+            if CLAW_KEEPALIVE_MODE == "http" and CLAW_SESSION_CHECK_PATH and self.keepalive_http(keepalive_api_urls()):
+                return
+            if not self.driver:
+                span["outcome"] = "fail"
                 return
-                
-            except Exception as e:
-                logger.debug(f"授权异常: {e}")
-                
-        except TimeoutException:
-            self.log("未检测到授权页，可能需要密码登录", "INFO")
-        
-        # 检查是否需要密码登录
-        time.sleep(3)
-        if "github.com/login" in self.driver.current_url:
-            self.log("进入 GitHub 密码登录页面", "INFO")
             
+            span["mode"] = "browser"
+            for url, name in urls:
+                try:
+                    self.driver.get(url)
+                    self.wait_for_state(timeout=STATE_TIMEOUTS[STATE_DASHBOARD])
+                    self.log(f"保活访问: {name}", "SUCCESS")
+                except Exception as e:
+                    self.log(f"访问失败: {e}", "WARN")
+
+    def keepalive_http(self, urls):
+        """HTTP 保活: 用浏览器导出的会话 Cookie 并发请求鉴权接口, 全部未确认登录时返回 False"""
+        if self.driver:
+            # 一次性导出浏览器当前会话的 Cookie
+            self.http = new_http_session(self.driver.get_cookies(), self.proxy)
+        elif not self.http:
+            return False
+
+        futures = [
+            (name, HTTP_EXECUTOR.submit(self.http.get, url, timeout=10, allow_redirects=False))
+            for url, name in urls
+        ]
+        ok = 0
+        for name, future in futures:
             try:
-                # 填写账号密码
-                username_field = WebDriverWait(self.driver, 10).until(
-                    EC.presence_of_element_located((By.ID, "login_field"))
-                )
-                username_field.clear()
-                username_field.send_keys(self.username)
-                
-                password_field = self.driver.find_element(By.ID, "password")
-                password_field.clear()
-                password_field.send_keys(self.password)
-                
-                submit_btn = self.driver.find_element(By.CSS_SELECTOR, "input[type='submit']")
-                submit_btn.click()
-                
-                self.log("✅ 已提交账号密码", "SUCCESS")
-                self.shot("提交密码后")
-                time.sleep(5)
-                
-                # 检查 2FA
+                resp = future.result()
+            except requests.RequestException as e:
+                self.log(f"HTTP 保活失败: {name} {e}", "WARN")
+                continue
+            try:
+                alive = resp.status_code == 200 and session_payload_ok(resp.json())
+            except ValueError:
+                alive = False
+            if alive:
+                ok += 1
+                self.log(f"保活访问(HTTP): {name}", "SUCCESS")
+            else:
+                self.log(f"HTTP 保活失败: {name} HTTP {resp.status_code}，未确认登录状态", "WARN")
+
+        if not ok:
+            self.log("HTTP 保活全部失败，回退为浏览器访问", "WARN")
+        return ok > 0
+
+    def extract_balance(self):
+        """提取余额: 优先读取余额接口响应, 失败时扫描页面"""
+        info = self.balance_from_network(BALANCE_WAIT)
+        if info:
+            self.balance_info = info
+            self.balance = info["balance"]
+            extra = f", 已消费 {info['used']}" if "used" in info else ""
+            self.log(f"成功提取余额 (接口): {self.balance}{extra}", "SUCCESS")
+            return
+        self.balance_from_dom()
+
+    def balance_from_http(self):
+        """免浏览器路径: 用会话 Cookie 直接请求余额接口 (第一个以 / 开头的 CLAW_BALANCE_API)"""
+        path = next((p for p in BALANCE_API_PATTERNS if p.startswith("/")), None)
+        if not path or not self.http:
+            return None
+        try:
+            resp = self.http.post(f"{CLAW_CLOUD_URL.rstrip('/')}{path}", timeout=10, allow_redirects=False)
+            data = resp.json()
+        except (requests.RequestException, ValueError) as e:
+            self.log(f"余额接口请求失败: {e}", "WARN")
+            return None
+        if resp.status_code != 200 or (isinstance(data, dict) and str(data.get("code", 200)) not in ("0", "200")):
+            self.log(f"余额接口返回异常 (HTTP {resp.status_code})", "WARN")
+            return None
+        info = parse_balance_payload(data)
+        if info:
+            self.balance_info = info
+            self.balance = info["balance"]
+            extra = f", 已消费 {info['used']}" if "used" in info else ""
+            self.log(f"成功提取余额 (接口): {self.balance}{extra}", "SUCCESS")
+        return info
+
+    def balance_from_network(self, timeout):
+        """从性能日志中找到余额接口的响应, 通过 Network.getResponseBody 读取 JSON"""
+        deadline = time.time() + timeout
+        while True:
+            finished = set()
+            events = self.drain_performance_log()
+            if not self.perf_log:
+                return None
+            for event in events:
+                if event.get("method") == "Network.loadingFinished":
+                    finished.add(event.get("params", {}).get("requestId"))
+
+            for request_id, url in list(self.api_responses.items()):
+                if request_id not in finished:
+                    continue
+                del self.api_responses[request_id]
                 try:
-                    WebDriverWait(self.driver, 10).until(
-                        EC.presence_of_element_located((By.XPATH, "//*[contains(text(), 'Two-factor authentication')]"))
-                    )
-                    self.log("⚠️ 检测到两步验证", "WARN")
-                    
-                    # 检查是 Authenticator 还是 GitHub Mobile
-                    page_text = self.driver.page_source
-                    
-                    if "Enter the code from your two-factor authentication app" in page_text:
-                        # Authenticator app - 使用 pyotp 自动生成 或 TG 交互
-                        self.authenticator_2fa = True
-                        
-                        if not self.totp_secret:
-                            # 没有配置密钥,发送 TG/微信 通知
-                            caption = (
-                                f"⚠️ 【第{self.account_index}个账号】检测到 GitHub 两步验证\n\n"
-                                "未配置 totp_secret,无法自动填写验证码\n"
-                                "请手动输入验证码或配置 2FA 密钥"
-                            )
-                            self.shot("两步验证页面", push_to_tg=True, caption=caption)
-                            self.log("未配置 2FA 密钥,等待60秒手动输入", "WARN")
-                            time.sleep(60)
-                        else:
-                            # 使用 pyotp 自动生成验证码
-                            try:
-                                token = pyotp.TOTP(self.totp_secret).now()
-                                self.log(f"生成 2FA 验证码: {token}", "INFO")
-                                
-                                # 查找 OTP 输入框
-                                otp_input = None
-                                selectors = [
-                                    "input#otp",
-                                    "input[name='otp']",
-                                    "input[placeholder='XXXXXX']",
-                                    "input[autocomplete='one-time-code']",
-                                    "input[type='tel']",
-                                ]
-                                
-                                for sel in selectors:
-                                    try:
-                                        otp_input = WebDriverWait(self.driver, 5).until(
-                                            EC.visibility_of_element_located((By.CSS_SELECTOR, sel))
-                                        )
-                                        if otp_input:
-                                            break
-                                    except:
-                                        continue
-                                
-                                if not otp_input:
-                                    raise Exception("未找到 OTP 输入框")
-                                
-                                # 填写验证码
-                                otp_input.clear()
-                                time.sleep(0.5)
-                                
-                                # 逐个字符输入
-                                for char in token:
-                                    otp_input.send_keys(char)
-                                    time.sleep(0.1)
-                                
-                                self.log("已输入 2FA 验证码", "INFO")
-                                time.sleep(1)
-                                
-                                # 查找并点击提交按钮
-                                try:
-                                    submit_selectors = [
-                                        "button[type='submit']",
-                                        "input[type='submit']",
-                                        "button.btn-primary"
-                                    ]
-                                    
-                                    submitted = False
-                                    for selector in submit_selectors:
-                                        try:
-                                            submit_btn = self.driver.find_element(By.CSS_SELECTOR, selector)
-                                            submit_btn.click()
-                                            self.log(f"已点击提交按钮: {selector}", "INFO")
-                                            submitted = True
-                                            break
-                                        except:
-                                            continue
-                                    
-                                    if not submitted:
-                                        # 如果找不到按钮,尝试按回车
-                                        otp_input = self.driver.find_element(By.CSS_SELECTOR, selectors[0])
-                                        otp_input.send_keys(Keys.RETURN)
-                                        self.log("已按回车提交", "INFO")
-                                        
-                                except Exception as e:
-                                    logger.warning(f"提交方式失败: {e}")
-                                    # 最后的尝试:直接提交表单
-                                    try:
-                                        otp_input = self.driver.find_element(By.CSS_SELECTOR, selectors[0])
-                                        self.driver.execute_script("arguments[0].form.submit();", otp_input)
-                                        self.log("已通过 JS 提交表单", "INFO")
-                                    except:
-                                        pass
-                                
-                                time.sleep(5)
-                                self.log("✅ 2FA 验证码已自动填写并提交", "SUCCESS")
-                                
-                            except Exception as e:
-                                self.log(f"2FA 自动填写失败: {e}", "ERROR")
-                                self.shot("2FA失败页面", push_to_tg=True, caption=f"❌ 2FA 自动填写失败: {e}")
-                                time.sleep(30)
-                    else:
-                        # GitHub Mobile
-                        self.github_mobile_2fa = True
-                        caption = (
-                            f"⚠️ 【第{self.account_index}个账号】检测到 GitHub 两步验证（GitHub Mobile）\n\n"
-                            "请打开手机 GitHub App，批准登录请求\n"
-                            "脚本已等待60秒供您操作，完成后会自动继续"
-                        )
-                        self.shot("两步验证页面", push_to_tg=True, caption=caption)
-                        self.log("等待60秒让你手动批准 GitHub Mobile 2FA...", "WARN")
-                        
-                        try:
-                            WebDriverWait(self.driver, 60).until(
-                                lambda d: "oauth/authorize" in d.current_url or CLAW_CLOUD_URL in d.current_url
-                            )
-                            self.log("2FA 批准成功，继续流程", "SUCCESS")
-                        except TimeoutException:
-                            self.log("2FA 等待超时，尝试强制继续", "WARN")
-                            
-                except TimeoutException:
-                    self.log("未检测到 2FA，继续流程", "INFO")
-                
-                # 再次检查授权页
-                time.sleep(5)
-                if "oauth/authorize" in self.driver.current_url:
-                    try:
-                        auth_btn = WebDriverWait(self.driver, 10).until(
-                            EC.element_to_be_clickable((By.XPATH, "//button[contains(text(), 'Authorize')]"))
-                        )
-                        auth_btn.click()
-                        self.log("✅ 密码后自动授权", "SUCCESS")
-                        time.sleep(5)
-                    except:
-                        pass
-                
-            except Exception as e:
-                self.log(f"密码登录异常: {e}", "ERROR")
-                self.shot("登录异常页面")
-        
-        # 确保返回 ClawCloud
+                    body = self.cdp("Network.getResponseBody", {"requestId": request_id})
+                    text = body.get("body") or "null"
+                    if body.get("base64Encoded"):
+                        text = base64.b64decode(text).decode("utf-8")
+                    info = parse_balance_payload(json.loads(text))
+                except Exception as e:
+                    logger.debug(f"读取余额接口响应失败 {url}: {e}")
+                    continue
+                if info:
+                    return info
+
+            if time.time() >= deadline:
+                return None
+            time.sleep(0.3)
+
+    def balance_from_dom(self):
+        """从仪表盘页面扫描余额"""
         try:
-            WebDriverWait(self.driver, 30).until(
-                lambda d: CLAW_CLOUD_URL in d.current_url
+            balance_elem = WebDriverWait(self.driver, 10).until(
+                EC.presence_of_element_located((By.XPATH, "//*[contains(text(), '$')]"))
             )
-            self.log("已跳转回 ClawCloud", "SUCCESS")
+            raw_balance = balance_elem.text.strip()
+            # 提取 $ 符号和数字
+            match = re.search(r'\$[\d.,]+', raw_balance)
+            if match:
+                self.balance = match.group()
+                self.log(f"成功提取余额: {self.balance}", "SUCCESS")
+            else:
+                self.balance = raw_balance
         except:
-            self.log("未自动返回，强制跳转首页", "WARN")
-            self.driver.get(CLAW_CLOUD_URL)
-        
-        # 增加等待时间,确保页面完全加载
-        time.sleep(10)
-        self.driver.refresh()
-        time.sleep(10)
-        self.log("已强制刷新，确保仪表盘完全加载", "SUCCESS")
-
-    def keepalive(self):
-        """保活访问"""
-        self.log("开始保活访问...", "STEP")
-        
-        urls = [
-            (f"{CLAW_CLOUD_URL}/", "首页"),
-            (f"{CLAW_CLOUD_URL}/apps", "Apps页面")
-        ]
-        
-        for url, name in urls:
-            try:
-                self.driver.get(url)
-                time.sleep(5)
-                self.log(f"保活访问: {name}", "SUCCESS")
-            except Exception as e:
-                self.log(f"访问失败: {e}", "WARN")
+            self.balance = "提取失败"
+            self.log("未能提取到余额", "WARN")
 
     def generate_notify_content(self):
         """生成通知内容"""
@@ -686,13 +3014,13 @@ class AutoLogin:
         else:
             login_way = "使用Cookies授权登录"
 
-        display_user = self.username[:3] + "**" if "@" not in self.username[:3] else self.username.split("@")[0][:3] + "**"
+        display_user = mask_username(self.username)
         balance_display = self.balance if self.balance.startswith('$') else f"${self.balance}"
 
         important_lines = []
         priority_keywords = [
-            "已强制刷新，确保仪表盘完全加载",
-            r"第 \d+ 次检测成功: 找到元素",
+            "已跳转回 ClawCloud 仪表盘",
+            "检测成功: 找到元素",
             "已保存最新 Cookies"
         ]
         
@@ -712,111 +3040,303 @@ class AutoLogin:
             if line:
                 content += f"✅ [第{self.account_index}个账号] {line}\n"
         content += f"💵当前剩余：{balance_display}\n"
+        if self.balance_info.get("used"):
+            content += f"📉已消费：{self.balance_info['used']}\n"
+        if self.balance_info.get("plan"):
+            content += f"📦套餐：{self.balance_info['plan']}\n"
+        if PROXY_POOL:
+            content += f"🌐代理：{mask_proxy(self.proxy)}\n"
         content += f"保活结果： {result_text}\n"
         content += f"时间： {time.strftime('%Y-%m-%d %H:%M:%S')}"
 
         self.notify_content = content
 
-    def cleanup_screenshots(self):
-        """清理截图"""
-        deleted = 0
-        for p in self.shots:
+    def start_browser(self, chrome_path):
+        """启动浏览器: 持久化配置 > 远程 WebDriver > 浏览器池 (含外部浏览器) > 本地启动
+
+        远程服务或浏览器池不可用时回退为本地启动。
+        """
+        options = build_chrome_options(chrome_path, self.proxy)
+        if CLAW_REMOTE_WEBDRIVER and not CLAW_PERSIST_PROFILE:
+            if remote_webdriver_ready(CLAW_REMOTE_WEBDRIVER):
+                try:
+                    self.driver = create_remote_driver(build_chrome_options(None, self.proxy))
+                    return
+                except Exception as e:
+                    self.log(f"远程 WebDriver 创建会话失败，回退为本地启动: {e}", "WARN")
+            else:
+                self.log(f"远程 WebDriver 不可用 ({CLAW_REMOTE_WEBDRIVER})，回退为本地启动", "WARN")
+        elif CLAW_PERSIST_PROFILE:
+            # 浏览器池的上下文是临时的, 持久化配置只能独立启动
+            self.profile_dir, self.profile_warm = PROFILES.prepare(self.username)
+            options.add_argument(f"--user-data-dir={self.profile_dir}")
+            options.add_argument(f"--disk-cache-size={PROFILES.max_bytes // 2}")
+            self.log(f"使用持久化浏览器配置 ({'热启动' if self.profile_warm else '首次启动'})", "INFO")
+        elif self.browser_pool:
+            try:
+                # 共享浏览器启动时已使用 CLAW_PROXY, 只有代理池分配的代理需要单独设置到上下文
+                context_proxy = self.proxy if self.proxy != CLAW_PROXY else None
+                self.driver, self.browser_context_id = self.browser_pool.new_driver(context_proxy)
+                return
+            except Exception as e:
+                self.log(f"浏览器池分配失败，回退为独立启动: {e}", "WARN")
+
+        if not chrome_path:
+            raise RuntimeError("浏览器服务不可用，且本地未找到 Chromium")
+        self.driver = create_chrome_driver(options)
+
+    def inject_cookies(self):
+        """打开主页后注入本地 Cookie"""
+        with self.span("cookie_injection", count=len(self.old_cookies)):
+            self.driver.get(CLAW_CLOUD_URL)
+
+            for cookie in self.old_cookies:
+                try:
+                    self.driver.add_cookie(cookie)
+                except:
+                    pass
+
+        self.log("已注入本地 Cookies", "SUCCESS")
+
+    def trim_profile(self):
+        """浏览器退出后淘汰配置目录中的旧缓存"""
+        if not self.profile_dir:
+            return
+        try:
+            freed, size = PROFILES.trim(self.profile_dir)
+        except Exception as e:
+            logger.warning(f"清理浏览器配置失败: {e}")
+            return
+        if freed:
+            logger.info(f"[{self.username}] 浏览器缓存淘汰 {freed / 1024 / 1024:.1f} MB, 剩余 {size / 1024 / 1024:.1f} MB")
+
+    def cdp(self, method, params=None):
+        """执行 CDP 命令 (本地 ChromeDriver 与远程会话通用)"""
+        if hasattr(self.driver, "execute_cdp_cmd"):
+            return self.driver.execute_cdp_cmd(method, params or {})
+        return self.driver.execute("executeCdpCommand", {"cmd": method, "params": params or {}})["value"]
+
+    def block_resources(self):
+        """通过 CDP Network.setBlockedURLs 拦截不需要的资源"""
+        if not CLAW_BLOCK_RESOURCES:
+            return
+        try:
+            self.cdp("Network.enable")
+            self.cdp("Network.setBlockedURLs", {"urls": BLOCK_URL_PATTERNS})
+        except Exception as e:
+            self.log(f"资源拦截设置失败: {e}", "WARN")
+
+    def drain_performance_log(self):
+        """读取并清空性能日志, 累计网络统计, 返回本次读取的 Network 事件"""
+        if not self.perf_log:
+            return []
+        try:
+            if hasattr(self.driver, "get_log"):
+                entries = self.driver.get_log("performance")
+            else:
+                # webdriver.Remote 没有 get_log, 直接调用 getLog 命令
+                entries = self.driver.execute("getLog", {"type": "performance"})["value"]
+        except Exception as e:
+            self.perf_log = False
+            self.log(f"性能日志不可用，余额改为页面扫描，网络统计不可用: {e}", "WARN")
+            return []
+
+        events = []
+        for entry in entries:
+            try:
+                message = json.loads(entry["message"])["message"]
+            except (KeyError, ValueError):
+                continue
+            method = message.get("method", "")
+            params = message.get("params", {})
+            if method == "Network.requestWillBeSent":
+                self.net_stats["requests"] += 1
+            elif method == "Network.responseReceived":
+                url = params.get("response", {}).get("url", "")
+                if any(pattern in url for pattern in BALANCE_API_PATTERNS):
+                    self.api_responses[params.get("requestId")] = url
+            elif method == "Network.loadingFinished":
+                self.net_stats["bytes"] += int(params.get("encodedDataLength") or 0)
+            elif method == "Network.loadingFailed" and params.get("blockedReason"):
+                self.net_stats["blocked"] += 1
+            events.append(message)
+        return events
+
+    def log_network_stats(self):
+        stats = self.net_stats
+        if not stats["requests"]:
+            return
+        self.log(
+            f"网络统计: 请求 {stats['requests']} 个, 拦截 {stats['blocked']} 个, "
+            f"实际传输 {stats['bytes'] / 1024:.1f} KB",
+            "INFO"
+        )
+        TRACER.event("network", self.account_index, **stats)
+
+    def browser_pid(self):
+        """浏览器进程树的根进程: 本地启动为 chromedriver, 浏览器池为共享 Chromium, 远程浏览器为 None"""
+        if self.browser_context_id:
+            return self.browser_pool.pid
+        process = getattr(getattr(self.driver, "service", None), "process", None)
+        return process.pid if process else None
+
+    def start_memory_monitor(self):
+        pid = self.browser_pid()
+        if not pid:
+            return
+
+        def on_exceed(rss):
+            # 账号结束时浏览器即关闭; 共享浏览器在空闲时由浏览器池重启
+            self.log(f"浏览器内存 {rss / 1024 / 1024:.0f} MB 超过上限 {CLAW_MEM_BROWSER_MAX_MB} MB，结束后回收", "WARN")
+
+        self.mem_monitor = MemoryMonitor(pid, self.account_index, on_exceed).start()
+
+    def stop_memory_monitor(self):
+        if not self.mem_monitor:
+            return
+        monitor, self.mem_monitor = self.mem_monitor, None
+        monitor.stop()
+        if not monitor.count:
+            return
+        self.mem_stats = {
+            "peak_mb": round(monitor.peak / 1024 / 1024, 1),
+            "avg_mb": round(monitor.average / 1024 / 1024, 1),
+            "shared": bool(self.browser_context_id),
+        }
+        # 浏览器池模式采样的是共享 Chromium 整个进程树, 包含同时运行的其他账号
+        scope = "共享浏览器内存 (所有账号合计)" if self.mem_stats["shared"] else "浏览器内存"
+        self.log(f"{scope}: 峰值 {self.mem_stats['peak_mb']} MB, 平均 {self.mem_stats['avg_mb']} MB", "INFO")
+        TRACER.event("memory", self.account_index, **self.mem_stats)
+
+    def stop_browser(self):
+        """关闭浏览器或归还浏览器池上下文"""
+        if not self.driver:
+            return
+        if self.browser_context_id:
+            self.browser_pool.release(self.driver, self.browser_context_id)
+        else:
             try:
-                if os.path.exists(p):
-                    os.remove(p)
-                    deleted += 1
+                self.driver.quit()
             except:
                 pass
-        if deleted > 0:
-            self.log(f"已清理 {deleted} 张截图", "SUCCESS")
-
-    def find_chrome(self):
-        """查找 Chromium"""
-        candidates = [
-            "/usr/bin/chromium",
-            "/usr/bin/chromium-browser",
-            "/usr/bin/google-chrome",
-        ]
-        for path in candidates:
-            if os.path.exists(path):
-                return path
-        return None
-
-    def find_chromedriver(self):
-        """查找 ChromeDriver"""
-        candidates = [
-            "/usr/bin/chromedriver",
-            "/usr/local/bin/chromedriver",
-        ]
-        for path in candidates:
-            if os.path.exists(path):
-                return path
-        return None
+        self.driver = None
+        self.browser_context_id = None
+        self.trim_profile()
 
     def run(self):
         """运行保活流程"""
+        with self.span("account") as span:
+            content = self.run_flow()
+            while self.retry_flow:
+                # 代理失效已切换, 用新代理重新运行 (浏览器已在上一轮关闭)
+                self.retry_flow = False
+                self.reset_run_state()
+                content = self.run_flow()
+            span["outcome"] = "ok" if self.success else "fail"
+
+        balance = self.balance if self.balance.startswith("$") else None
+        try:
+            SESSION_STORE.record_run(self.username, self.success, balance)
+            cents = parse_money(balance)
+            if cents is not None:
+                SESSION_STORE.add_balance_sample(
+                    self.username, CLAW_REGION, cents, parse_money(self.balance_info.get("used"))
+                )
+        except Exception as e:
+            logger.warning(f"记录运行结果失败: {e}")
+        return content
+
+    def proxy_failover(self, error):
+        """代理池中的代理连接失败时切换到下一个可用代理, 返回是否已切换"""
+        if not PROXY_POOL or self.proxy not in PROXY_POOL.proxies or not is_proxy_error(error):
+            return False
+        old = self.proxy
+        new = PROXY_POOL.failover(self.username, old)
+        if not new:
+            self.log(f"代理 {mask_proxy(old)} 连接失败，代理池中没有其他可用代理", "ERROR")
+            return False
+        self.proxy = new
+        self.log(f"代理 {mask_proxy(old)} 连接失败，切换到 {mask_proxy(new)}", "WARN")
+        TRACER.event("proxy_failover", self.account_index, old=mask_proxy(old), new=mask_proxy(new))
+        return True
+
+    def reset_run_state(self):
+        """切换代理重新运行前, 清除上一轮的运行结果"""
+        self.success = True
+        self.used_old_cookie = False
+        self.balance = "未知"
+        self.balance_info = {}
+        self.api_responses = {}
+        self.perf_log = True
+        self.notify_content = ""
+        self.http = None
+
+    def run_flow(self):
+        """保活流程主体"""
         self.log("开始运行保活流程", "STEP")
+
+        # 免浏览器预检: 会话仍然有效时直接结束, 不启动 Chromium
+        alive = None
+        if CLAW_FAST_CHECK and CLAW_SESSION_CHECK_PATH and self.old_cookies:
+            with self.span("session_precheck") as span:
+                alive = self.check_session_http()
+                span["outcome"] = {True: "alive", False: "dead"}.get(alive, "unknown")
+        if alive:
+            self.log("🎉 Cookie 会话有效 (免浏览器预检)，跳过浏览器", "SUCCESS")
+            self.used_old_cookie = True
+            # 免浏览器路径同样记录余额采样, 否则健康账号几乎没有消耗预测数据
+            with self.span("balance_extraction", mode="http") as span:
+                span["outcome"] = "ok" if self.balance_from_http() else "fail"
+            self.keepalive()
+            self.generate_notify_content()
+            return self.notify_content
         
         # 配置浏览器
-        chrome_path = self.find_chrome()
-        if not chrome_path:
+        chrome_path = find_chrome()
+        if not chrome_path and not (CLAW_REMOTE_WEBDRIVER or self.browser_pool):
             self.log("未找到 Chromium", "ERROR")
             self.success = False
             self.generate_notify_content()
             return self.notify_content
         
-        options = Options()
-        options.add_argument("--headless")
-        options.add_argument("--no-sandbox")
-        options.add_argument("--disable-dev-shm-usage")
-        options.add_argument("--disable-gpu")
-        options.add_argument("--disable-blink-features=AutomationControlled")
-        options.add_argument("--window-size=1920,1080")
-        options.add_experimental_option("excludeSwitches", ["enable-automation"])
-        options.add_experimental_option("useAutomationExtension", False)
-        
-        # 配置浏览器代理
-        if CLAW_PROXY:
-            options.add_argument(f"--proxy-server={CLAW_PROXY}")
-            
-        options.binary_location = chrome_path
-        
         try:
+            # 内存准入: 可用内存不足时等待其他账号释放浏览器
+            waited = GOVERNOR.acquire(self.username)
+            self.mem_slot = True
+            if waited >= 1:
+                self.log(f"等待可用内存 {waited:.0f} 秒后启动浏览器", "INFO")
+
             # 启动浏览器
-            chromedriver_path = self.find_chromedriver()
-            if chromedriver_path:
-                service = Service(executable_path=chromedriver_path)
-                self.driver = webdriver.Chrome(service=service, options=options)
-            else:
-                self.driver = webdriver.Chrome(options=options)
-            
+            with self.span("browser_launch", pool=bool(self.browser_pool)):
+                self.start_browser(chrome_path)
             self.log("浏览器启动成功", "SUCCESS")
+            self.start_memory_monitor()
             
             # 移除 webdriver 标识
             self.driver.execute_script(
                 "Object.defineProperty(navigator, 'webdriver', {get: () => undefined})"
             )
+            self.block_resources()
             
-            # 注入 Cookie
-            if self.old_cookies:
-                self.driver.get(CLAW_CLOUD_URL)
-                time.sleep(2)
-                
-                for cookie in self.old_cookies:
-                    try:
-                        self.driver.add_cookie(cookie)
-                    except:
-                        pass
-                
-                self.log("已注入本地 Cookies", "SUCCESS")
+            # 注入 Cookie (持久化配置热启动时浏览器自带会话, 无需注入)
+            if self.old_cookies and not self.profile_warm:
+                self.inject_cookies()
             
             # 访问主页
             self.driver.get(CLAW_CLOUD_URL)
-            time.sleep(10)
+            self.wait_for_state(timeout=STATE_TIMEOUTS[STATE_LANDING])
             self.shot("打开主页后")
+
+            logged_in = self.is_logged_in()
+            if not logged_in and self.profile_warm and self.old_cookies:
+                self.log("持久化配置中的会话已失效，改为注入本地 Cookies", "WARN")
+                self.inject_cookies()
+                self.driver.get(CLAW_CLOUD_URL)
+                self.wait_for_state(timeout=STATE_TIMEOUTS[STATE_LANDING])
+                logged_in = self.is_logged_in()
             
             # 检查登录状态
-            if self.is_logged_in():
+            if logged_in:
                 self.log("🎉 已登录，直接保活", "SUCCESS")
                 self.used_old_cookie = True
             else:
@@ -833,21 +3353,9 @@ class AutoLogin:
                     return self.notify_content
             
             # 提取余额
-            try:
-                balance_elem = WebDriverWait(self.driver, 10).until(
-                    EC.presence_of_element_located((By.XPATH, "//*[contains(text(), '$')]"))
-                )
-                raw_balance = balance_elem.text.strip()
-                # 提取 $ 符号和数字
-                match = re.search(r'\$[\d.,]+', raw_balance)
-                if match:
-                    self.balance = match.group()
-                    self.log(f"成功提取余额: {self.balance}", "SUCCESS")
-                else:
-                    self.balance = raw_balance
-            except:
-                self.balance = "提取失败"
-                self.log("未能提取到余额", "WARN")
+            with self.span("balance_extraction") as span:
+                self.extract_balance()
+                span["outcome"] = "fail" if self.balance == "提取失败" else "ok"
             
             # 保存 Cookie
             current_cookies = self.driver.get_cookies()
@@ -855,7 +3363,7 @@ class AutoLogin:
                 # 只保存相关域名的 Cookie
                 filtered_cookies = [
                     c for c in current_cookies 
-                    if 'github.com' in c.get('domain', '') or 'claw.cloud' in c.get('domain', '')
+                    if 'github.com' in c.get('domain', '') or is_claw_cookie(c)
                 ]
                 if filtered_cookies:
                     self.save_cookies(filtered_cookies)
@@ -870,21 +3378,433 @@ class AutoLogin:
             self.log(f"运行异常: {e}", "ERROR")
             logger.exception(e)
             self.success = False
+            self.retry_flow = self.proxy_failover(e)
             self.generate_notify_content()
             
         finally:
             if self.driver:
-                try:
-                    self.driver.quit()
-                except:
-                    pass
-            
-            self.cleanup_screenshots()
+                self.drain_performance_log()
+                self.log_network_stats()
+            self.stop_memory_monitor()
+            self.stop_browser()
+            if self.mem_slot:
+                GOVERNOR.release()
+                self.mem_slot = False
         
         return self.notify_content
 
 
+# ============ 批量运行 ============
+
+def process_account(idx, acc, browser_pool=None):
+    """处理单个账号 (在线程池中执行)"""
+    print(f"正在处理第 {idx} 个账号: {acc['username']}")
+    instance = AutoLogin(acc, idx, browser_pool)
+    content = instance.run()
+    print(f"第 {idx} 个账号处理完成\n")
+    return instance, content
+
+
+def run_batch(accounts, browser_pool=None, force=False, only=None):
+    """按调度计划处理一批账号
+
+    返回按账号顺序排列的 [(idx, 用户名, 汇总内容, AutoLogin 实例或 None)],
+    未到期而跳过的账号实例为 None, 汇总内容为缓存状态。
+    指定 only (用户名集合) 时只处理这些账号, 其余账号不出现在结果中。
+    """
+    plans = {}
+    due = []
+    for idx, acc in enumerate(accounts, 1):
+        if only is not None:
+            if acc["username"] in only:
+                due.append((idx, acc))
+            continue
+        plan = plan_account(acc["username"])
+        plans[idx] = plan
+        if force or plan["due"]:
+            due.append((idx, acc))
+        else:
+            print(f"⏭️ 第 {idx} 个账号未到期，跳过 (下次计划: {format_ts(plan['next_due'])})")
+
+    print(f"📋 本次需要处理 {len(due)}/{len(accounts)} 个账号\n")
+    if due and PROXY_POOL:
+        PROXY_POOL.probe()
+
+    processed = {}
+    if due:
+        concurrency = min(CLAW_CONCURRENCY, len(due))
+        print(f"⚙️ 并发数: {concurrency}\n")
+        # executor.map 按提交顺序返回结果, 汇总信息仍按账号顺序排列
+        with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="claw") as executor:
+            results = executor.map(lambda item: process_account(item[0], item[1], browser_pool), due)
+            for (idx, _), (instance, content) in zip(due, results):
+                processed[idx] = (instance, content)
+
+    ordered = []
+    for idx, acc in enumerate(accounts, 1):
+        if idx in processed:
+            instance, content = processed[idx]
+            ordered.append((idx, acc["username"], content, instance))
+        elif idx in plans:
+            ordered.append((idx, acc["username"], skipped_notify_content(acc["username"], plans[idx]), None))
+    return ordered
+
+
+def balance_summary_lines(usernames):
+    """汇总通知中的余额预测, 即将耗尽的账号排在前面"""
+    try:
+        forecasts = balance_forecasts(usernames)
+    except Exception as e:
+        logger.warning(f"计算余额预测失败: {e}")
+        return []
+
+    wanted = set(usernames)
+    items = [(key, f) for key, f in forecasts.items() if key[0] in wanted]
+    items.sort(key=lambda kv: (kv[1]["days_left"] is None, kv[1]["days_left"] or 0))
+    lines = []
+    for (account, region), f in items:
+        warn = f["days_left"] is not None and f["days_left"] < BALANCE_WARN_DAYS
+        lines.append(
+            f"{'⚠️' if warn else '•'} {mask_username(account)} ({region}) "
+            f"{format_cents(f['balance'])}，{format_forecast(f)}"
+        )
+    return lines
+
+
+def send_summary(results):
+    """发送汇总通知"""
+    all_notify_contents = [
+        f"【账号{idx}保活信息】\n{content}" for idx, _, content, _ in results if content
+    ]
+    has_screenshot_triggered = any(instance and instance.shots for _, _, _, instance in results)
+    if not all_notify_contents:
+        return
+
+    final_msg = f"💻 ClawCloud自动保活 - Selenium版本\n\n"
+    final_msg += f"🔥一共有{len(results)}个账号🔥\n\n"
+    final_msg += "\n\n==========================\n\n".join(all_notify_contents)
+    final_msg += "\n\n==========================\n\n"
+    if not has_screenshot_triggered:
+        final_msg += "🗑️ 本次运行脚本没有触发截图\n"
+    elif CLAW_SAVE_SHOTS:
+        final_msg += f"📂 本次运行截图已保存到 {SCRIPT_DIR}\n"
+    else:
+        final_msg += "📸 本次运行截图仅在内存中处理，未写入磁盘\n"
+    final_msg += "\n\n==========================\n\n"
+    net = {"requests": 0, "blocked": 0, "bytes": 0}
+    for _, _, _, instance in results:
+        if instance:
+            for key in net:
+                net[key] += instance.net_stats[key]
+    if net["requests"]:
+        final_msg += (
+            f"🚫 资源拦截：共 {net['requests']} 个请求，拦截 {net['blocked']} 个，"
+            f"实际传输 {net['bytes'] / 1024:.1f} KB\n"
+        )
+        final_msg += "\n\n==========================\n\n"
+    mem_results = [(idx, instance.mem_stats) for idx, _, _, instance in results if instance and instance.mem_stats]
+    mem_lines = [
+        f"• 账号{idx}：峰值 {stats['peak_mb']} MB，平均 {stats['avg_mb']} MB"
+        for idx, stats in mem_results if not stats["shared"]
+    ]
+    # 共享浏览器的采样无法区分账号, 只汇总整个浏览器的峰值
+    shared = [stats["peak_mb"] for _, stats in mem_results if stats["shared"]]
+    if shared:
+        mem_lines.append(f"• 共享浏览器（{len(shared)} 个账号）：峰值 {max(shared)} MB")
+    if mem_lines:
+        final_msg += "🧠 浏览器内存：\n" + "\n".join(mem_lines) + "\n"
+        if GOVERNOR.lowest_free is not None:
+            final_msg += f"最低可用内存：{GOVERNOR.lowest_free / 1024 / 1024:.0f} MB\n"
+        final_msg += "\n\n==========================\n\n"
+    forecast_lines = balance_summary_lines([username for _, username, _, _ in results])
+    if forecast_lines:
+        final_msg += "📊 余额消耗预测：\n" + "\n".join(forecast_lines) + "\n"
+        final_msg += "\n\n==========================\n\n"
+    final_msg += f"网页登录地址：{CLAW_CLOUD_URL}\n"
+    final_msg += "\n\n==========================\n\n"
+
+    tg = Telegram()
+    tg.send(final_msg)
+    
+    # 发送企微通知
+    wx = WeChat()
+    wx.send(final_msg)
+
+
+# ============ 常驻模式 ============
+
+class ControlHandler(socketserver.StreamRequestHandler):
+    """控制套接字: 每个连接读取一行 JSON 命令, 返回一行 JSON 结果"""
+
+    def handle(self):
+        try:
+            request = json.loads(self.rfile.readline().decode("utf-8") or "{}")
+            reply = self.server.claw_daemon.command(request)
+        except Exception as e:
+            reply = {"ok": False, "message": f"命令执行失败: {e}"}
+        self.wfile.write((json.dumps(reply, ensure_ascii=False) + "\n").encode("utf-8"))
+
+
+class ControlServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+class Daemon:
+    """常驻模式: 进程与浏览器常驻, 每个账号按各自的计划时间 (加随机抖动) 运行
+
+    下次运行时间由 plan_account 计算, 失败的账号间隔 CLAW_DAEMON_RETRY_MINUTES 后重试;
+    通过控制套接字可以立即运行、重新加载账号或查看状态。
+    """
+
+    def __init__(self, accounts, socket_path=CLAW_DAEMON_SOCKET):
+        self.accounts = accounts
+        self.socket_path = socket_path
+        self.next_run = {}
+        self.forced = set()
+        self.running = set()
+        self.lock = threading.Lock()
+        self.wakeup = threading.Event()
+        self.stopping = threading.Event()
+        # 浏览器常驻: 默认开启浏览器池 (使用远程 WebDriver 时浏览器由外部服务管理)
+        self.browser_pool = create_browser_pool(pool_default=not CLAW_REMOTE_WEBDRIVER)
+        self.server = None
+        self.started = time.time()
+        self.batches = 0
+        self.schedule_new()
+
+    def jitter(self):
+        return random.uniform(0, CLAW_DAEMON_JITTER_MINUTES * 60)
+
+    def schedule_new(self):
+        """为尚未排期的账号安排首次运行: 已到期的立即运行"""
+        now = time.time()
+        with self.lock:
+            for acc in self.accounts:
+                username = acc["username"]
+                if username in self.next_run:
+                    continue
+                plan = plan_account(username, now)
+                self.next_run[username] = now if plan["due"] else plan["next_due"] + self.jitter()
+
+    def reschedule(self, username, success):
+        now = time.time()
+        if success:
+            plan = plan_account(username, now)
+            next_run = max(plan["next_due"], now) + self.jitter()
+        else:
+            next_run = now + CLAW_DAEMON_RETRY_MINUTES * 60
+        with self.lock:
+            if username in self.next_run:
+                self.next_run[username] = next_run
+
+    def take_due(self):
+        """取出已到期或被手动触发的账号"""
+        now = time.time()
+        with self.lock:
+            names = {
+                acc["username"] for acc in self.accounts
+                if acc["username"] in self.forced or self.next_run.get(acc["username"], now) <= now
+            }
+            names -= self.running
+            self.forced -= names
+            self.running |= names
+            return names
+
+    def run_once(self, names):
+        self.batches += 1
+        new_run_id(self.batches)
+        logger.info(f"🕒 常驻模式第 {self.batches} 批: {len(names)} 个账号")
+        if self.browser_pool:
+            try:
+                self.browser_pool.ensure_alive()
+            except Exception as e:
+                logger.warning(f"共享浏览器启动失败，本批账号独立启动: {e}")
+
+        accounts = list(self.accounts)
+        results = []
+        try:
+            results = run_batch(accounts, self.browser_pool, only=names)
+            send_summary(results)
+        finally:
+            outcome = {username: instance.success for _, username, _, instance in results if instance}
+            for username in names:
+                self.reschedule(username, outcome.get(username, False))
+            with self.lock:
+                self.running -= names
+
+    def command(self, request):
+        cmd = request.get("cmd")
+        if cmd == "run":
+            wanted = set(request.get("accounts") or [])
+            with self.lock:
+                known = {acc["username"] for acc in self.accounts}
+                targets = (wanted & known) if wanted else known
+                self.forced |= targets
+            self.wakeup.set()
+            unknown = wanted - known
+            message = f"已加入运行队列: {len(targets)} 个账号"
+            if unknown:
+                message += f"，未知账号: {', '.join(sorted(unknown))}"
+            return {"ok": bool(targets), "message": message}
+
+        if cmd == "reload":
+            accounts = load_accounts_from_env(request.get("accounts"))
+            if not accounts:
+                return {"ok": False, "message": "新的账号配置为空，保持原配置"}
+            names = {acc["username"] for acc in accounts}
+            with self.lock:
+                self.accounts = accounts
+                for username in list(self.next_run):
+                    if username not in names:
+                        del self.next_run[username]
+                self.forced &= names
+            self.schedule_new()
+            self.wakeup.set()
+            return {"ok": True, "message": f"已重新加载 {len(accounts)} 个账号"}
+
+        if cmd == "status":
+            rows = []
+            with self.lock:
+                for acc in self.accounts:
+                    username = acc["username"]
+                    info = SESSION_STORE.account_info(username)
+                    rows.append({
+                        "username": username,
+                        "running": username in self.running,
+                        "next_run": format_ts(self.next_run.get(username)),
+                        "last_success": format_ts(info.get("last_success")),
+                        "last_status": info.get("last_status") or "-",
+                        "last_balance": info.get("last_balance") or "-",
+                    })
+            return {
+                "ok": True,
+                "message": f"运行中 (PID {os.getpid()})，已运行 {(time.time() - self.started) / 3600:.1f} 小时，"
+                           f"完成 {self.batches} 批",
+                "accounts": rows,
+            }
+
+        if cmd == "stop":
+            self.stop()
+            return {"ok": True, "message": "常驻进程将在当前批次结束后退出"}
+
+        return {"ok": False, "message": f"未知命令: {cmd}"}
+
+    def start_control(self):
+        """启动控制套接字, 已有常驻进程在运行时拒绝启动"""
+        if os.path.exists(self.socket_path):
+            try:
+                with closing(socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)) as sock:
+                    sock.connect(self.socket_path)
+                raise RuntimeError(f"常驻进程已在运行: {self.socket_path}")
+            except (ConnectionRefusedError, FileNotFoundError):
+                os.unlink(self.socket_path)
+
+        # 套接字在 bind 时即只允许当前用户访问, 不存在其他用户可以连接的时间窗口
+        old_umask = os.umask(0o077)
+        try:
+            self.server = ControlServer(self.socket_path, ControlHandler)
+        finally:
+            os.umask(old_umask)
+        self.server.claw_daemon = self
+        threading.Thread(target=self.server.serve_forever, name="claw-control", daemon=True).start()
+        logger.info(f"控制套接字: {self.socket_path}")
+
+    def stop(self):
+        self.stopping.set()
+        self.wakeup.set()
+
+    def serve_forever(self):
+        self.start_control()
+        signal.signal(signal.SIGTERM, lambda *_: self.stop())
+        if self.browser_pool:
+            # 提前启动共享浏览器, 第一批账号无需等待
+            try:
+                self.browser_pool.start()
+            except Exception as e:
+                logger.warning(f"共享浏览器预热失败: {e}")
+
+        try:
+            while not self.stopping.is_set():
+                names = self.take_due()
+                if names:
+                    try:
+                        self.run_once(names)
+                    except Exception as e:
+                        logger.exception(f"常驻模式批次运行异常: {e}")
+                    continue
+                with self.lock:
+                    upcoming = min(self.next_run.values(), default=time.time() + 3600)
+                self.wakeup.wait(min(max(upcoming - time.time(), 1), 3600))
+                self.wakeup.clear()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.server.shutdown()
+            self.server.server_close()
+            try:
+                os.unlink(self.socket_path)
+            except OSError:
+                pass
+            if self.browser_pool:
+                self.browser_pool.close()
+            NOTIFIER.flush()
+            logger.info("常驻进程已退出")
+
+
+def control(cmd, accounts=None, socket_path=CLAW_DAEMON_SOCKET):
+    """向常驻进程发送控制命令并打印结果, 返回是否成功"""
+    request = {"cmd": cmd}
+    if cmd == "run":
+        request["accounts"] = accounts or []
+    elif cmd == "reload":
+        # 青龙任务每次都会注入最新的环境变量, 直接把当前的 CLAW_ACCOUNTS 发给常驻进程
+        request["accounts"] = os.environ.get("CLAW_ACCOUNTS", "")
+
+    try:
+        with closing(socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)) as sock:
+            sock.settimeout(30)
+            sock.connect(socket_path)
+            sock.sendall((json.dumps(request, ensure_ascii=False) + "\n").encode("utf-8"))
+            with sock.makefile("r", encoding="utf-8") as f:
+                reply = json.loads(f.readline() or "{}")
+    except OSError as e:
+        print(f"❌ 无法连接常驻进程 ({socket_path}): {e}")
+        return False
+
+    print(("✅ " if reply.get("ok") else "❌ ") + reply.get("message", ""))
+    for row in reply.get("accounts", []):
+        flag = "▶️" if row["running"] else "  "
+        print(
+            f"{flag} {row['username']:<32} 下次: {row['next_run']:<20} 上次成功: {row['last_success']:<20} "
+            f"状态: {row['last_status']:<6} 余额: {row['last_balance']}"
+        )
+    return bool(reply.get("ok"))
+
+
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="ClawCloud 多账号自动保活")
+    parser.add_argument("--trace-report", action="store_true", help="输出追踪文件中各阶段的 p50/p95 耗时")
+    parser.add_argument("--last-runs", type=int, default=0, help="只统计最近 N 次运行 (配合 --trace-report)")
+    parser.add_argument("--balance-report", action="store_true", help="输出每个账号的余额、每日消耗与预计耗尽时间")
+    parser.add_argument("--days", type=int, default=BALANCE_WINDOW_DAYS, help="余额预测的统计窗口天数 (配合 --balance-report)")
+    parser.add_argument("--force", action="store_true", help="忽略调度计划, 处理所有账号")
+    parser.add_argument("--daemon", action="store_true", help="常驻模式: 内置调度, 浏览器与进程常驻")
+    parser.add_argument("--ctl", choices=["run", "reload", "status", "stop"], help="向常驻进程发送控制命令")
+    parser.add_argument("--account", action="append", default=[], help="配合 --ctl run 指定账号 (可重复)")
+    # 青龙 task 可能附带额外参数, 忽略无法识别的部分
+    args, _ = parser.parse_known_args()
+
+    if args.trace_report:
+        trace_report(CLAW_TRACE_FILE, args.last_runs)
+        sys.exit(0)
+
+    if args.balance_report:
+        balance_report(args.days)
+        sys.exit(0)
+
+    if args.ctl:
+        sys.exit(0 if control(args.ctl, args.account) else 1)
+
     print("\n" + "="*60)
     print("💻 ClawCloud多账号自动保活 - Selenium 版本")
     print("="*60 + "\n")
@@ -899,40 +3819,33 @@ if __name__ == "__main__":
     
     print(f"📊 共配置 {len(ACCOUNTS)} 个账号\n")
 
-    all_notify_contents = []
-    has_screenshot_triggered = False
-
-    for idx, acc in enumerate(ACCOUNTS, 1):
-        print(f"正在处理第 {idx} 个账号: {acc['username']}")
-        instance = AutoLogin(acc, idx)
-        content = instance.run()
-        
-        if content:
-            all_notify_contents.append(f"【账号{idx}保活信息】\n{content}")
+    if args.daemon:
+        print("🔁 常驻模式: 按账号计划自动运行，使用 --ctl status 查看状态\n")
+        Daemon(ACCOUNTS).serve_forever()
+        sys.exit(0)
 
-        if instance.shots:
-            has_screenshot_triggered = True
+    browser_pool = create_browser_pool()
+    if CLAW_REMOTE_WEBDRIVER:
+        print(f"🔌 附加模式: 使用远程 WebDriver {CLAW_REMOTE_WEBDRIVER}\n")
+    elif browser_pool and browser_pool.external_address:
+        print(f"🔌 附加模式: 复用外部浏览器 {browser_pool.external_address}，每个账号使用独立上下文\n")
+    elif browser_pool:
+        print("🧩 浏览器池模式: 所有账号共享一个 Chromium\n")
+    elif CLAW_PERSIST_PROFILE:
+        if CLAW_BROWSER_POOL:
+            print("⚠️ 已开启持久化浏览器配置，浏览器池模式不生效")
+        print(f"💾 持久化浏览器配置目录: {CLAW_PROFILE_DIR}\n")
 
-        print(f"第 {idx} 个账号处理完成\n")
-        time.sleep(10)
+    try:
+        results = run_batch(ACCOUNTS, browser_pool, force=args.force or CLAW_FORCE_RUN)
+    finally:
+        if browser_pool:
+            browser_pool.close()
 
-    # 发送汇总通知
-    if all_notify_contents:
-        final_msg = f"💻 ClawCloud自动保活 - Selenium版本\n\n"
-        final_msg += f"🔥一共有{len(ACCOUNTS)}个账号🔥\n\n"
-        final_msg += "\n\n==========================\n\n".join(all_notify_contents)
-        final_msg += "\n\n==========================\n\n"
-        final_msg += "🗑️ 本次运行截图已清理\n" if has_screenshot_triggered else "🗑️ 本次运行脚本没有触发截图\n"
-        final_msg += "\n\n==========================\n\n"
-        final_msg += f"网页登录地址：{CLAW_CLOUD_URL}\n"
-        final_msg += "\n\n==========================\n\n"
+    send_summary(results)
 
-        tg = Telegram()
-        tg.send(final_msg)
-        
-        # 发送企微通知
-        wx = WeChat()
-        wx.send(final_msg)
+    # 退出前等待后台通知发送完成
+    NOTIFIER.flush()
     
     print("\n" + "="*60)
     print("✅ 所有账号处理完成")
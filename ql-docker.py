@@ -17,8 +17,42 @@ from selenium import webdriver
 from selenium.webdriver.chrome.options import Options
 from selenium.webdriver.chrome.service import Service
 from selenium.webdriver.common.by import By
+from selenium.webdriver.common.keys import Keys
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
+from selenium.common.exceptions import TimeoutException, WebDriverException
+
+
+# 目标地址与截图目录 (可通过环境变量覆盖, 便于本地模拟环境测试)
+CLAW_CLOUD_URL = os.environ.get("CLAW_CLOUD_URL", "https://ap-northeast-1.run.claw.cloud/").strip()
+SCRIPT_DIR = os.environ.get("CLAW_SCRIPT_DIR", "/ql/data/scripts").strip()
+
+
+# TOTP: 当前时间窗口剩余不足该秒数时等待下一个窗口再生成, 避免提交前过期
+try:
+    TOTP_MIN_REMAINING = int(os.environ.get("CLAW_TOTP_MIN_REMAINING", "5"))
+except ValueError:
+    TOTP_MIN_REMAINING = 5
+# 提交验证码后等待离开两步验证页的时间 (秒), 超时视为验证码被拒绝
+try:
+    TOTP_VERIFY_TIMEOUT = int(os.environ.get("CLAW_TOTP_VERIFY_TIMEOUT", "15"))
+except ValueError:
+    TOTP_VERIFY_TIMEOUT = 15
+# GitHub 输满 6 位会自动提交; 输入后这段时间内仍未开始提交才手动点击 (秒)
+OTP_AUTO_SUBMIT_GRACE = 2
+
+# 输入验证码前监听表单提交与页面卸载, 用于判断自动提交是否已经开始
+OTP_SUBMIT_WATCH_JS = """
+const input = arguments[0];
+window.__clawOtpSubmitted = false;
+const mark = () => { window.__clawOtpSubmitted = true; };
+if (input.form) input.form.addEventListener('submit', mark, true);
+window.addEventListener('beforeunload', mark);
+"""
+OTP_SUBMIT_STARTED_JS = """
+const input = arguments[0];
+return !input.isConnected || window.__clawOtpSubmitted === true || document.readyState !== 'complete';
+"""
 
 
 def mask_account(account: str) -> str:
@@ -88,6 +122,129 @@ def find_chromedriver():
     return None
 
 
+def on_github(driver):
+    """当前页面是否已跳转到 GitHub"""
+    return "github.com" in driver.current_url
+
+
+def left_github_login(driver):
+    """密码提交后已离开 GitHub 登录页 (进入 2FA / 授权页 / 返回 ClawCloud)"""
+    url = driver.current_url
+    return (
+        "two-factor" in url or "two_factor" in url
+        or "authorize" in url.lower() or "github.com" not in url
+    )
+
+
+def left_two_factor(driver):
+    """2FA 提交后已离开两步验证页"""
+    url = driver.current_url
+    return "two-factor" not in url and "two_factor" not in url
+
+
+def dashboard_ready(driver):
+    """已返回 ClawCloud 且仪表盘元素已渲染"""
+    url = driver.current_url
+    if "github.com" in url or "signin" in url:
+        return False
+    page_text = driver.page_source.lower()
+    return "app launchpad" in page_text or "devbox" in page_text
+
+
+def wait_until(driver, condition, timeout):
+    """等待条件成立, 超时返回 False 而不抛异常"""
+    try:
+        WebDriverWait(driver, timeout, poll_frequency=0.5).until(condition)
+        return True
+    except TimeoutException:
+        return False
+
+
+def fresh_totp(secret, used=None, min_remaining=TOTP_MIN_REMAINING):
+    """生成剩余有效时间充足的 TOTP 验证码
+
+    当前时间窗口剩余不足 min_remaining 秒, 或验证码与 used (刚被拒绝的验证码) 相同时,
+    等待进入下一个时间窗口再生成。返回 (验证码, 剩余有效秒数)。
+    """
+    totp = pyotp.TOTP(secret)
+    while True:
+        now = time.time()
+        remaining = totp.interval - now % totp.interval
+        code = totp.at(now)
+        if remaining >= min_remaining and code != used:
+            return code, remaining
+        time.sleep(remaining + 0.1)
+
+
+def submit_totp(driver, token):
+    """填写并提交验证码 (GitHub 输满 6 位会自动提交, 已跳转时不再点击)"""
+    totp_field = WebDriverWait(driver, 10).until(
+        EC.presence_of_element_located((By.ID, "app_totp"))
+    )
+    totp_field.clear()
+    driver.execute_script(OTP_SUBMIT_WATCH_JS, totp_field)
+    totp_field.send_keys(token)
+    logger.info("已输入 2FA 验证码")
+
+    if wait_totp_submitted(driver, totp_field):
+        return
+
+    # 查找并点击提交按钮(而不是直接 submit)
+    try:
+        submit_selectors = [
+            "button[type='submit']",
+            "input[type='submit']",
+            "button.btn-primary"
+        ]
+
+        submitted = False
+        for selector in submit_selectors:
+            try:
+                submit_btn = driver.find_element(By.CSS_SELECTOR, selector)
+                submit_btn.click()
+                logger.info(f"已点击提交按钮: {selector}")
+                submitted = True
+                break
+            except Exception:
+                continue
+
+        if not submitted:
+            # 如果找不到按钮,尝试按回车
+            totp_field = driver.find_element(By.ID, "app_totp")
+            totp_field.send_keys(Keys.RETURN)
+            logger.info("已按回车提交")
+
+    except Exception as e:
+        logger.warning(f"提交方式失败,尝试其他方法: {e}")
+        # 最后的尝试:直接提交表单
+        try:
+            totp_field = driver.find_element(By.ID, "app_totp")
+            driver.execute_script("arguments[0].form.submit();", totp_field)
+            logger.info("已通过 JS 提交表单")
+        except Exception:
+            pass
+
+
+def wait_totp_submitted(driver, totp_field):
+    """等待输满 6 位后的自动提交完成, 返回是否已提交
+
+    自动提交开始后等待页面跳转 (输入框失效), 期间不再点击或回车, 避免同一验证码提交两次;
+    短时间内未开始提交时返回 False, 由调用方手动提交。
+    """
+    def started(driver):
+        try:
+            return driver.execute_script(OTP_SUBMIT_STARTED_JS, totp_field)
+        except WebDriverException:
+            # 输入框已失效或页面正在跳转
+            return True
+
+    if not wait_until(driver, started, OTP_AUTO_SUBMIT_GRACE):
+        return False
+    if not wait_until(driver, EC.staleness_of(totp_field), TOTP_VERIFY_TIMEOUT):
+        logger.warning("2FA 验证码已自动提交，但页面未跳转")
+    return True
+
+
 def run_login():
     """执行登录流程"""
     username = os.environ.get("GH_USERNAME", "").strip()
@@ -163,10 +320,9 @@ def run_login():
         )
 
         # 访问 ClawCloud
-        target_url = "https://ap-northeast-1.run.claw.cloud/"
+        target_url = CLAW_CLOUD_URL
         logger.info(f"[Step 2] 正在访问: {target_url}")
         driver.get(target_url)
-        time.sleep(random.randint(3, 5))
 
         # 查找并点击 GitHub 按钮
         logger.info("[Step 3] 寻找 GitHub 登录按钮...")
@@ -176,13 +332,12 @@ def run_login():
             )
             github_btn.click()
             logger.info("已点击 GitHub 按钮")
-            time.sleep(random.randint(2, 4))
         except Exception as e:
             logger.warning(f"未找到 GitHub 按钮: {e}")
 
         # 等待跳转到 GitHub
         logger.info("[Step 4] 等待跳转到 GitHub...")
-        time.sleep(3)
+        wait_until(driver, on_github, 15)
 
         # 检查是否在 GitHub 登录页
         if "github.com" in driver.current_url and "login" in driver.current_url:
@@ -207,13 +362,12 @@ def run_login():
                 login_btn = driver.find_element(By.CSS_SELECTOR, "input[name='commit']")
                 login_btn.click()
                 logger.info("已提交登录表单")
-                time.sleep(random.randint(3, 5))
+                wait_until(driver, left_github_login, 15)
                 
             except Exception as e:
                 logger.error(f"填写登录表单失败: {e}")
 
         # 检查 2FA
-        time.sleep(2)
         if "two-factor" in driver.current_url or "two_factor" in driver.current_url:
             logger.info("[Step 5] 检测到 2FA 验证")
             
@@ -226,69 +380,25 @@ def run_login():
                 )
                 logger.error(msg)
                 send_tg_message(msg)
-                driver.save_screenshot("/ql/data/scripts/clawcloud_2fa_error.png")
+                driver.save_screenshot(os.path.join(SCRIPT_DIR, "clawcloud_2fa_error.png"))
                 return False
             
             try:
-                # 生成 TOTP 验证码
-                token = pyotp.TOTP(totp_secret).now()
-                logger.info(f"生成 2FA 验证码: {token}")
-                
-                # 等待并填写验证码
-                totp_field = WebDriverWait(driver, 10).until(
-                    EC.presence_of_element_located((By.ID, "app_totp"))
-                )
-                
-                # 清空并输入验证码
-                totp_field.clear()
-                time.sleep(0.5)
-                
-                # 逐个字符输入,避免问题
-                for char in token:
-                    totp_field.send_keys(char)
-                    time.sleep(0.1)
-                
-                logger.info("已输入 2FA 验证码")
-                time.sleep(1)
-                
-                # 查找并点击提交按钮(而不是直接 submit)
-                try:
-                    # 尝试查找提交按钮
-                    submit_selectors = [
-                        "button[type='submit']",
-                        "input[type='submit']",
-                        "button.btn-primary"
-                    ]
-                    
-                    submitted = False
-                    for selector in submit_selectors:
-                        try:
-                            submit_btn = driver.find_element(By.CSS_SELECTOR, selector)
-                            submit_btn.click()
-                            logger.info(f"已点击提交按钮: {selector}")
-                            submitted = True
-                            break
-                        except Exception:
-                            continue
-                    
-                    if not submitted:
-                        # 如果找不到按钮,尝试按回车
-                        from selenium.webdriver.common.keys import Keys
-                        totp_field = driver.find_element(By.ID, "app_totp")
-                        totp_field.send_keys(Keys.RETURN)
-                        logger.info("已按回车提交")
-                        
-                except Exception as e:
-                    logger.warning(f"提交方式失败,尝试其他方法: {e}")
-                    # 最后的尝试:直接提交表单
-                    try:
-                        totp_field = driver.find_element(By.ID, "app_totp")
-                        driver.execute_script("arguments[0].form.submit();", totp_field)
-                        logger.info("已通过 JS 提交表单")
-                    except Exception:
-                        pass
-                
-                time.sleep(random.randint(3, 5))
+                used = None
+                for attempt in (1, 2):
+                    # 生成剩余有效时间充足的 TOTP 验证码
+                    token, remaining = fresh_totp(totp_secret, used)
+                    logger.info(f"生成 2FA 验证码: {token} (剩余有效 {remaining:.0f} 秒)")
+                    submit_totp(driver, token)
+
+                    # 校验结果: 离开两步验证页即为通过
+                    if wait_until(driver, left_two_factor, TOTP_VERIFY_TIMEOUT):
+                        break
+                    used = token
+                    if attempt == 1:
+                        logger.warning("2FA 验证码未通过，使用下一个时间窗口的验证码重试")
+                else:
+                    raise Exception("2FA 验证码两次均未通过，请检查 2FA 密钥与系统时间")
                 
             except Exception as e:
                 msg = (
@@ -299,11 +409,10 @@ def run_login():
                 )
                 logger.error(msg)
                 send_tg_message(msg)
-                driver.save_screenshot("/ql/data/scripts/clawcloud_2fa_fail.png")
+                driver.save_screenshot(os.path.join(SCRIPT_DIR, "clawcloud_2fa_fail.png"))
                 return False
 
         # 检查授权页面
-        time.sleep(2)
         if "authorize" in driver.current_url.lower():
             logger.info("[Step 6] 检测到授权页面")
             try:
@@ -312,21 +421,22 @@ def run_login():
                 )
                 authorize_btn.click()
                 logger.info("已点击授权按钮")
-                time.sleep(random.randint(2, 4))
             except Exception as e:
                 logger.warning(f"未找到授权按钮: {e}")
 
         # 等待跳转回 ClawCloud
         logger.info("[Step 7] 等待跳转回 ClawCloud 控制台...")
-        time.sleep(20)
+        if not wait_until(driver, dashboard_ready, 30):
+            logger.warning("等待控制台加载超时，按当前页面判断结果")
 
         # 检查登录结果
         final_url = driver.current_url
         logger.info(f"最终 URL: {final_url}")
         
         # 保存截图
-        driver.save_screenshot("/ql/data/scripts/clawcloud_result.png")
-        logger.info("已保存截图: /ql/data/scripts/clawcloud_result.png")
+        result_png = os.path.join(SCRIPT_DIR, "clawcloud_result.png")
+        driver.save_screenshot(result_png)
+        logger.info(f"已保存截图: {result_png}")
 
         # 判断是否登录成功
         is_success = False
@@ -361,7 +471,7 @@ def run_login():
                 f"👤 账号：{masked_user}\n"
                 f"🕒 时间：{now_time}\n"
                 "⚠️ 原因：GitHub 登录或 2FA 未通过\n\n"
-                "📸 已生成调试截图：/ql/data/scripts/clawcloud_result.png"
+                f"📸 已生成调试截图：{result_png}"
             )
             logger.error(msg)
             send_tg_message(msg)
@@ -380,7 +490,7 @@ def run_login():
         
         if driver:
             try:
-                driver.save_screenshot("/ql/data/scripts/clawcloud_error.png")
+                driver.save_screenshot(os.path.join(SCRIPT_DIR, "clawcloud_error.png"))
             except Exception:
                 pass
         